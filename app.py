@@ -5,7 +5,9 @@ from PIL import Image
 import io
 import json
 import os
+import time
 from datetime import datetime
+from upload_client import upload_file
 
 # Page configuration
 st.set_page_config(
@@ -102,25 +104,63 @@ def send_message_to_backend(message, report_id, image_data=None):
     except Exception as e:
         return {"response": f"Connection error: {str(e)}", "status": "error"}
 
-def save_uploaded_file(uploaded_file, report_id):
-    """Save uploaded file to reports directory"""
+def stream_message_from_backend(message, report_id, image_data=None):
+    """Stream (event, data) pairs from the FastAPI backend's server-sent events"""
     try:
-        # Create reports directory if it doesn't exist
-        reports_dir = "reports"
-        os.makedirs(reports_dir, exist_ok=True)
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{report_id}_{timestamp}_{uploaded_file.name}"
-        file_path = os.path.join(reports_dir, filename)
-        
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        url = f"http://localhost:8080/api/chat/{report_id}/stream"
+        payload = {
+            "message": message,
+            "report_id": report_id,
+            "image_data": image_data
+        }
         
-        return file_path, filename
+        with requests.post(url, json=payload, stream=True) as response:
+            if response.status_code != 200:
+                yield "error", {"detail": f"Error: {response.status_code}"}
+                return
+            
+            event, data_lines = "message", []
+            for line in response.iter_lines(decode_unicode=True):
+                # A blank line ends one event
+                if not line:
+                    if data_lines:
+                        yield event, json.loads("\n".join(data_lines))
+                    event, data_lines = "message", []
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data_lines.append(line[len("data:"):].strip())
     except Exception as e:
-        return None, str(e)
+        yield "error", {"detail": f"Connection error: {str(e)}"}
+
+def submit_report_to_backend(uploaded_file, report_id, replace=False):
+    """Upload a report file to the backend and queue it for ingestion
+
+    With replace, a file of the same name already in the report is updated instead of rejected.
+    """
+    try:
+        # Chunked and resumable, so large reports survive flaky connections
+        return upload_file(uploaded_file, uploaded_file.name, report_id, replace=replace), None
+    except requests.HTTPError as e:
+        if e.response.status_code == 409:
+            try:
+                detail = e.response.json()["detail"]
+            except (ValueError, KeyError):
+                detail = e.response.text
+            return None, f"{detail}. Tick 'Replace existing file' to upload it as a new version."
+        return None, f"Error: {e.response.status_code} {e.response.text}"
+    except Exception as e:
+        return None, f"Connection error: {str(e)}"
+
+def get_ingestion_job(job_id):
+    """Fetch the progress of an ingestion job from the backend"""
+    try:
+        response = requests.get(f"http://localhost:8080/api/ingest/jobs/{job_id}", timeout=5)
+        if response.status_code == 200:
+            return response.json()
+    except Exception:
+        pass
+    return None
 
 def chat_tab():
     """Chat interface tab"""
@@ -178,17 +218,31 @@ def chat_tab():
             image = Image.open(uploaded_file)
             image_data = encode_image_to_base64(image)
         
-        # Send to backend and get response
-        with st.spinner("Thinking..."):
-            response = send_message_to_backend(prompt, report_id, image_data)
+        # Stream the response: evidence shows up as soon as retrieval finishes, then the answer
+        with st.chat_message("assistant"):
+            evidence_box = st.expander("Evidence", expanded=False)
+            answer_box = st.empty()
+            answer_box.markdown("Searching...")
+            answer = ""
+            evidence_count = 0
+            
+            for event, data in stream_message_from_backend(prompt, report_id, image_data):
+                if event == "evidence":
+                    evidence_count += 1
+                    source = data.get("metadata", {}).get("source", "unknown source")
+                    evidence_box.markdown(f"**{source}** ({data.get('score', 0):.2f}): {data.get('document') or ''}")
+                    answer_box.markdown(f"Found {evidence_count} item(s)...")
+                elif event == "token":
+                    answer += data["text"]
+                    answer_box.markdown(answer + "▌")
+                elif event == "error":
+                    answer = data["detail"]
+            
+            answer_box.markdown(answer)
         
         # Add assistant response to chat history
-        assistant_message = {"role": "assistant", "content": response["response"]}
+        assistant_message = {"role": "assistant", "content": answer}
         st.session_state.messages.append(assistant_message)
-        
-        # Display assistant response
-        with st.chat_message("assistant"):
-            st.markdown(response["response"])
     
     # Clear chat button
     col1, col2 = st.columns([1, 4])
@@ -222,6 +276,13 @@ def upload_tab():
         help="Upload one or more UFDR report files"
     )
     
+    replace = st.checkbox(
+        "Replace existing file",
+        value=False,
+        help="Update a file of the same name already in this report; only its changed content is re-indexed",
+        key="upload_replace"
+    )
+    
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Process uploaded files
@@ -240,13 +301,14 @@ def upload_tab():
             
             with col2:
                 if st.button(f"Upload", key=f"upload_{uploaded_file.name}"):
-                    file_path, result = save_uploaded_file(uploaded_file, report_id)
+                    job, error = submit_report_to_backend(uploaded_file, report_id, replace)
                     
-                    if file_path:
-                        st.success(f"✅ Saved as: {result}")
+                    if job:
+                        st.session_state.setdefault("ingest_jobs", []).append(job["job_id"])
+                        st.success(f"✅ Queued for ingestion: {job['file']}")
                         success_count += 1
                     else:
-                        st.error(f"❌ Error: {result}")
+                        st.error(f"❌ {error}")
                         error_count += 1
         
         # Summary
@@ -260,13 +322,44 @@ def upload_tab():
     elif uploaded_files and not report_id:
         st.warning("⚠️ Please enter a Report ID before uploading files")
     
+    # Ingestion progress, polled from the backend while any job is still active
+    job_ids = st.session_state.get("ingest_jobs", [])
+    if job_ids:
+        st.markdown("---")
+        st.markdown("### ⚙️ Ingestion Progress")
+        
+        active = False
+        for job_id in job_ids:
+            job = get_ingestion_job(job_id)
+            if job is None:
+                st.write(f"📄 {job_id}: status unavailable")
+                continue
+            
+            fraction = job["bytes_read"] / job["bytes_total"] if job["bytes_total"] else 0.0
+            st.write(f"📄 {job['file']} — {job['status']}")
+            st.progress(min(fraction, 1.0))
+            st.caption(
+                f"{job['bytes_read']}/{job['bytes_total']} bytes · "
+                f"{job['chunks_embedded']} chunks embedded · "
+                f"{job['vectors_written']} vectors written · "
+                f"{job['vectors_per_second']:.0f} vectors/s"
+            )
+            if job["status"] == "failed":
+                st.error(f"❌ {job['error']}")
+            active = active or job["status"] in ("queued", "running")
+        
+        if active:
+            time.sleep(1)
+            st.rerun()
+    
     # Display existing reports
     st.markdown("---")
     st.markdown("### 📚 Existing Reports")
     
     reports_dir = "reports"
     if os.path.exists(reports_dir):
-        report_files = os.listdir(reports_dir)
+        # Skip the staging directory of in-progress uploads
+        report_files = [f for f in os.listdir(reports_dir) if not f.startswith(".")]
         if report_files:
             for file in report_files:
                 file_path = os.path.join(reports_dir, file)
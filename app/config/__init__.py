@@ -1,12 +1,24 @@
 # Database Client Configuration
-from .kg import get_neo4j_client, close_neo4j_client, Neo4jClient
-from .vector import get_chroma_client, close_chroma_client, ChromaDBClient
+# Clients are resolved on first access, so importing app.config does not pull in chromadb or the neo4j driver
+import importlib
 
-__all__ = [
-    "get_neo4j_client",
-    "close_neo4j_client", 
-    "Neo4jClient",
-    "get_chroma_client",
-    "close_chroma_client",
-    "ChromaDBClient"
-]
+_EXPORTS = {
+    "get_neo4j_client": ".kg",
+    "close_neo4j_client": ".kg",
+    "Neo4jClient": ".kg",
+    "get_chroma_client": ".vector",
+    "close_chroma_client": ".vector",
+    "ChromaDBClient": ".vector",
+    "get_vector_store": ".store",
+    "close_vector_store": ".store",
+    "VectorStore": ".store",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
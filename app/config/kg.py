@@ -1,44 +1,319 @@
 # Neo4j Knowledge Graph Client Configuration
 from neo4j import GraphDatabase
+from neo4j.exceptions import ServiceUnavailable, SessionExpired
 import os
+import re
+import threading
+import time
 import logging
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Tuple
 from dotenv import load_dotenv
+from .pool import ConnectionSlots
+from ..runtime.metrics import GRAPH_LATENCY, observe
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Node labels of a UFDR extraction and the property that identifies each within a report;
+# the same phone number or contact in two reports is two nodes, keyed by (report_id, key)
+GRAPH_SCHEMA = {
+    "Device": "id",
+    "Contact": "id",
+    "Call": "id",
+    "Message": "id",
+}
+
+# Labels, relationship types and keys are interpolated into Cypher, so they must be plain identifiers
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def _identifier(name: str) -> str:
+    """Validate a label, relationship type or property name before it is put into a query"""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid Cypher identifier: {name!r}")
+    return name
+
+def _match_report_nodes(schema: Dict[str, str], id_variable: str) -> str:
+    """Subquery binding n to the node with id_variable as key in $report_id, under any schema label
+
+    Each UNION branch matches on a label and (report_id, key), so it is an index seek
+    on that label's constraint rather than a scan of all nodes.
+    """
+    branches = [
+        f"WITH {id_variable} MATCH (n:{_identifier(label)} "
+        f"{{report_id: $report_id, {_identifier(key)}: {id_variable}}}) RETURN n"
+        for label, key in schema.items()
+    ]
+    return "CALL { " + " UNION ".join(branches) + " } "
+
 class Neo4jClient:
     """Neo4j Knowledge Graph Client"""
     
-    def __init__(self, uri: str = None, username: str = None, password: str = None):
+    def __init__(self, uri: str = None, username: str = None, password: str = None, batch_size: int = None,
+                 pool_size: int = None, acquisition_timeout: float = None):
         """Initialize Neo4j client"""
         self.uri = uri or os.getenv("NEO4J_URI")
         self.username = username or os.getenv("NEO4J_USER")
         self.password = password or os.getenv("NEO4J_PASSWORD")
+        self.batch_size = batch_size or int(os.getenv("NEO4J_BATCH_SIZE", "5000"))
+        self.pool_size = pool_size or int(os.getenv("NEO4J_POOL_SIZE", "50"))
+        self.acquisition_timeout = acquisition_timeout or float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+        self.max_connection_lifetime = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+        # Idle connections older than this are pinged before reuse, so sockets killed by a restart are dropped
+        self.liveness_check_timeout = float(os.getenv("NEO4J_LIVENESS_CHECK_TIMEOUT", "30"))
+        self.reconnect_interval = float(os.getenv("DB_RECONNECT_INTERVAL", "5"))
+        
+        self.slots = ConnectionSlots("neo4j", self.pool_size, self.acquisition_timeout)
+        self.healthy = False
+        self.reconnects = 0
+        self._last_connect_attempt = 0.0
+        self._connect_lock = threading.Lock()
         
         self.driver = None
         self._connect()
     
     def _connect(self):
         """Establish connection to Neo4j database"""
+        self._last_connect_attempt = time.monotonic()
         try:
             self.driver = GraphDatabase.driver(
                 self.uri, 
-                auth=(self.username, self.password)
+                auth=(self.username, self.password),
+                max_connection_pool_size=self.pool_size,
+                connection_acquisition_timeout=self.acquisition_timeout,
+                max_connection_lifetime=self.max_connection_lifetime,
+                liveness_check_timeout=self.liveness_check_timeout,
             )
             # Test connection
-            with self.driver.session() as session:
-                session.run("RETURN 1")
-            logger.info(f"Connected to Neo4j at {self.uri}")
+            self.driver.verify_connectivity()
+            self.healthy = True
+            logger.info(f"Connected to Neo4j at {self.uri} (pool size {self.pool_size})")
         except Exception as e:
+            self.healthy = False
             logger.error(f"Failed to connect to Neo4j: {e}")
             raise
     
+    def reconnect(self) -> bool:
+        """Replace the driver with a fresh one, e.g. after the database restarted"""
+        with self._connect_lock:
+            old_driver = self.driver
+            try:
+                self._connect()
+            except Exception:
+                return False
+            self.reconnects += 1
+        if old_driver is not None:
+            try:
+                old_driver.close()
+            except Exception as e:
+                logger.debug(f"Error closing stale Neo4j driver: {e}")
+        logger.info(f"Reconnected to Neo4j at {self.uri}")
+        return True
+    
+    def health_check(self) -> bool:
+        """Verify connectivity, reconnecting if the database is unreachable"""
+        try:
+            self.driver.verify_connectivity()
+            self.healthy = True
+        except Exception as e:
+            logger.warning(f"Neo4j health check failed: {e}")
+            self.healthy = False
+            self.reconnect()
+        return self.healthy
+    
+    @contextmanager
+    def session(self):
+        """Session that holds a pool slot and flags the client unhealthy when the database goes away"""
+        if not self.healthy and time.monotonic() - self._last_connect_attempt >= self.reconnect_interval:
+            self.reconnect()
+        with self.slots.acquire():
+            try:
+                with self.driver.session() as session:
+                    yield session
+            except (ServiceUnavailable, SessionExpired):
+                self.healthy = False
+                raise
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool usage, wait times and connection health"""
+        return {**self.slots.stats(), "healthy": self.healthy, "reconnects": self.reconnects}
+    
+    def ensure_schema(self, schema: Dict[str, str] = None):
+        """Create (report_id, key) uniqueness constraints and report_id indexes, if missing
+
+        Without the constraint's backing index every MERGE in a batch is a label scan.
+        """
+        schema = schema or GRAPH_SCHEMA
+        with self.session() as session:
+            for label, key in schema.items():
+                label, key = _identifier(label), _identifier(key)
+                # Key-only constraints from older versions would merge nodes across reports
+                session.run(f"DROP CONSTRAINT {label.lower()}_{key}_unique IF EXISTS").consume()
+                session.run(
+                    f"CREATE CONSTRAINT {label.lower()}_report_{key}_unique IF NOT EXISTS "
+                    f"FOR (n:{label}) REQUIRE (n.report_id, n.{key}) IS UNIQUE"
+                ).consume()
+                session.run(
+                    f"CREATE INDEX {label.lower()}_report_id IF NOT EXISTS FOR (n:{label}) ON (n.report_id)"
+                ).consume()
+        logger.info(f"Neo4j schema ensured for labels: {', '.join(schema)}")
+    
+    def _write_batches(self, query: str, rows: Iterable[Dict[str, Any]], batch_size: int = None) -> int:
+        """Run a parameterised UNWIND query once per batch of rows, each in its own managed write transaction"""
+        batch_size = batch_size or self.batch_size
+        rows = iter(rows)
+        written = 0
+        with self.session() as session:
+            for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                # execute_write retries the whole batch on transient errors (deadlocks, leader switches)
+                with observe(GRAPH_LATENCY, operation="write"):
+                    session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+                written += len(batch)
+        return written
+    
+    def write_nodes(self, label: str, rows: Iterable[Dict[str, Any]], key: str = "id", batch_size: int = None) -> int:
+        """MERGE nodes of one label by (report_id, key) and set all row properties on them
+
+        Every row must carry report_id.
+        """
+        label, key = _identifier(label), _identifier(key)
+        query = (
+            f"UNWIND $rows AS row "
+            f"MERGE (n:{label} {{report_id: row.report_id, {key}: row.{key}}}) "
+            f"SET n += row"
+        )
+        start = time.perf_counter()
+        written = self._write_batches(query, rows, batch_size)
+        logger.info(f"Wrote {written} {label} node(s) in {time.perf_counter() - start:.2f}s")
+        return written
+    
+    def write_relationships(self, rel_type: str, start_label: str, end_label: str,
+                            rows: Iterable[Dict[str, Any]], start_key: str = "id", end_key: str = "id",
+                            batch_size: int = None) -> int:
+        """MERGE relationships between existing nodes of the same report
+
+        Each row is {"report_id": ..., "start": <start key value>, "end": <end key value>, "properties": {...}}.
+        """
+        rel_type = _identifier(rel_type)
+        start_label, end_label = _identifier(start_label), _identifier(end_label)
+        start_key, end_key = _identifier(start_key), _identifier(end_key)
+        query = (
+            f"UNWIND $rows AS row "
+            f"MATCH (a:{start_label} {{report_id: row.report_id, {start_key}: row.start}}) "
+            f"MATCH (b:{end_label} {{report_id: row.report_id, {end_key}: row.end}}) "
+            f"MERGE (a)-[r:{rel_type}]->(b) "
+            f"SET r += coalesce(row.properties, {{}})"
+        )
+        start = time.perf_counter()
+        written = self._write_batches(query, rows, batch_size)
+        logger.info(f"Wrote {written} {rel_type} relationship(s) in {time.perf_counter() - start:.2f}s")
+        return written
+    
+    def load_graph(self, nodes: Iterable[Tuple[str, Dict[str, Any]]],
+                   relationships: Iterable[Tuple[str, str, str, Dict[str, Any]]] = (),
+                   schema: Dict[str, str] = None, batch_size: int = None) -> Dict[str, int]:
+        """Bulk-load a mixed stream of nodes and relationships
+
+        nodes yields (label, properties); relationships yields
+        (rel_type, start_label, end_label, {"report_id": ..., "start": ..., "end": ..., "properties": {...}}).
+        Node properties must include report_id.
+        Rows are grouped per label/type and flushed in batches, so memory is bounded
+        by batch_size per group. All nodes are written before any relationship.
+        """
+        schema = schema or GRAPH_SCHEMA
+        batch_size = batch_size or self.batch_size
+        self.ensure_schema(schema)
+        start = time.perf_counter()
+        counts = {"nodes": 0, "relationships": 0}
+        
+        buffers: Dict[str, List[Dict[str, Any]]] = {}
+        for label, properties in nodes:
+            buffer = buffers.setdefault(label, [])
+            buffer.append(properties)
+            if len(buffer) >= batch_size:
+                counts["nodes"] += self.write_nodes(label, buffer, schema.get(label, "id"), batch_size)
+                buffers[label] = []
+        for label, buffer in buffers.items():
+            if buffer:
+                counts["nodes"] += self.write_nodes(label, buffer, schema.get(label, "id"), batch_size)
+        
+        rel_buffers: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        for rel_type, start_label, end_label, row in relationships:
+            group = (rel_type, start_label, end_label)
+            buffer = rel_buffers.setdefault(group, [])
+            buffer.append(row)
+            if len(buffer) >= batch_size:
+                counts["relationships"] += self.write_relationships(
+                    rel_type, start_label, end_label, buffer,
+                    schema.get(start_label, "id"), schema.get(end_label, "id"), batch_size)
+                rel_buffers[group] = []
+        for (rel_type, start_label, end_label), buffer in rel_buffers.items():
+            if buffer:
+                counts["relationships"] += self.write_relationships(
+                    rel_type, start_label, end_label, buffer,
+                    schema.get(start_label, "id"), schema.get(end_label, "id"), batch_size)
+        
+        elapsed = time.perf_counter() - start
+        logger.info(f"Loaded {counts['nodes']} node(s) and {counts['relationships']} relationship(s) "
+                    f"into Neo4j in {elapsed:.2f}s")
+        return counts
+    
+    def delete_nodes(self, report_id: str, node_ids: Iterable[str], batch_size: int = None,
+                     schema: Dict[str, str] = None) -> int:
+        """Detach-delete the nodes of one report with the given ids; returns the number of ids processed"""
+        query = (
+            "UNWIND $rows AS node_id "
+            + _match_report_nodes(schema or GRAPH_SCHEMA, "node_id") +
+            "DETACH DELETE n"
+        )
+        batch_size = batch_size or self.batch_size
+        node_ids = iter(node_ids)
+        processed = 0
+        with self.session() as session:
+            for batch in iter(lambda: list(islice(node_ids, batch_size)), []):
+                with observe(GRAPH_LATENCY, operation="delete"):
+                    session.execute_write(lambda tx: tx.run(query, rows=batch, report_id=report_id).consume())
+                processed += len(batch)
+        if processed:
+            logger.info(f"Removed graph nodes for {processed} id(s) from report {report_id}")
+        return processed
+    
+    def get_neighbours(self, report_id: str, node_ids: List[str], limit: int = 50,
+                       schema: Dict[str, str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Directly connected nodes of the given node ids within one report, grouped by node id
+
+        At most limit neighbours are returned per node, so a hub node cannot crowd out the others.
+        """
+        if not node_ids:
+            return {}
+        query = (
+            "UNWIND $ids AS node_id "
+            + _match_report_nodes(schema or GRAPH_SCHEMA, "node_id") +
+            "CALL { WITH n MATCH (n)-[r]-(m) "
+            "RETURN type(r) AS relationship, labels(m) AS labels, properties(m) AS properties LIMIT $limit } "
+            "RETURN node_id, relationship, labels, properties"
+        )
+        neighbours: Dict[str, List[Dict[str, Any]]] = {}
+        with self.session() as session, observe(GRAPH_LATENCY, operation="neighbours"):
+            records = session.execute_read(
+                lambda tx: list(tx.run(query, ids=list(node_ids), report_id=report_id, limit=limit))
+            )
+        for record in records:
+            neighbours.setdefault(record["node_id"], []).append({
+                "relationship": record["relationship"],
+                "labels": record["labels"],
+                "properties": record["properties"],
+            })
+        return neighbours
+    
     def close(self):
         """Close the database connection"""
         if self.driver:
             self.driver.close()
+            self.driver = None
+            self.healthy = False
             logger.info("Neo4j connection closed")
 
 # Global Neo4j client instance
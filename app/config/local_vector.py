@@ -0,0 +1,575 @@
+# In-process vector store: one memory-mapped index per report, no server round-trip
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from .store import VectorRecord, VectorStore
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Records without a report_id in their metadata are indexed here
+DEFAULT_REPORT = "_default"
+
+class _GrowableArray:
+    """Memory-mapped float/int array that doubles its row capacity on disk as it fills"""
+
+    def __init__(self, path: str, dtype, width: int = None, min_rows: int = 1024):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.min_rows = min_rows
+        self.array = None
+        if os.path.exists(path) and os.path.getsize(path):
+            self._map(self._capacity_on_disk())
+
+    def _row_bytes(self) -> int:
+        return self.dtype.itemsize * (self.width or 1)
+
+    def _capacity_on_disk(self) -> int:
+        return os.path.getsize(self.path) // self._row_bytes()
+
+    def _map(self, rows: int):
+        shape = (rows, self.width) if self.width else (rows,)
+        self.array = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=shape)
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self.array is None else self.array.shape[0]
+
+    def ensure(self, rows: int):
+        """Grow the file so at least rows rows fit"""
+        if rows <= self.capacity:
+            return
+        capacity = max(self.capacity, self.min_rows)
+        while capacity < rows:
+            capacity *= 2
+        if self.array is not None:
+            self.array.flush()
+            self.array = None
+        with open(self.path, "ab") as f:
+            f.truncate(capacity * self._row_bytes())
+        self._map(capacity)
+
+    def flush(self):
+        if self.array is not None:
+            self.array.flush()
+
+# Storage precisions of the vectors that are scanned at query time
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+# Rows scanned per matrix product; quantized blocks are widened to float32, and cache-sized blocks convert fastest
+SCAN_BLOCK_ROWS = 4096
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Codes and per-vector scales (None unless int8) for float32 vectors"""
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def dequantize(codes: np.ndarray, scales: np.ndarray = None) -> np.ndarray:
+    """float32 vectors from codes and, for int8, their per-vector scales"""
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+class ReportIndex:
+    """Vectors of one report on memory-mapped files, searched exactly or through an IVF coarse quantizer
+
+    Small reports are searched by brute force, which is exact and already fast.
+    Once a report has ivf_threshold vectors, spherical k-means centroids are
+    trained and queries only scan the nprobe closest inverted lists.
+
+    With a float16 or int8 dtype, queries scan the compact codes (2x or 4x less
+    memory traffic) for rescore_factor * k candidates, which are then re-ranked
+    against the float32 vectors if keep_full is set. Only those few rows of the
+    float32 file are read, so it stays on disk rather than in memory.
+    """
+
+    def __init__(self, directory: str, alive_rows: Iterable[int], ivf_threshold: int, nprobe: int,
+                 dtype: str = "float32", keep_full: bool = True, rescore_factor: int = 4):
+        """Open (or create) the index files in directory; alive_rows are the rows that hold live records
+
+        dtype and keep_full apply to new indexes; an existing index keeps the layout it was created with.
+        """
+        self.directory = directory
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.rescore_factor = rescore_factor
+        self.lock = threading.RLock()
+
+        self._header_path = os.path.join(directory, "header.json")
+        header = {"dimension": None, "rows": 0, "trained_rows": 0, "dtype": dtype, "full": keep_full}
+        if os.path.exists(self._header_path):
+            with open(self._header_path) as f:
+                stored = json.load(f)
+            # Indexes written before quantization existed hold float32 only
+            header.update({"dtype": "float32", "full": True}, **stored)
+            if (header["dtype"], header["full"]) != (dtype, keep_full):
+                logger.info(f"Index {directory} keeps its {header['dtype']} layout (full={header['full']})")
+        if header["dtype"] not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype '{header['dtype']}', expected one of {', '.join(VECTOR_DTYPES)}")
+        self.dimension = header["dimension"]
+        self.rows = header["rows"]
+        self.trained_rows = header["trained_rows"]
+        self.dtype = header["dtype"]
+        self.quantized = self.dtype != "float32"
+        self.keep_full = header["full"] or not self.quantized
+
+        # Norms are of the scanned vectors, so scan distances are exact for what is stored
+        self._norms = _GrowableArray(os.path.join(directory, "norms.f32"), np.float32)
+        self._assign = _GrowableArray(os.path.join(directory, "assign.i32"), np.int32)
+        self._scales = _GrowableArray(os.path.join(directory, "scales.f32"), np.float32) \
+            if self.dtype == "int8" else None
+        self._vectors = self._codes = None
+        if self.dimension:
+            self._open_vectors()
+
+        self.alive = np.zeros(max(self.rows, 1), dtype=bool)
+        alive_rows = np.fromiter(alive_rows, dtype=np.int64)
+        self.alive[alive_rows[alive_rows < self.rows]] = True
+
+        self.centroids = None
+        centroids_path = os.path.join(directory, "centroids.npy")
+        if self.trained_rows and os.path.exists(centroids_path):
+            self.centroids = np.load(centroids_path)
+        self._lists = None
+
+    def _open_vectors(self):
+        if self.keep_full:
+            self._vectors = _GrowableArray(os.path.join(self.directory, "vectors.f32"), np.float32, self.dimension)
+        if self.quantized:
+            extension = "f16" if self.dtype == "float16" else "i8"
+            self._codes = _GrowableArray(os.path.join(self.directory, f"vectors.{extension}"),
+                                         np.float16 if self.dtype == "float16" else np.int8, self.dimension)
+
+    def _arrays(self) -> List[_GrowableArray]:
+        return [a for a in (self._vectors, self._codes, self._scales, self._norms, self._assign) if a is not None]
+
+    @property
+    def size(self) -> int:
+        """Number of live vectors"""
+        return int(self.alive[:self.rows].sum())
+
+    @property
+    def bytes_per_vector(self) -> int:
+        """Bytes stored per vector, including norms, scales and list assignments"""
+        return sum(a.dtype.itemsize * (a.width or 1) for a in self._arrays()) if self.dimension else 0
+
+    def allocate(self, count: int) -> np.ndarray:
+        """Reserve count new rows at the end of the index"""
+        start = self.rows
+        self.rows += count
+        if self.alive.shape[0] < self.rows:
+            self.alive = np.concatenate([self.alive, np.zeros(max(self.rows, 2 * self.alive.shape[0]) -
+                                                              self.alive.shape[0], dtype=bool)])
+        return np.arange(start, self.rows)
+
+    def _scanned(self, rows) -> np.ndarray:
+        """The stored vectors queries scan, as float32, for an index array or slice of rows"""
+        if not self.quantized:
+            return self._vectors.array[rows]
+        return dequantize(self._codes.array[rows], self._scales.array[rows] if self._scales is not None else None)
+
+    def write(self, rows: np.ndarray, vectors: np.ndarray):
+        """Store vectors at the given rows and mark them live"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        os.makedirs(self.directory, exist_ok=True)
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+            self._open_vectors()
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+
+        for array in self._arrays():
+            array.ensure(self.rows)
+        if self._vectors is not None:
+            self._vectors.array[rows] = vectors
+        scanned = vectors
+        if self.quantized:
+            codes, scales = quantize(vectors, self.dtype)
+            self._codes.array[rows] = codes
+            if self._scales is not None:
+                self._scales.array[rows] = scales
+            scanned = dequantize(codes, scales)
+        self._norms.array[rows] = np.einsum("ij,ij->i", scanned, scanned)
+        self.alive[rows] = True
+        if self.centroids is not None:
+            self._assign.array[rows] = np.argmax(scanned @ self.centroids.T, axis=1)
+            self._lists = None
+
+    def kill(self, rows: Iterable[int]):
+        """Mark rows as deleted; their slots are skipped by every search"""
+        rows = np.fromiter(rows, dtype=np.int64)
+        self.alive[rows[rows < self.rows]] = False
+
+    def maybe_train(self):
+        """(Re)train the IVF centroids once the index is large enough or has doubled since the last training"""
+        live = self.size
+        if live < self.ivf_threshold or (self.trained_rows and self.rows < 2 * self.trained_rows):
+            return
+        start = time.perf_counter()
+        rows = np.flatnonzero(self.alive[:self.rows])
+        nlist = min(max(16, int(np.sqrt(live))), len(rows))
+        rng = np.random.default_rng(0)
+        sample = self._scanned(np.sort(rng.choice(rows, min(len(rows), nlist * 64), replace=False)))
+
+        # Spherical k-means: for unit vectors, the largest dot product is the smallest L2 distance
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(10):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / np.linalg.norm(sums[filled], axis=1, keepdims=True)
+
+        for offset in range(0, self.rows, 65536):
+            block = slice(offset, min(offset + 65536, self.rows))
+            self._assign.array[block] = np.argmax(self._scanned(block) @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.trained_rows = self.rows
+        self._lists = None
+        np.save(os.path.join(self.directory, "centroids.npy"), centroids)
+        logger.info(f"Trained {nlist} IVF lists over {live} vectors in {self.directory} "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows grouped by list, as (rows sorted by list, list start offsets)"""
+        if self._lists is None:
+            assign = self._assign.array[:self.rows]
+            order = np.argsort(assign, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(self.centroids)))])
+            self._lists = (order, offsets)
+        return self._lists
+
+    def _dots(self, candidates: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Inner products of the query with the scanned vectors of candidate rows"""
+        if not self.quantized and len(candidates) == self.rows:
+            # Nothing deleted: scan the mapped file in place
+            return self._vectors.array[:self.rows] @ query
+        dots = np.empty(len(candidates), dtype=np.float32)
+        for offset in range(0, len(candidates), SCAN_BLOCK_ROWS):
+            block = candidates[offset:offset + SCAN_BLOCK_ROWS]
+            if len(block) and block[-1] - block[0] == len(block) - 1:
+                # Contiguous rows are sliced rather than gathered
+                block = slice(int(block[0]), int(block[-1]) + 1)
+            if self._scales is not None:
+                # Scale the products rather than the codes: one multiply per row instead of per element
+                dots[offset:offset + SCAN_BLOCK_ROWS] = \
+                    (self._codes.array[block].astype(np.float32) @ query) * self._scales.array[block]
+            else:
+                dots[offset:offset + SCAN_BLOCK_ROWS] = self._scanned(block) @ query
+        return dots
+
+    @staticmethod
+    def _top(distances: np.ndarray, k: int) -> np.ndarray:
+        top = np.argpartition(distances, k)[:k] if len(distances) > k else np.arange(len(distances))
+        return top[np.argsort(distances[top])]
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and squared L2 distances of the k nearest live vectors to one query"""
+        if not self.rows or self.dimension is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        query_norm = float(query @ query)
+
+        if self.centroids is not None:
+            order, offsets = self._inverted_lists()
+            probes = np.argsort(self.centroids @ query)[::-1][:self.nprobe]
+            candidates = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes]))
+            candidates = candidates[self.alive[candidates]]
+        else:
+            candidates = np.flatnonzero(self.alive[:self.rows])
+
+        rescore = self.quantized and self._vectors is not None
+        distances = self._norms.array[candidates] + query_norm - 2.0 * self._dots(candidates, query)
+        top = self._top(distances, k * self.rescore_factor if rescore else k)
+        candidates, distances = candidates[top], distances[top]
+        if rescore:
+            vectors = self._vectors.array[np.sort(candidates)]
+            order = np.argsort(candidates)
+            exact = np.empty(len(candidates), dtype=np.float32)
+            exact[order] = np.einsum("ij,ij->i", vectors, vectors) + query_norm - 2.0 * (vectors @ query)
+            top = self._top(exact, k)
+            candidates, distances = candidates[top], exact[top]
+        return candidates, distances
+
+    def flush(self):
+        """Write the index files and header to disk"""
+        if self.dimension is None:
+            return
+        for array in self._arrays():
+            array.flush()
+        with open(self._header_path, "w") as f:
+            json.dump({"dimension": self.dimension, "rows": self.rows, "trained_rows": self.trained_rows,
+                       "dtype": self.dtype, "full": self.keep_full}, f)
+
+    def close(self):
+        self.flush()
+        self._vectors = self._codes = self._scales = self._norms = self._assign = None
+
+class LocalVectorStore(VectorStore):
+    """Vector store that keeps a ReportIndex per report_id under a data directory
+
+    Documents and metadata live in SQLite next to the indexes. Queries filtered
+    on report_id only touch that report's index, and nothing crosses the network.
+    """
+
+    def __init__(self, path: str = None, ivf_threshold: int = None, nprobe: int = None, dtype: str = None,
+                 keep_full: bool = None, rescore_factor: int = None):
+        """Open (or create) the store; dtype, keep_full and rescore_factor apply to newly created report indexes"""
+        self.path = path or os.getenv("LOCAL_VECTOR_PATH", "data/vectors")
+        self.ivf_threshold = ivf_threshold or int(os.getenv("LOCAL_VECTOR_IVF_THRESHOLD", "50000"))
+        self.nprobe = nprobe or int(os.getenv("LOCAL_VECTOR_NPROBE", "32"))
+        self.dtype = (dtype or os.getenv("LOCAL_VECTOR_DTYPE", "float32")).lower()
+        if self.dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype '{self.dtype}', expected one of {', '.join(VECTOR_DTYPES)}")
+        self.keep_full = keep_full if keep_full is not None else \
+            os.getenv("LOCAL_VECTOR_KEEP_FULL", "true").lower() == "true"
+        self.rescore_factor = rescore_factor or int(os.getenv("LOCAL_VECTOR_RESCORE_FACTOR", "4"))
+        os.makedirs(self.path, exist_ok=True)
+
+        self._indexes: Dict[str, ReportIndex] = {}
+        self._lock = threading.RLock()
+        # Serialises writers against each other, so ids and rows stay consistent between SQLite and the
+        # indexes; queries never take it, and self._lock is only held for SQLite and the index table
+        self._write_lock = threading.Lock()
+        # One connection shared by all threads; access is serialised by self._lock
+        self._conn = sqlite3.connect(os.path.join(self.path, "records.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records (id TEXT PRIMARY KEY, report_id TEXT NOT NULL, "
+            "row INTEGER NOT NULL, document TEXT, metadata TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_report_row ON records (report_id, row)")
+        self._conn.commit()
+        logger.info(f"Local vector store opened at {self.path} ({self.dtype} vectors)")
+
+    def _index(self, report_id: str) -> ReportIndex:
+        """Open a report's index on first use"""
+        with self._lock:
+            index = self._indexes.get(report_id)
+            if index is None:
+                safe = re.sub(r"[^A-Za-z0-9_.-]", "_", report_id)[:64]
+                digest = hashlib.sha1(report_id.encode("utf-8")).hexdigest()[:8]
+                rows = (row for (row,) in self._conn.execute(
+                    "SELECT row FROM records WHERE report_id = ?", (report_id,)))
+                index = ReportIndex(os.path.join(self.path, f"{safe}-{digest}"), rows,
+                                    self.ivf_threshold, self.nprobe, self.dtype, self.keep_full, self.rescore_factor)
+                self._indexes[report_id] = index
+            return index
+
+    def _report_ids(self) -> List[str]:
+        with self._lock:
+            return [report_id for (report_id,) in self._conn.execute("SELECT DISTINCT report_id FROM records")]
+
+    def _existing(self, ids: List[str]) -> Dict[str, Tuple[str, int]]:
+        """Current (report_id, row) of the ids that are already stored"""
+        found = {}
+        for offset in range(0, len(ids), 500):
+            chunk = ids[offset:offset + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for id_, report_id, row in self._conn.execute(
+                    f"SELECT id, report_id, row FROM records WHERE id IN ({placeholders})", chunk):
+                found[id_] = (report_id, row)
+        return found
+
+    def _upsert_batch(self, batch: List[VectorRecord]):
+        """Write one batch: existing ids are overwritten in place, new ones appended to their report's index"""
+        # An id repeated within the batch would get a row per copy; only the last copy is kept
+        batch = list({record[0]: record for record in batch}.values())
+        by_report: Dict[str, List[VectorRecord]] = {}
+        for record in batch:
+            by_report.setdefault((record[3] or {}).get("report_id", DEFAULT_REPORT), []).append(record)
+
+        with self._write_lock:
+            with self._lock:
+                existing = self._existing([record[0] for record in batch])
+            rows_to_write = []
+            for report_id, records in by_report.items():
+                index = self._index(report_id)
+                rows = np.empty(len(records), dtype=np.int64)
+                new, moved = [], {}
+                for position, (id_, _, _, _) in enumerate(records):
+                    previous = existing.get(id_)
+                    if previous and previous[0] == report_id:
+                        rows[position] = previous[1]
+                    else:
+                        if previous:
+                            # The record moved to another report
+                            moved.setdefault(previous[0], []).append(previous[1])
+                        new.append(position)
+                for old_report, old_rows in moved.items():
+                    old_index = self._index(old_report)
+                    with old_index.lock:
+                        old_index.kill(old_rows)
+
+                vectors = np.asarray([np.asarray(e, dtype=np.float32) for _, e, _, _ in records])
+                # Writing and IVF training only block queries on this report
+                with index.lock:
+                    if new:
+                        rows[new] = index.allocate(len(new))
+                    index.write(rows, vectors)
+                    index.maybe_train()
+                    index.flush()
+                rows_to_write.extend(
+                    (id_, report_id, int(row), document, json.dumps(metadata or {}))
+                    for (id_, _, document, metadata), row in zip(records, rows)
+                )
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO records (id, report_id, row, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                    rows_to_write,
+                )
+
+    def bulk_upsert(self, records: Iterable[VectorRecord], batch_size: int = 500,
+                    max_workers: int = 4, max_retries: int = 3, progress: Dict[str, Any] = None,
+                    on_batch: Callable[[int], None] = None) -> Dict[str, float]:
+        """Write a stream of records in batches; max_workers and max_retries only apply to remote stores"""
+        start = time.perf_counter()
+        written = batches = 0
+        records = iter(records)
+        for batch in iter(lambda: list(islice(records, batch_size)), []):
+            self._upsert_batch(batch)
+            written += len(batch)
+            batches += 1
+            if progress is not None:
+                progress["vectors_written"] = progress.get("vectors_written", 0) + len(batch)
+            if on_batch is not None:
+                on_batch(len(batch))
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "records": written,
+            "batches": batches,
+            "retries": 0,
+            "seconds": elapsed,
+            "records_per_second": written / elapsed if elapsed else 0.0,
+        }
+        logger.info(f"Upserted {written} record(s) in {batches} batch(es) to the local vector store "
+                    f"at {stats['records_per_second']:.0f} records/s")
+        return stats
+
+    @staticmethod
+    def _parse_where(where: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten a Chroma-style where clause of equality conditions (optionally under $and)"""
+        conditions = {}
+        for key, value in (where or {}).items():
+            if key == "$and":
+                for clause in value:
+                    conditions.update(LocalVectorStore._parse_where(clause))
+            elif key.startswith("$") or isinstance(value, dict):
+                raise ValueError(f"Local vector store only supports equality filters, got {key}: {value}")
+            else:
+                conditions[key] = value
+        return conditions
+
+    def _fetch(self, report_id: str, rows: List[int]) -> Dict[int, Tuple[str, str, Dict]]:
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            result = self._conn.execute(
+                f"SELECT row, id, document, metadata FROM records WHERE report_id = ? AND row IN ({placeholders})",
+                [report_id, *rows],
+            ).fetchall()
+        return {row: (id_, document, json.loads(metadata) if metadata else {}) for row, id_, document, metadata in result}
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Nearest-neighbour search over the matching reports, one list of hits per query embedding"""
+        conditions = self._parse_where(where)
+        report_id = conditions.pop("report_id", None)
+        report_ids = [report_id] if report_id is not None else self._report_ids()
+        # Other metadata filters are applied after the search, so fetch extra candidates
+        fetch = n_results * 10 if conditions else n_results
+
+        results = []
+        for embedding in query_embeddings:
+            embedding = np.asarray(embedding, dtype=np.float32)
+            hits = []
+            for rid in report_ids:
+                index = self._index(rid)
+                with index.lock:
+                    rows, distances = index.search(embedding, fetch)
+                if not len(rows):
+                    continue
+                records = self._fetch(rid, rows.tolist())
+                for row, distance in zip(rows.tolist(), distances.tolist()):
+                    if row not in records:
+                        continue
+                    id_, document, metadata = records[row]
+                    if all(metadata.get(key) == value for key, value in conditions.items()):
+                        hits.append({"id": id_, "document": document, "metadata": metadata, "distance": distance})
+            hits.sort(key=lambda hit: hit["distance"])
+            results.append(hits[:n_results])
+        return results
+
+    def delete(self, ids: Iterable[str], batch_size: int = 500) -> int:
+        """Delete records by id; their index slots are tombstoned"""
+        ids = iter(ids)
+        deleted = 0
+        for batch in iter(lambda: list(islice(ids, batch_size)), []):
+            with self._write_lock:
+                with self._lock:
+                    existing = self._existing(batch)
+                by_report: Dict[str, List[int]] = {}
+                for report_id, row in existing.values():
+                    by_report.setdefault(report_id, []).append(row)
+                for report_id, rows in by_report.items():
+                    index = self._index(report_id)
+                    with index.lock:
+                        index.kill(rows)
+                with self._lock, self._conn:
+                    self._conn.executemany("DELETE FROM records WHERE id = ?", ((id_,) for id_ in existing))
+            deleted += len(existing)
+        if deleted:
+            logger.info(f"Deleted {deleted} record(s) from the local vector store")
+        return deleted
+
+    def health_check(self) -> bool:
+        """The store is local, so it is healthy while its database is open"""
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Local vector store health check failed: {e}")
+            return False
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Loaded indexes and vector counts"""
+        with self._lock:
+            indexes = list(self._indexes.values())
+        return {
+            "healthy": True,
+            "reconnects": 0,
+            "reports_loaded": len(indexes),
+            "vectors_loaded": sum(index.size for index in indexes),
+            "ivf_indexes": sum(index.centroids is not None for index in indexes),
+            "vector_dtype": self.dtype,
+            "bytes_loaded": sum(index.size * index.bytes_per_vector for index in indexes),
+        }
+
+    def close(self):
+        """Flush every index and close the database"""
+        with self._lock:
+            for index in self._indexes.values():
+                with index.lock:
+                    index.close()
+            self._indexes.clear()
+            self._conn.close()
+        logger.info("Local vector store closed")
@@ -0,0 +1,77 @@
+# Connection slot accounting shared by the database clients
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no connection slot frees up within the acquisition timeout"""
+
+class ConnectionSlots:
+    """Bounded set of connection slots with in-use, wait-time and timeout metrics
+
+    The database drivers keep their own sockets; this caps how many requests use
+    them at once and makes pool pressure visible, which the drivers don't expose.
+    """
+
+    def __init__(self, name: str, size: int, acquisition_timeout: float):
+        """Initialize the slots"""
+        self.name = name
+        self.size = size
+        self.acquisition_timeout = acquisition_timeout
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+        self._wait_ms = deque(maxlen=1000)
+        self.acquired = 0
+        self.timeouts = 0
+
+    @contextmanager
+    def acquire(self):
+        """Hold one slot for the duration of the block"""
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.acquisition_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeoutError(f"No {self.name} connection available within {self.acquisition_timeout}s")
+
+        with self._lock:
+            self._in_use += 1
+            self.acquired += 1
+            self._wait_ms.append((time.perf_counter() - start) * 1000)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        """Pool usage and acquisition wait times over the most recent acquisitions"""
+        with self._lock:
+            waits = sorted(self._wait_ms)
+            in_use, waiting = self._in_use, self._waiting
+        return {
+            "size": self.size,
+            "in_use": in_use,
+            "idle": self.size - in_use,
+            "waiting": waiting,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "mean_wait_ms": sum(waits) / len(waits) if waits else 0.0,
+            "p95_wait_ms": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "max_wait_ms": waits[-1] if waits else 0.0,
+        }
@@ -0,0 +1,94 @@
+# Vector store interface and backend selection
+import abc
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# (id, embedding, document, metadata) as accepted by VectorStore.bulk_upsert
+VectorRecord = Tuple[str, List[float], str, Dict[str, Any]]
+
+VECTOR_BACKENDS = ("chroma", "local")
+
+class VectorStore(abc.ABC):
+    """Operations the ingestion pipelines and the chat retriever need from a vector store
+
+    Implementations: ChromaDBClient (Chroma server over HTTP) and LocalVectorStore
+    (in-process per-report indexes on memory-mapped files).
+    """
+
+    @abc.abstractmethod
+    def bulk_upsert(self, records: Iterable[VectorRecord], batch_size: int = 500,
+                    max_workers: int = 4, max_retries: int = 3, progress: Dict[str, Any] = None,
+                    on_batch: Callable[[int], None] = None) -> Dict[str, float]:
+        """Write a stream of records; returns records, batches, retries, seconds and records_per_second
+
+        on_batch, if given, is called with the size of each batch once it is written.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Nearest-neighbour search, returning one list of {"id", "document", "metadata", "distance"} per query
+
+        Distances are squared L2, so for unit vectors distance = 2 - 2 * cosine.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, ids: Iterable[str], batch_size: int = 500) -> int:
+        """Delete records by id; returns the number of ids removed"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def health_check(self) -> bool:
+        """True if the store is usable, reconnecting first if needed"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection or concurrency statistics for /api/stats and /metrics"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def close(self):
+        """Release connections and files"""
+        raise NotImplementedError
+
+def get_vector_backend() -> str:
+    """Configured vector store backend: chroma (default) or local"""
+    backend = os.getenv("VECTOR_BACKEND", "chroma").lower()
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend '{backend}', expected one of {', '.join(VECTOR_BACKENDS)}")
+    return backend
+
+# Global vector store instance
+vector_store = None
+
+def get_vector_store() -> VectorStore:
+    """Get or create the global vector store for the configured backend"""
+    global vector_store
+    if vector_store is None:
+        if get_vector_backend() == "local":
+            from .local_vector import LocalVectorStore
+            vector_store = LocalVectorStore()
+        else:
+            from .vector import get_chroma_client
+            vector_store = get_chroma_client()
+    return vector_store
+
+def close_vector_store():
+    """Close the global vector store"""
+    global vector_store
+    if vector_store is not None:
+        from . import vector
+        if vector_store is vector.chroma_client:
+            vector.close_chroma_client()
+        else:
+            vector_store.close()
+        vector_store = None
@@ -3,20 +3,48 @@ import chromadb
 from chromadb.config import Settings
 import os
 import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List
 from dotenv import load_dotenv
+from .pool import ConnectionSlots
+from .store import VectorRecord, VectorStore
+from ..runtime.metrics import VECTOR_LATENCY, observe
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-class ChromaDBClient:
+# Errors worth retrying: the server or network hiccuped, the request itself was fine
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+try:
+    import httpx
+    TRANSIENT_ERRORS += (httpx.TransportError,)
+except ImportError:
+    pass
+
+class ChromaDBClient(VectorStore):
     """ChromaDB Vector Database Client"""
     
-    def __init__(self, host: str = None, port: int = None, collection_name: str = None):
+    def __init__(self, host: str = None, port: int = None, collection_name: str = None,
+                 pool_size: int = None, acquisition_timeout: float = None):
         """Initialize ChromaDB client"""
         self.host = host or os.getenv("CHROMA_HOST")
         self.port = port or int(os.getenv("CHROMA_PORT"))
         self.collection_name = collection_name or os.getenv("CHROMA_COLLECTION")
+        self.pool_size = pool_size or int(os.getenv("CHROMA_POOL_SIZE", "16"))
+        self.acquisition_timeout = acquisition_timeout or float(os.getenv("CHROMA_ACQUISITION_TIMEOUT", "30"))
+        self.reconnect_interval = float(os.getenv("DB_RECONNECT_INTERVAL", "5"))
+        
+        self.slots = ConnectionSlots("chroma", self.pool_size, self.acquisition_timeout)
+        self.healthy = False
+        self.reconnects = 0
+        self._last_connect_attempt = 0.0
+        self._connect_lock = threading.Lock()
         
         self.client = None
         self.collection = None
@@ -24,6 +52,7 @@ class ChromaDBClient:
     
     def _connect(self):
         """Establish connection to ChromaDB"""
+        self._last_connect_attempt = time.monotonic()
         try:
             # Initialize ChromaDB client
             self.client = chromadb.HttpClient(
@@ -37,11 +66,55 @@ class ChromaDBClient:
             
             # Get or create collection
             self._get_or_create_collection()
-            logger.info(f"Connected to ChromaDB at {self.host}:{self.port}")
+            self.healthy = True
+            logger.info(f"Connected to ChromaDB at {self.host}:{self.port} (pool size {self.pool_size})")
         except Exception as e:
+            self.healthy = False
             logger.error(f"Failed to connect to ChromaDB: {e}")
             raise
     
+    def reconnect(self) -> bool:
+        """Build a fresh HTTP client and re-resolve the collection, e.g. after the server restarted"""
+        with self._connect_lock:
+            # chromadb caches one client system per host/port; drop it so no stale state is reused
+            clear_cache = getattr(self.client, "clear_system_cache", None)
+            if clear_cache is not None:
+                clear_cache()
+            try:
+                self._connect()
+            except Exception:
+                return False
+            self.reconnects += 1
+        logger.info(f"Reconnected to ChromaDB at {self.host}:{self.port}")
+        return True
+    
+    def health_check(self) -> bool:
+        """Heartbeat the server, reconnecting if it is unreachable"""
+        try:
+            self.client.heartbeat()
+            self.healthy = True
+        except Exception as e:
+            logger.warning(f"ChromaDB health check failed: {e}")
+            self.healthy = False
+            self.reconnect()
+        return self.healthy
+    
+    @contextmanager
+    def _request(self):
+        """Hold a pool slot for one request and flag the client unhealthy on connection errors"""
+        if not self.healthy and time.monotonic() - self._last_connect_attempt >= self.reconnect_interval:
+            self.reconnect()
+        with self.slots.acquire():
+            try:
+                yield
+            except TRANSIENT_ERRORS:
+                self.healthy = False
+                raise
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool usage, wait times and connection health"""
+        return {**self.slots.stats(), "healthy": self.healthy, "reconnects": self.reconnects}
+    
     def _get_or_create_collection(self):
         """Get existing collection or create new one"""
         try:
@@ -55,6 +128,124 @@ class ChromaDBClient:
                 metadata={"description": "UFDR documents and reports"}
             )
             logger.info(f"Created new collection: {self.collection_name}")
+    
+    def _upsert_batch(self, batch: List[VectorRecord], max_retries: int) -> int:
+        """Upsert one batch, retrying transient failures with exponential backoff
+
+        Upserts are idempotent, so a retried batch that partly landed is harmless.
+        Returns the number of retries it took.
+        """
+        ids, embeddings, documents, metadatas = (list(column) for column in zip(*batch))
+        embeddings = [e.tolist() if hasattr(e, "tolist") else e for e in embeddings]
+        for attempt in range(max_retries + 1):
+            try:
+                with self._request(), observe(VECTOR_LATENCY, operation="upsert"):
+                    self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+                return attempt
+            except TRANSIENT_ERRORS as e:
+                if attempt == max_retries:
+                    raise
+                delay = min(0.5 * 2 ** attempt, 8.0) * (0.5 + random.random())
+                logger.warning(f"Chroma upsert of {len(ids)} record(s) failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    def bulk_upsert(self, records: Iterable[VectorRecord], batch_size: int = 500,
+                    max_workers: int = 4, max_retries: int = 3, progress: Dict[str, Any] = None,
+                    on_batch: Callable[[int], None] = None) -> Dict[str, float]:
+        """Write a stream of records in size-capped batches over a small pool of concurrent requests
+
+        At most 2 * max_workers batches are buffered, so the producer (usually the
+        embedder) is throttled to the write rate and memory stays bounded. If a
+        progress dict is given, its "vectors_written" is incremented as batches land,
+        and on_batch is called with the size of each batch once it is written.
+        """
+        start = time.perf_counter()
+        written = batches = retries = 0
+        records = iter(records)
+        pending = set()
+        
+        def collect(done):
+            nonlocal written, retries
+            for future in done:
+                retries += future.result()
+                written += future.batch_len
+                if progress is not None:
+                    progress["vectors_written"] = progress.get("vectors_written", 0) + future.batch_len
+                if on_batch is not None:
+                    on_batch(future.batch_len)
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chroma-upsert") as pool:
+            try:
+                for batch in iter(lambda: list(islice(records, batch_size)), []):
+                    if len(pending) >= 2 * max_workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    future = pool.submit(self._upsert_batch, batch, max_retries)
+                    future.batch_len = len(batch)
+                    pending.add(future)
+                    batches += 1
+                done, pending = wait(pending)
+                collect(done)
+            except Exception as e:
+                for future in pending:
+                    future.cancel()
+                logger.error(f"Bulk upsert to {self.collection_name} failed after {written} record(s): {e}")
+                raise
+        
+        elapsed = time.perf_counter() - start
+        stats = {
+            "records": written,
+            "batches": batches,
+            "retries": retries,
+            "seconds": elapsed,
+            "records_per_second": written / elapsed if elapsed else 0.0,
+        }
+        logger.info(f"Upserted {written} record(s) in {batches} batch(es) to {self.collection_name} "
+                    f"at {stats['records_per_second']:.0f} records/s")
+        return stats
+
+    def delete(self, ids: Iterable[str], batch_size: int = 500) -> int:
+        """Delete records by id in size-capped batches; returns the number of ids removed"""
+        ids = iter(ids)
+        deleted = 0
+        for batch in iter(lambda: list(islice(ids, batch_size)), []):
+            with self._request(), observe(VECTOR_LATENCY, operation="delete"):
+                self.collection.delete(ids=batch)
+            deleted += len(batch)
+        if deleted:
+            logger.info(f"Deleted {deleted} record(s) from {self.collection_name}")
+        return deleted
+    
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Nearest-neighbour search, returning one list of hits per query embedding
+
+        Each hit is {"id", "document", "metadata", "distance"}.
+        """
+        query_embeddings = [e.tolist() if hasattr(e, "tolist") else e for e in query_embeddings]
+        with self._request(), observe(VECTOR_LATENCY, operation="query"):
+            result = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                include=["documents", "metadatas", "distances"],
+            )
+        return [
+            [
+                {"id": id_, "document": document, "metadata": metadata or {}, "distance": distance}
+                for id_, document, metadata, distance in zip(ids, documents, metadatas, distances)
+            ]
+            for ids, documents, metadatas, distances in zip(
+                result["ids"], result["documents"], result["metadatas"], result["distances"]
+            )
+        ]
+
+    def close(self):
+        """Release the HTTP client"""
+        self.collection = None
+        self.client = None
+        self.healthy = False
+        logger.info("ChromaDB connection closed")
 
 # Global ChromaDB client instance
 chroma_client = None
@@ -70,4 +261,5 @@ def close_chroma_client():
     """Close the global ChromaDB client"""
     global chroma_client
     if chroma_client:
+        chroma_client.close()
         chroma_client = None
@@ -0,0 +1,102 @@
+import logging
+import os
+import subprocess
+import time
+from typing import Iterator, List
+import numpy as np
+from .registry import get_default_device, load_pretrained
+from ..runtime.metrics import observe_embedding
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+def iter_audio_windows(path: str, window_seconds: float = 30.0, sample_rate: int = SAMPLE_RATE) -> Iterator[np.ndarray]:
+    "Stream an audio file as mono float32 windows of at most window_seconds"
+    # ffmpeg decodes any container/codec (opus, amr, m4a, ...) and resamples; we read fixed-size PCM windows
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", path,
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-",
+    ]
+    window_bytes = int(window_seconds * sample_rate) * 2
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            data = process.stdout.read(window_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {path} (exit code {process.returncode})")
+    finally:
+        # Stop ffmpeg if the caller abandons the stream early
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+class WhisperTranscriber:
+
+    def __init__(self, model_name: str = "openai/whisper-base", device: str = None, language: str = None):
+        "Initialize Whisper model for audio transcription"
+        # Deferred so that decoding helpers such as iter_audio_windows don't pull in transformers
+        from transformers import WhisperForConditionalGeneration, WhisperProcessor
+
+        self.model_name = model_name
+        self.device = device or get_default_device()
+        self.language = language
+
+        try:
+            # Load Whisper model and processor once; every file and window reuses them
+            self.processor = WhisperProcessor.from_pretrained(model_name)
+            self.model = load_pretrained(WhisperForConditionalGeneration, model_name)
+
+            # Move model to device
+            self.model.to(self.device)
+            self.model.eval()
+
+            logger.info(f"Whisper model '{model_name}' loaded successfully on {self.device}")
+
+        except Exception as e:
+            logger.error(f"Failed to load Whisper model: {e}")
+            raise
+
+    def transcribe(self, windows: List[np.ndarray]) -> List[str]:
+        "Transcribe a batch of 16 kHz mono windows in one generate call"
+        import torch
+
+        try:
+            if not windows:
+                return []
+
+            inputs = self.processor(windows, sampling_rate=SAMPLE_RATE, return_tensors="pt")
+            input_features = inputs.input_features.to(self.device)
+
+            start = time.perf_counter()
+            with torch.no_grad():
+                generate_kwargs = {"language": self.language} if self.language else {}
+                predicted_ids = self.model.generate(input_features, **generate_kwargs)
+            observe_embedding("audio", len(windows), time.perf_counter() - start)
+
+            transcripts = self.processor.batch_decode(predicted_ids, skip_special_tokens=True)
+            logger.info(f"Transcribed {len(windows)} audio window(s)")
+            return [t.strip() for t in transcripts]
+
+        except Exception as e:
+            logger.error(f"Error transcribing audio: {e}")
+            raise
+
+# Global Whisper transcriber instance
+whisper_transcriber = None
+
+def get_whisper_transcriber() -> WhisperTranscriber:
+    "Get or create global Whisper transcriber instance"
+    global whisper_transcriber
+    if whisper_transcriber is None:
+        whisper_transcriber = WhisperTranscriber(model_name=os.getenv("WHISPER_MODEL", "openai/whisper-base"))
+    return whisper_transcriber
+
+def transcribe_audio_file(path: str, window_seconds: float = 30.0) -> List[str]:
+    "Convenience function to transcribe an audio file window by window"
+    transcriber = get_whisper_transcriber()
+    return [transcriber.transcribe([window])[0] for window in iter_audio_windows(path, window_seconds)]
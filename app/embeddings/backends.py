@@ -0,0 +1,195 @@
+import copy
+import logging
+import os
+from typing import TYPE_CHECKING, Dict, List
+import numpy as np
+
+# torch and transformers are imported by the code that runs the model, so importing this module stays cheap
+if TYPE_CHECKING:
+    import torch
+    from transformers import CLIPModel
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+def _normalize(features: np.ndarray) -> np.ndarray:
+    "L2-normalise embedding rows as float32"
+    features = features.astype(np.float32, copy=False)
+    return features / np.linalg.norm(features, axis=-1, keepdims=True)
+
+class TorchBackend:
+    "Float32 torch inference, the reference path"
+
+    name = "torch"
+
+    def __init__(self, model: "CLIPModel", device: str):
+        self.model = model
+        self.device = device
+
+    def text_features(self, input_ids: "torch.Tensor", attention_mask: "torch.Tensor") -> np.ndarray:
+        "Normalised text embeddings for a padded batch of token ids"
+        import torch
+
+        with torch.no_grad():
+            features = self.model.get_text_features(
+                input_ids=input_ids.to(self.device), attention_mask=attention_mask.to(self.device)
+            )
+        return _normalize(features.cpu().numpy())
+
+    def image_features(self, pixel_values: "torch.Tensor") -> np.ndarray:
+        "Normalised image embeddings for a batch of preprocessed pixel values"
+        import torch
+
+        with torch.no_grad():
+            features = self.model.get_image_features(pixel_values=pixel_values.to(self.device))
+        return _normalize(features.cpu().numpy())
+
+class QuantizedTorchBackend(TorchBackend):
+    "Dynamically int8-quantized Linear layers, CPU only"
+
+    name = "torch-int8"
+
+    def __init__(self, model: "CLIPModel", device: str = "cpu"):
+        import torch
+
+        if device != "cpu":
+            raise ValueError("The torch-int8 backend only runs on CPU")
+        # quantize_dynamic needs its own copy so the shared float32 weights stay intact
+        quantized = torch.quantization.quantize_dynamic(
+            copy.deepcopy(model).to("cpu"), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        quantized.eval()
+        super().__init__(quantized, "cpu")
+
+def _towers():
+    "torch.nn.Module wrappers exposing each CLIP tower's forward pass for export"
+    import torch
+
+    class TextTower(torch.nn.Module):
+        def __init__(self, model: "CLIPModel"):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+    class VisionTower(torch.nn.Module):
+        def __init__(self, model: "CLIPModel"):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model.get_image_features(pixel_values=pixel_values)
+
+    return TextTower, VisionTower
+
+class ONNXBackend:
+    "ONNX Runtime sessions for the exported text and vision towers, CPU only"
+
+    name = "onnx"
+
+    def __init__(self, model: "CLIPModel", model_name: str, device: str = "cpu", export_dir: str = None):
+        if device != "cpu":
+            raise ValueError("The onnx backend only runs on CPU")
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx backend requires the onnxruntime package") from e
+
+        self.device = "cpu"
+        export_dir = export_dir or os.getenv("CLIP_ONNX_DIR", "data/onnx")
+        model_dir = os.path.join(export_dir, model_name.replace("/", "__"))
+        os.makedirs(model_dir, exist_ok=True)
+
+        text_path = os.path.join(model_dir, "text.onnx")
+        vision_path = os.path.join(model_dir, "vision.onnx")
+        # Export once per model; later processes load the cached graphs directly
+        if not os.path.exists(text_path) or not os.path.exists(vision_path):
+            self._export(model.to("cpu"), text_path, vision_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.text_session = ort.InferenceSession(text_path, options, providers=["CPUExecutionProvider"])
+        self.vision_session = ort.InferenceSession(vision_path, options, providers=["CPUExecutionProvider"])
+        logger.info(f"ONNX Runtime sessions ready for '{model_name}' from {model_dir}")
+
+    @staticmethod
+    def _export(model: "CLIPModel", text_path: str, vision_path: str):
+        "Export both CLIP towers with dynamic batch (and sequence) axes"
+        import torch
+
+        TextTower, VisionTower = _towers()
+        logger.info(f"Exporting CLIP towers to ONNX: {text_path}, {vision_path}")
+        image_size = model.config.vision_config.image_size
+        input_ids = torch.ones((2, 8), dtype=torch.long)
+        attention_mask = torch.ones((2, 8), dtype=torch.long)
+        pixel_values = torch.zeros((2, 3, image_size, image_size), dtype=torch.float32)
+
+        with torch.no_grad():
+            torch.onnx.export(
+                TextTower(model), (input_ids, attention_mask), text_path,
+                input_names=["input_ids", "attention_mask"], output_names=["text_embeds"],
+                dynamic_axes={"input_ids": {0: "batch", 1: "sequence"},
+                              "attention_mask": {0: "batch", 1: "sequence"},
+                              "text_embeds": {0: "batch"}},
+                opset_version=17,
+            )
+            torch.onnx.export(
+                VisionTower(model), (pixel_values,), vision_path,
+                input_names=["pixel_values"], output_names=["image_embeds"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+                opset_version=17,
+            )
+
+    def text_features(self, input_ids: "torch.Tensor", attention_mask: "torch.Tensor") -> np.ndarray:
+        "Normalised text embeddings for a padded batch of token ids"
+        (features,) = self.text_session.run(None, {
+            "input_ids": input_ids.cpu().numpy().astype(np.int64),
+            "attention_mask": attention_mask.cpu().numpy().astype(np.int64),
+        })
+        return _normalize(features)
+
+    def image_features(self, pixel_values: "torch.Tensor") -> np.ndarray:
+        "Normalised image embeddings for a batch of preprocessed pixel values"
+        (features,) = self.vision_session.run(None, {"pixel_values": pixel_values.cpu().numpy().astype(np.float32)})
+        return _normalize(features)
+
+def create_backend(name: str, model: "CLIPModel", model_name: str, device: str):
+    "Build an inference backend by name around a loaded CLIP model"
+    if name == "torch":
+        return TorchBackend(model, device)
+    if name == "torch-int8":
+        return QuantizedTorchBackend(model, device)
+    if name == "onnx":
+        return ONNXBackend(model, model_name, device)
+    raise ValueError(f"Unknown CLIP backend '{name}', expected one of {BACKENDS}")
+
+def check_backend_parity(backend: str, texts: List[str], images: list = None,
+                         model_name: str = None, device: str = "cpu") -> Dict[str, float]:
+    "Compare a backend against the float32 torch path and report cosine agreement"
+    from .registry import DEFAULT_MODEL_NAME, get_clip_backend, get_clip_model
+
+    model_name = model_name or DEFAULT_MODEL_NAME
+    _, processor = get_clip_model(model_name, device)
+    reference = get_clip_backend(model_name, device, "torch")
+    candidate = get_clip_backend(model_name, device, backend)
+
+    report = {"backend": backend}
+    text_inputs = processor.tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+    expected = reference.text_features(text_inputs["input_ids"], text_inputs["attention_mask"])
+    actual = candidate.text_features(text_inputs["input_ids"], text_inputs["attention_mask"])
+    cosine = np.sum(expected * actual, axis=-1)
+    report["text_cosine_mean"] = float(cosine.mean())
+    report["text_cosine_min"] = float(cosine.min())
+
+    if images:
+        pixel_values = processor(images=images, return_tensors="pt")["pixel_values"]
+        expected = reference.image_features(pixel_values)
+        actual = candidate.image_features(pixel_values)
+        cosine = np.sum(expected * actual, axis=-1)
+        report["image_cosine_mean"] = float(cosine.mean())
+        report["image_cosine_min"] = float(cosine.min())
+
+    logger.info(f"Backend parity for '{backend}' vs float32 torch: {report}")
+    return report
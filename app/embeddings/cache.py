@@ -0,0 +1,137 @@
+import sqlite3
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Union
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    "Content-addressed embedding cache: in-memory LRU in front of a SQLite store"
+
+    def __init__(self, path: str = None, max_memory_items: int = 50000):
+        "Open (or create) the on-disk cache"
+        self.path = path or os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.db")
+        self.max_memory_items = max_memory_items
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by all threads; access is serialised by self._lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        logger.info(f"Embedding cache opened at {self.path}")
+
+    @staticmethod
+    def make_key(model_name: str, kind: str, content: Union[str, bytes]) -> str:
+        "Build a cache key from the model name, the input kind and a hash of the content"
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        return f"{model_name}:{kind}:{digest}"
+
+    def _remember(self, key: str, vector: np.ndarray):
+        "Insert into the in-memory LRU, evicting the least recently used entries"
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        "Look up keys, returning only the ones that are cached"
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+            # SQLite limits bound parameters per statement, so query in slices
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(key, vector)
+                    found[key] = vector
+                    self.disk_hits += 1
+
+            self.misses += len(set(keys) - found.keys())
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        "Store embeddings in memory and on disk"
+        if not items:
+            return
+        with self._lock:
+            rows = []
+            for key, vector in items.items():
+                vector = np.ascontiguousarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, key.split(":", 1)[0], vector.tobytes()))
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        "Hit/miss counters for the cache"
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+    def close(self):
+        "Close the on-disk store"
+        with self._lock:
+            self._conn.close()
+            self._memory.clear()
+        logger.info("Embedding cache closed")
+
+# Global embedding cache instance
+embedding_cache = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    "Get or create global embedding cache, or None when disabled via EMBEDDING_CACHE_ENABLED"
+    global embedding_cache
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    if embedding_cache is None:
+        embedding_cache = EmbeddingCache()
+    return embedding_cache
+
+def close_embedding_cache():
+    "Close the global embedding cache"
+    global embedding_cache
+    if embedding_cache:
+        embedding_cache.close()
+        embedding_cache = None
@@ -1,82 +1,207 @@
-import torch
-from transformers import CLIPProcessor, CLIPModel
 import logging
-from typing import List, Union
+import os
+import time
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Union
 import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from .cache import EmbeddingCache, get_embedding_cache
+from .registry import DEFAULT_MODEL_NAME, get_clip_backend, get_clip_model, get_default_backend, get_default_device
+from ..runtime.metrics import observe_cache, observe_embedding
 from PIL import Image
 
+# Only annotations need torch; the backend imports it when the first batch runs
+if TYPE_CHECKING:
+    import torch
+
 logger = logging.getLogger(__name__)
 
+ImageInput = Union[str, np.ndarray, Image.Image]
+
 class CLIPImageEmbedder:
     
-    def __init__(self, model_name: str = "openai/clip-vit-base-patch32"):
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, device: str = None, batch_size: int = 32,
+                 preprocess_workers: int = 0, prefetch_batches: int = 2, cache: EmbeddingCache = None,
+                 backend: str = None):
         "Initialize CLIP model for image embedding"
         self.model_name = model_name
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device or get_default_device()
+        self.batch_size = batch_size
+        # With preprocess_workers > 0 images are decoded on a thread pool while the model runs
+        self.preprocess_workers = preprocess_workers
+        self.prefetch_batches = prefetch_batches
+        # Optional content-addressed cache; only images it has never seen are embedded
+        self.cache = cache
+        self.cache_hits = 0
+        self.cache_misses = 0
         
-        try:
-            # Load CLIP model and processor
-            self.model = CLIPModel.from_pretrained(model_name)
-            self.processor = CLIPProcessor.from_pretrained(model_name)
-            
-            # Move model to device
-            self.model.to(self.device)
-            self.model.eval()
-            
-            logger.info(f"CLIP model '{model_name}' loaded successfully on {self.device}")
-            
-        except Exception as e:
-            logger.error(f"Failed to load CLIP model: {e}")
-            raise
+        # Weights are shared with every other embedder using the same model and device
+        self.model, self.processor = get_clip_model(model_name, self.device)
+        # Inference runs through a pluggable backend: torch (float32), torch-int8 or onnx
+        self.backend_name = backend or get_default_backend()
+        self.backend = get_clip_backend(model_name, self.device, self.backend_name)
+        
+    def load_image(self, image: ImageInput) -> Image.Image:
+        "Load a PIL image in RGB mode from a path, URL, numpy array or PIL image"
+        # Handle different input types
+        if isinstance(image, str):
+            # Check if it's a URL or file path
+            if image.startswith(('http://', 'https://')):
+                # Download image from URL
+                import requests
+                import io
+                response = requests.get(image)
+                response.raise_for_status()
+                image = Image.open(io.BytesIO(response.content))
+            else:
+                # Load image from file path
+                image = Image.open(image)
+        elif isinstance(image, np.ndarray):
+            # Convert numpy array to PIL Image
+            image = Image.fromarray(image)
+        
+        # CLIP expects 3-channel input; palette, greyscale and RGBA images are converted
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image
+    
+    def embed_pixel_values(self, pixel_values: "torch.Tensor") -> np.ndarray:
+        "Run one CLIP vision forward pass over preprocessed pixel values"
+        # Normalized float32 embeddings from the configured backend
+        start = time.perf_counter()
+        embeddings = self.backend.image_features(pixel_values)
+        observe_embedding("image", len(pixel_values), time.perf_counter() - start)
+        return embeddings
+    
+    def preprocess_images(self, images: List[ImageInput]) -> "torch.Tensor":
+        "Decode and preprocess a batch of images into CLIP pixel values"
+        batch = [self.load_image(img) for img in images]
+        return self.processor(images=batch, return_tensors="pt")["pixel_values"]
+    
+    def iter_image_embeddings(self, images: Iterable[ImageInput], batch_size: int = None,
+                              preprocess_workers: int = None) -> Iterator[np.ndarray]:
+        "Yield one (B, D) embedding array per micro-batch of images"
+        batch_size = batch_size or self.batch_size
+        workers = self.preprocess_workers if preprocess_workers is None else preprocess_workers
+        images = iter(images)
+        chunks = iter(lambda: list(islice(images, batch_size)), [])
         
-    def embed_image(self, image: Union[str, np.ndarray, Image.Image]) -> np.ndarray:
-        "Generate embeddings for image using CLIP model"
+        if workers <= 0:
+            for chunk in chunks:
+                yield self.embed_pixel_values(self.preprocess_images(chunk))
+            return
+        
+        # Keep a bounded number of batches decoding ahead of the model for backpressure
+        max_pending = workers + self.prefetch_batches
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clip-preprocess") as pool:
+            try:
+                for chunk in chunks:
+                    pending.append(pool.submit(self.preprocess_images, chunk))
+                    if len(pending) >= max_pending:
+                        yield self.embed_pixel_values(pending.popleft().result())
+                while pending:
+                    yield self.embed_pixel_values(pending.popleft().result())
+            finally:
+                # Don't decode batches nobody will consume if the caller stops early or a batch fails
+                for future in pending:
+                    future.cancel()
+    
+    def content_key(self, image: ImageInput) -> str:
+        "Build the embedding cache key for an image from its content"
+        if isinstance(image, str):
+            if image.startswith(('http://', 'https://')):
+                # Remote images are keyed by URL so cache hits skip the download
+                content = image
+            else:
+                with open(image, "rb") as f:
+                    content = f.read()
+        elif isinstance(image, np.ndarray):
+            content = f"{image.shape}{image.dtype}".encode() + image.tobytes()
+        else:
+            content = f"{image.mode}{image.size}".encode() + image.tobytes()
+        return EmbeddingCache.make_key(f"{self.model_name}@{self.backend_name}", "image", content)
+    
+    def _embed_uncached(self, images: Iterable[ImageInput], batch_size: int = None,
+                        preprocess_workers: int = None) -> np.ndarray:
+        "Embed images micro-batch by micro-batch into one (N, D) array"
+        # Only a bounded number of micro-batches of decoded images is held in memory at a time
+        batches = list(self.iter_image_embeddings(images, batch_size, preprocess_workers))
+        if not batches:
+            return np.empty((0, self.get_embedding_dimension()), dtype=np.float32)
+        return np.concatenate(batches, axis=0)
+    
+    def _embed_cached(self, images: List[ImageInput], batch_size: int = None,
+                      preprocess_workers: int = None) -> np.ndarray:
+        "Embed a window of images, running only the ones missing from the cache through the model"
+        keys = [self.content_key(img) for img in images]
+        cached = self.cache.get_many(keys)
+        
+        # Embed each distinct uncached image once, even if it repeats in the window
+        missing = {}
+        for index, key in enumerate(keys):
+            if key not in cached and key not in missing:
+                missing[key] = index
+        self.cache_hits += len(images) - len(missing)
+        self.cache_misses += len(missing)
+        observe_cache("image", len(images) - len(missing), len(missing))
+        
+        if missing:
+            fresh = self._embed_uncached([images[i] for i in missing.values()], batch_size, preprocess_workers)
+            fresh = dict(zip(missing.keys(), fresh))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+        
+        embeddings = np.empty((len(images), self.get_embedding_dimension()), dtype=np.float32)
+        for index, key in enumerate(keys):
+            embeddings[index] = cached[key]
+        return embeddings
+    
+    def embed_image(self, image: Union[ImageInput, Iterable[ImageInput]], batch_size: int = None,
+                    preprocess_workers: int = None) -> np.ndarray:
+        "Generate embeddings for one image or many images using CLIP model"
         try:
-            # Handle different input types
-            if isinstance(image, str):
-                # Check if it's a URL or file path
-                if image.startswith(('http://', 'https://')):
-                    # Download image from URL
-                    import requests
-                    import io
-                    response = requests.get(image)
-                    response.raise_for_status()
-                    image = Image.open(io.BytesIO(response.content))
-                else:
-                    # Load image from file path
-                    image = Image.open(image)
-            elif isinstance(image, np.ndarray):
-                # Convert numpy array to PIL Image
-                image = Image.fromarray(image)
-            
-            # Process image through CLIP
-            inputs = self.processor(images=image, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            # Ensure images is an iterable of images
+            images = [image] if isinstance(image, (str, np.ndarray, Image.Image)) else image
             
-            # Generate embeddings
-            with torch.no_grad():
-                image_features = self.model.get_image_features(**inputs)
-                # Normalize embeddings
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+            if self.cache is None:
+                embeddings = self._embed_uncached(images, batch_size, preprocess_workers)
+            else:
+                # The input is consumed window by window, so a long stream of images is never held
+                # as a whole; a window spans enough micro-batches to keep the preprocess pool busy
+                batch_size = batch_size or self.batch_size
+                workers = self.preprocess_workers if preprocess_workers is None else preprocess_workers
+                window = batch_size * (workers + self.prefetch_batches if workers > 0 else 1)
+                images = iter(images)
+                parts = [self._embed_cached(chunk, batch_size, preprocess_workers)
+                         for chunk in iter(lambda: list(islice(images, window)), [])]
+                embeddings = np.concatenate(parts, axis=0) if parts else \
+                    np.empty((0, self.get_embedding_dimension()), dtype=np.float32)
             
-            # Convert to numpy and move to CPU
-            embeddings = image_features.cpu().numpy()
-            
-            logger.info(f"Generated embeddings for image, shape: {embeddings.shape}")
+            logger.info(f"Generated embeddings for {embeddings.shape[0]} image(s), shape: {embeddings.shape}")
             return embeddings
             
         except Exception as e:
             logger.error(f"Error generating image embeddings: {e}")
             raise
         
-    def embed_single_image(self, image: Union[str, np.ndarray, Image.Image]) -> np.ndarray:
+    def warm_up(self, images: List[ImageInput] = None) -> np.ndarray:
+        "Run a forward pass that bypasses the cache, so the first real query pays no start-up cost"
+        return self._embed_uncached(images or [Image.new("RGB", (224, 224))])
+        
+    def embed_single_image(self, image: ImageInput) -> np.ndarray:
         "Generate embedding for a single image"
         embeddings = self.embed_image(image)
         return embeddings[0]
     
     def get_embedding_dimension(self) -> int:
         "Get the dimension of the embeddings"
-        return self.model.config.vision_config.hidden_size
+        return self.model.config.projection_dim
+    
+    def get_cache_stats(self) -> dict:
+        "Get embedding cache hit/miss counters for this embedder"
+        return {"hits": self.cache_hits, "misses": self.cache_misses}
     
 # Global CLIP image embedder instance
 clip_image_embedder = None
@@ -85,15 +210,18 @@ def get_clip_image_embedder() -> CLIPImageEmbedder:
     "Get or create global CLIP image embedder instance"
     global clip_image_embedder
     if clip_image_embedder is None:
-        clip_image_embedder = CLIPImageEmbedder()
+        clip_image_embedder = CLIPImageEmbedder(
+            preprocess_workers=int(os.getenv("CLIP_PREPROCESS_WORKERS", "0")),
+            cache=get_embedding_cache()
+        )
     return clip_image_embedder
 
-def embed_image_data(image: Union[str, np.ndarray, Image.Image]) -> np.ndarray:
-    "Convenience function to embed image data using CLIP"
+def embed_image_data(image: Union[ImageInput, Iterable[ImageInput]]) -> np.ndarray:
+    "Convenience function to embed one or more images using CLIP"
     embedder = get_clip_image_embedder()
     return embedder.embed_image(image)
 
-def embed_single_image_data(image: Union[str, np.ndarray, Image.Image]) -> np.ndarray:
+def embed_single_image_data(image: ImageInput) -> np.ndarray:
     "Convenience function to embed a single image using CLIP"
     embedder = get_clip_image_embedder()
     return embedder.embed_single_image(image)
\ No newline at end of file
@@ -0,0 +1,103 @@
+import importlib.util
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Tuple
+
+# torch and transformers take seconds to import; they are loaded with the first model, not with this module
+if TYPE_CHECKING:
+    from transformers import CLIPModel, CLIPProcessor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "openai/clip-vit-base-patch32"
+
+# Loaded (model, processor) pairs keyed by (model_name, device)
+_clip_models: Dict[Tuple[str, str], Tuple["CLIPModel", "CLIPProcessor"]] = {}
+_clip_models_lock = threading.Lock()
+
+# Inference backends keyed by (model_name, device, backend); they wrap the shared models above
+_clip_backends: Dict[Tuple[str, str, str], object] = {}
+_clip_backends_lock = threading.Lock()
+
+def get_default_device() -> str:
+    "Pick the device embedders run on when none is given"
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def load_pretrained(model_class, model_name: str):
+    """Load model weights, memory-mapping safetensors files where the checkpoint has them
+
+    With accelerate installed, weights are assigned straight from the mapped file
+    instead of first initialising random parameters and copying over them.
+    """
+    start = time.perf_counter()
+    kwargs = {"low_cpu_mem_usage": True} if importlib.util.find_spec("accelerate") else {}
+    if os.getenv("MODEL_USE_SAFETENSORS", "true").lower() == "true":
+        try:
+            model = model_class.from_pretrained(model_name, use_safetensors=True, **kwargs)
+            logger.info(f"Loaded '{model_name}' from safetensors in {time.perf_counter() - start:.2f}s")
+            return model
+        except OSError as e:
+            # Checkpoints published only as pytorch_model.bin
+            logger.info(f"No safetensors weights for '{model_name}', loading the pickled checkpoint: {e}")
+    model = model_class.from_pretrained(model_name, **kwargs)
+    logger.info(f"Loaded '{model_name}' in {time.perf_counter() - start:.2f}s")
+    return model
+
+def get_clip_model(model_name: str = DEFAULT_MODEL_NAME, device: str = None) -> Tuple["CLIPModel", "CLIPProcessor"]:
+    "Get or load the shared CLIP model and processor for a model name and device"
+    from transformers import CLIPModel, CLIPProcessor
+
+    device = device or get_default_device()
+    key = (model_name, device)
+
+    # Hold the lock while loading so concurrent callers wait for one load instead of racing
+    with _clip_models_lock:
+        if key not in _clip_models:
+            try:
+                model = load_pretrained(CLIPModel, model_name)
+                processor = CLIPProcessor.from_pretrained(model_name)
+
+                # Move model to device
+                model.to(device)
+                model.eval()
+
+                _clip_models[key] = (model, processor)
+                logger.info(f"CLIP model '{model_name}' loaded successfully on {device}")
+
+            except Exception as e:
+                logger.error(f"Failed to load CLIP model: {e}")
+                raise
+        return _clip_models[key]
+
+def get_default_backend() -> str:
+    "Pick the inference backend embedders use when none is given"
+    return os.getenv("CLIP_BACKEND", "torch")
+
+def get_clip_backend(model_name: str = DEFAULT_MODEL_NAME, device: str = None, backend: str = None):
+    "Get or build the shared inference backend for a model name, device and backend name"
+    from .backends import create_backend
+
+    device = device or get_default_device()
+    backend = backend or get_default_backend()
+    key = (model_name, device, backend)
+
+    with _clip_backends_lock:
+        if key not in _clip_backends:
+            model, _ = get_clip_model(model_name, device)
+            _clip_backends[key] = create_backend(backend, model, model_name, device)
+            logger.info(f"CLIP backend '{backend}' ready for '{model_name}' on {device}")
+        return _clip_backends[key]
+
+def release_clip_model(model_name: str = DEFAULT_MODEL_NAME, device: str = None):
+    "Drop the registry reference to a loaded CLIP model"
+    device = device or get_default_device()
+    with _clip_backends_lock:
+        for key in [key for key in _clip_backends if key[:2] == (model_name, device)]:
+            del _clip_backends[key]
+    with _clip_models_lock:
+        if _clip_models.pop((model_name, device), None) is not None:
+            logger.info(f"CLIP model '{model_name}' released from {device}")
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for embedding, indexing and retrieval
+
+Everything runs locally: chat messages and images are generated from a fixed
+seed, the CLIP model must already be in the Hugging Face cache (or be given as
+a local path), and the vector store runs in-process instead of over HTTP. Results are
+written as JSON so runs from different commits can be compared with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+# Never reach out to the Hugging Face Hub; set before transformers is imported
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import numpy as np
+from PIL import Image
+
+# Add the project root to the path so we can import our modules
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from app.config.local_vector import LocalVectorStore, ReportIndex
+from app.config.vector import ChromaDBClient
+from app.embeddings.image import CLIPImageEmbedder
+from app.embeddings.registry import DEFAULT_MODEL_NAME
+from app.embeddings.text import CLIPTextEmbedder
+from app.insertion.manifest import IngestionManifest
+from app.insertion.text_pipeline import TextIngestionPipeline
+from app.retrieval import result_cache
+from app.retrieval.lexical import LexicalIndex
+
+# Metrics where a larger value is better; everything else (latency, memory) should go down
+HIGHER_IS_BETTER = ("items_per_second", "chunks_per_second", "recall")
+
+NAMES = ["Arjun", "Priya", "Rahul", "Sneha", "Vikram", "Ananya", "Karan", "Meera"]
+TOPICS = ["the shipment", "the meeting", "the payment", "the car", "the flight", "the package", "the account"]
+PLACES = ["the airport", "the warehouse", "Sector 17", "the station", "the hotel", "the border", "the office"]
+TEMPLATES = [
+    "{name}: did you sort out {topic}? call me before {time}",
+    "{name}: meet me at {place} at {time}, bring {topic}",
+    "{name}: transfer for {topic} is done, {amount} sent to the usual account",
+    "{name}: delete these messages after reading. {topic} moves tonight from {place}",
+    "{name}: ok",
+    "{name}: running late, stuck near {place}. will update you on {topic} when I reach, "
+    "don't tell anyone else about it until {time}",
+]
+
+class LocalChromaClient(ChromaDBClient):
+    """ChromaDBClient backed by an in-process ephemeral Chroma instead of a server"""
+
+    def __init__(self, collection_name: str = "benchmark"):
+        super().__init__(host="in-process", port=1, collection_name=collection_name)
+
+    def _connect(self):
+        import chromadb
+        from chromadb.config import Settings
+
+        self._last_connect_attempt = time.monotonic()
+        self.client = chromadb.EphemeralClient(settings=Settings(allow_reset=True, anonymized_telemetry=False))
+        self._get_or_create_collection()
+        self.healthy = True
+
+class RSSSampler:
+    """Sample resident memory on a background thread and keep the peak for one stage"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current_mb() -> float:
+        """Current resident set size in MB, falling back to the process peak"""
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        except (OSError, ValueError, IndexError):
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self.current_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_mb = self.current_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self.current_mb())
+
+def latency_summary(seconds: list) -> dict:
+    """Mean, median and tail latency in milliseconds"""
+    ms = np.asarray(seconds) * 1000
+    return {
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "max_ms": float(ms.max()),
+    }
+
+def synthetic_messages(count: int, seed: int) -> list:
+    """Chat-message-like texts of varied length"""
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(
+            name=rng.choice(NAMES), topic=rng.choice(TOPICS), place=rng.choice(PLACES),
+            time=f"{rng.randint(0, 23):02d}:{rng.choice(['00', '15', '30', '45'])}",
+            amount=f"Rs {rng.randint(1, 500) * 100}",
+        )
+        for _ in range(count)
+    ]
+
+def synthetic_images(count: int, seed: int) -> list:
+    """Noise, gradients and blocks at phone-photo-like sizes"""
+    rng = np.random.default_rng(seed)
+    sizes = [(640, 480), (1024, 768), (480, 640), (1280, 720), (320, 320)]
+    images = []
+    for index in range(count):
+        width, height = sizes[index % len(sizes)]
+        if index % 3 == 0:
+            pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        else:
+            x = np.linspace(0, 255, width, dtype=np.float32)
+            y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+            base = (x * rng.random() + y * rng.random()) % 256
+            pixels = np.stack([base, np.roll(base, index, axis=1), 255 - base], axis=-1).astype(np.uint8)
+        images.append(Image.fromarray(pixels))
+    return images
+
+def write_synthetic_report(directory: str, rows: int, seed: int) -> str:
+    """A chat-export style text report"""
+    path = os.path.join(directory, "benchmark_report.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        for line in synthetic_messages(rows, seed):
+            f.write(line + "\n\n")
+    return path
+
+def bench_text(embedder: CLIPTextEmbedder, texts: list, batch_sizes: list) -> list:
+    """Text embedding throughput and per-call latency for each caller batch size"""
+    embedder.embed_text(texts[:8])  # Warm-up
+    results = []
+    for batch_size in batch_sizes:
+        calls = []
+        with RSSSampler() as rss:
+            start = time.perf_counter()
+            for offset in range(0, len(texts), batch_size):
+                call_start = time.perf_counter()
+                embedder.embed_text(texts[offset:offset + batch_size])
+                calls.append(time.perf_counter() - call_start)
+            elapsed = time.perf_counter() - start
+        results.append({"batch_size": batch_size, "items": len(texts), "seconds": elapsed,
+                        "items_per_second": len(texts) / elapsed, "peak_rss_mb": rss.peak_mb,
+                        **latency_summary(calls)})
+        print(f"   text  batch {batch_size:>4}: {len(texts) / elapsed:8.1f} items/s, peak RSS {rss.peak_mb:.0f} MB")
+    return results
+
+def bench_images(embedder: CLIPImageEmbedder, images: list, batch_sizes: list, preprocess_workers: int) -> list:
+    """Image embedding throughput for each micro-batch size"""
+    embedder.embed_image(images[:2], batch_size=2, preprocess_workers=preprocess_workers)  # Warm-up
+    results = []
+    for batch_size in batch_sizes:
+        with RSSSampler() as rss:
+            start = time.perf_counter()
+            embedder.embed_image(images, batch_size=batch_size, preprocess_workers=preprocess_workers)
+            elapsed = time.perf_counter() - start
+        results.append({"batch_size": batch_size, "items": len(images), "seconds": elapsed,
+                        "items_per_second": len(images) / elapsed, "peak_rss_mb": rss.peak_mb,
+                        "preprocess_workers": preprocess_workers})
+        print(f"   image batch {batch_size:>4}: {len(images) / elapsed:8.1f} items/s, peak RSS {rss.peak_mb:.0f} MB")
+    return results
+
+def bench_ingest_and_query(embedder: CLIPTextEmbedder, workdir: str, rows: int, queries: int, seed: int,
+                           vector_backend: str = "chroma") -> dict:
+    """Ingest a synthetic report into an in-process store, re-ingest it unchanged, then time top-k queries
+
+    Every store the pipeline writes to lives under workdir, and the query cache it
+    invalidates is a private one, so runs neither touch data/ nor affect each other.
+    """
+    if vector_backend == "local":
+        client = LocalVectorStore(os.path.join(workdir, "vectors"))
+    else:
+        client = LocalChromaClient()
+    manifest = IngestionManifest(os.path.join(workdir, "manifest.db"))
+    lexical_index = LexicalIndex(os.path.join(workdir, "lexical"))
+    pipeline = TextIngestionPipeline(embedder, client, manifest=manifest, lexical_index=lexical_index)
+    path = write_synthetic_report(workdir, rows, seed)
+
+    shared_cache, result_cache.query_cache = result_cache.query_cache, result_cache.QueryResultCache()
+    try:
+        with RSSSampler() as rss:
+            first = pipeline.ingest_file(path, "benchmark")
+        unchanged = pipeline.ingest_file(path, "benchmark")
+    finally:
+        result_cache.query_cache = shared_cache
+        lexical_index.close()
+        manifest.close()
+    print(f"   ingest: {first['chunks']} chunks at {first['chunks_per_second']:.1f} chunks/s, "
+          f"unchanged re-ingest {unchanged['seconds'] * 1000:.1f} ms")
+
+    questions = synthetic_messages(queries, seed + 1)
+    embed_times, search_times = [], []
+    for question in questions:
+        start = time.perf_counter()
+        embedding = embedder.embed_single_text(question)
+        embed_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        client.query([embedding], n_results=8, where={"report_id": "benchmark"})
+        search_times.append(time.perf_counter() - start)
+    query = {"queries": queries, "embed": latency_summary(embed_times), "search": latency_summary(search_times)}
+    print(f"   query: embed p95 {query['embed']['p95_ms']:.1f} ms, search p95 {query['search']['p95_ms']:.1f} ms")
+
+    return {
+        "ingest": {"rows": rows, "chunks": first["chunks"], "seconds": first["seconds"],
+                   "chunks_per_second": first["chunks_per_second"], "peak_rss_mb": rss.peak_mb,
+                   "unchanged_reingest_ms": unchanged["seconds"] * 1000},
+        "query": query,
+    }
+
+def synthetic_embeddings(count: int, dimension: int, seed: int, clusters: int = 256) -> np.ndarray:
+    """Unit vectors scattered around random centres, standing in for CLIP embeddings of a report"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)] + 0.5 * rng.normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def bench_quantization(workdir: str, count: int, queries: int, seed: int, k: int = 10,
+                       dimension: int = 512) -> dict:
+    """recall@k, bytes per vector and query latency of each stored precision against exact float32 search"""
+    vectors = synthetic_embeddings(count, dimension, seed)
+    rng = np.random.default_rng(seed + 1)
+    questions = vectors[rng.choice(count, queries, replace=False)] + 0.3 * rng.normal(size=(queries, dimension))
+    questions = (questions / np.linalg.norm(questions, axis=1, keepdims=True)).astype(np.float32)
+    truth = [set(np.argsort(((vectors - q) ** 2).sum(axis=1))[:k]) for q in questions]
+
+    results = {"vectors": count, "queries": queries, "k": k}
+    for name, dtype, keep_full in (("float32", "float32", True), ("float16", "float16", True),
+                                   ("int8", "int8", True), ("int8_codes_only", "int8", False)):
+        # Brute force only, so the numbers isolate quantization from IVF probing
+        index = ReportIndex(os.path.join(workdir, name), [], ivf_threshold=count + 1, nprobe=1,
+                            dtype=dtype, keep_full=keep_full)
+        index.write(index.allocate(count), vectors)
+        times, recall = [], []
+        for question, expected in zip(questions, truth):
+            start = time.perf_counter()
+            rows, _ = index.search(question, k)
+            times.append(time.perf_counter() - start)
+            recall.append(len(expected.intersection(rows.tolist())) / k)
+        scanned = dimension * np.dtype(dtype).itemsize + (4 if dtype == "int8" else 0) + 4
+        results[name] = {"recall": float(np.mean(recall)), "bytes_per_vector": index.bytes_per_vector,
+                         "scanned_bytes_per_vector": scanned, **latency_summary(times)}
+        index.close()
+        print(f"   {name:<16} recall@{k} {results[name]['recall']:.3f}, "
+              f"{results[name]['bytes_per_vector']} B/vector on disk, "
+              f"{scanned} B/vector scanned, p50 {results[name]['p50_ms']:.2f} ms")
+    return results
+
+def environment(args) -> dict:
+    """Where and how the benchmark ran, so results are comparable"""
+    import torch
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=project_root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "model": args.model,
+        "device": args.device,
+        "backend": args.backend,
+        "vector_backend": args.vector_backend,
+        "seed": args.seed,
+    }
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """Numeric leaves keyed by path, with batch results keyed by batch size"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, list):
+            for item in value:
+                flat.update(flatten({k: v for k, v in item.items() if k != "batch_size"},
+                                    f"{path}[{item.get('batch_size')}]."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Metrics that got worse than the baseline by more than threshold (a fraction)"""
+    current, previous = flatten(results["benchmarks"]), flatten(baseline["benchmarks"])
+    regressions = []
+    for key, value in current.items():
+        old = previous.get(key)
+        if not old or not (key.endswith("_ms") or key.endswith("_mb") or key.endswith(HIGHER_IS_BETTER)):
+            continue
+        change = (value - old) / old
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        if worse > threshold:
+            regressions.append({"metric": key, "baseline": old, "current": value, "change": change})
+    return regressions
+
+def main():
+    """Run the benchmark and write the results"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help="Model name in the local HF cache, or a path")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--backend", default="torch", help="torch, torch-int8 or onnx")
+    parser.add_argument("--vector-backend", default="chroma", choices=["chroma", "local"],
+                        help="In-process Chroma or the local memory-mapped index")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--images", type=int, default=128)
+    parser.add_argument("--text-batch-sizes", default="1,8,32,128")
+    parser.add_argument("--image-batch-sizes", default="1,8,32")
+    parser.add_argument("--preprocess-workers", type=int, default=0)
+    parser.add_argument("--report-rows", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quantization-vectors", type=int, default=50000,
+                        help="Vectors in the float16/int8 recall@k comparison")
+    parser.add_argument("--skip", default="",
+                        help="Comma-separated stages to skip: text, image, ingest, quantization")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument("--compare", help="Baseline results file; exit 1 if a metric regressed")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression as a fraction")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    skip = {stage.strip() for stage in args.skip.split(",") if stage.strip()}
+
+    print("🚀 Starting offline benchmark")
+    print("=" * 50)
+    results = {"environment": environment(args), "benchmarks": {}}
+    benchmarks = results["benchmarks"]
+
+    # No embedding cache: every run measures the model, not the cache
+    text_embedder = CLIPTextEmbedder(args.model, args.device, cache=None, backend=args.backend)
+    if "text" not in skip:
+        benchmarks["text_embedding"] = bench_text(
+            text_embedder, synthetic_messages(args.texts, args.seed),
+            [int(b) for b in args.text_batch_sizes.split(",")])
+    if "image" not in skip:
+        image_embedder = CLIPImageEmbedder(args.model, args.device, cache=None, backend=args.backend)
+        benchmarks["image_embedding"] = bench_images(
+            image_embedder, synthetic_images(args.images, args.seed),
+            [int(b) for b in args.image_batch_sizes.split(",")], args.preprocess_workers)
+    if "ingest" not in skip:
+        with tempfile.TemporaryDirectory() as workdir:
+            benchmarks.update(bench_ingest_and_query(text_embedder, workdir, args.report_rows, args.queries,
+                                                     args.seed, args.vector_backend))
+    if "quantization" not in skip:
+        with tempfile.TemporaryDirectory() as workdir:
+            benchmarks["quantization"] = bench_quantization(workdir, args.quantization_vectors, args.queries,
+                                                            args.seed)
+
+    output = args.output
+    if output is None:
+        commit = (results["environment"]["commit"] or "nocommit")[:8]
+        output = os.path.join(project_root, "benchmarks", "results",
+                              f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("\n" + "=" * 50)
+    print(f"📊 Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"   ⚠️  {regression['metric']}: {regression['baseline']:.2f} -> {regression['current']:.2f} "
+                  f"({regression['change']:+.0%})")
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            return False
+        print("🎉 No regressions against the baseline")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
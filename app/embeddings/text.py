@@ -1,52 +1,105 @@
-import torch
-from transformers import CLIPProcessor, CLIPModel
 import logging
+import time
 from typing import List, Union
 import numpy as np
+from .cache import EmbeddingCache, get_embedding_cache
+from .registry import DEFAULT_MODEL_NAME, get_clip_backend, get_clip_model, get_default_backend, get_default_device
+from ..runtime.metrics import observe_cache, observe_embedding
 
 logger = logging.getLogger(__name__)
 
 class CLIPTextEmbedder:
     
-    def __init__(self, model_name: str = "openai/clip-vit-base-patch32"):
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, device: str = None,
+                 max_tokens_per_batch: int = 8192, max_batch_size: int = 512, cache: EmbeddingCache = None,
+                 backend: str = None):
         "Initialize CLIP model for text embedding"
         self.model_name = model_name
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device or get_default_device()
+        # Bucket limits: padded tokens (batch size x longest text) and texts per forward pass
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_batch_size = max_batch_size
+        # Optional content-addressed cache; only texts it has never seen are embedded
+        self.cache = cache
+        self.cache_hits = 0
+        self.cache_misses = 0
         
-        try:
-            # Load CLIP model and processor
-            self.model = CLIPModel.from_pretrained(model_name)
-            self.processor = CLIPProcessor.from_pretrained(model_name)
-            
-            # Move model to device
-            self.model.to(self.device)
-            self.model.eval()
-            
-            logger.info(f"CLIP model '{model_name}' loaded successfully on {self.device}")
+        # Weights are shared with every other embedder using the same model and device
+        self.model, self.processor = get_clip_model(model_name, self.device)
+        # Inference runs through a pluggable backend: torch (float32), torch-int8 or onnx
+        self.backend_name = backend or get_default_backend()
+        self.backend = get_clip_backend(model_name, self.device, self.backend_name)
+    
+    def bucket_by_length(self, lengths: List[int], max_tokens_per_batch: int = None) -> List[List[int]]:
+        "Group text indices into length-sorted buckets that fit the per-batch token budget"
+        max_tokens = max_tokens_per_batch or self.max_tokens_per_batch
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        
+        buckets, current = [], []
+        for index in order:
+            # Lengths are ascending, so the newest text sets the padded width of the bucket
+            if current and ((len(current) + 1) * lengths[index] > max_tokens or len(current) >= self.max_batch_size):
+                buckets.append(current)
+                current = []
+            current.append(index)
+        if current:
+            buckets.append(current)
+        return buckets
+    
+    def _embed_uncached(self, text: List[str], max_tokens_per_batch: int = None) -> np.ndarray:
+        "Embed texts bucket by bucket, returning rows in input order"
+        embeddings = np.empty((len(text), self.get_embedding_dimension()), dtype=np.float32)
+        if not text:
+            return embeddings
+        
+        # Tokenize once without padding so each text's real length is known
+        tokenizer = self.processor.tokenizer
+        input_ids = tokenizer(text, padding=False, truncation=True)["input_ids"]
+        buckets = self.bucket_by_length([len(ids) for ids in input_ids], max_tokens_per_batch)
+        
+        for bucket in buckets:
+            # Pad only to the longest text in this bucket
+            inputs = tokenizer.pad({"input_ids": [input_ids[i] for i in bucket]}, return_tensors="pt")
             
-        except Exception as e:
-            logger.error(f"Failed to load CLIP model: {e}")
-            raise
+            # Generate normalized embeddings and scatter them back to the original order
+            start = time.perf_counter()
+            embeddings[bucket] = self.backend.text_features(inputs["input_ids"], inputs["attention_mask"])
+            observe_embedding("text", len(bucket), time.perf_counter() - start)
+        
+        logger.info(f"Embedded {len(text)} text(s) in {len(buckets)} bucket(s)")
+        return embeddings
     
-    def embed_text(self, text: Union[str, List[str]]) -> np.ndarray:
+    def embed_text(self, text: Union[str, List[str]], max_tokens_per_batch: int = None) -> np.ndarray:
         "Generate embeddings for text using CLIP model"
         try:
             # Ensure text is a list
             if isinstance(text, str):
                 text = [text]
             
-            # Process text through CLIP
-            inputs = self.processor(text=text, return_tensors="pt", padding=True, truncation=True)
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Generate embeddings
-            with torch.no_grad():
-                text_features = self.model.get_text_features(**inputs)
-                # Normalize embeddings
-                text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-            
-            # Convert to numpy and move to CPU
-            embeddings = text_features.cpu().numpy()
+            if self.cache is None:
+                embeddings = self._embed_uncached(text, max_tokens_per_batch)
+            else:
+                keys = [EmbeddingCache.make_key(f"{self.model_name}@{self.backend_name}", "text", t) for t in text]
+                cached = self.cache.get_many(keys)
+                
+                # Embed each distinct uncached text once, even if it repeats in the input
+                missing = {}
+                for index, key in enumerate(keys):
+                    if key not in cached and key not in missing:
+                        missing[key] = index
+                self.cache_hits += len(text) - len(missing)
+                self.cache_misses += len(missing)
+                observe_cache("text", len(text) - len(missing), len(missing))
+                
+                if missing:
+                    fresh = self._embed_uncached([text[i] for i in missing.values()], max_tokens_per_batch)
+                    fresh = dict(zip(missing.keys(), fresh))
+                    self.cache.put_many(fresh)
+                    cached.update(fresh)
+                
+                embeddings = np.empty((len(text), self.get_embedding_dimension()), dtype=np.float32)
+                for index, key in enumerate(keys):
+                    embeddings[index] = cached[key]
             
             logger.info(f"Generated embeddings for {len(text)} text(s), shape: {embeddings.shape}")
             return embeddings
@@ -55,6 +108,10 @@ class CLIPTextEmbedder:
             logger.error(f"Error generating text embeddings: {e}")
             raise
     
+    def warm_up(self, text: List[str] = None) -> np.ndarray:
+        "Run a forward pass that bypasses the cache, so the first real query pays no start-up cost"
+        return self._embed_uncached(text or ["warm-up", "who called +91 98765 43210 about the payment?"])
+    
     def embed_single_text(self, text: str) -> np.ndarray:
         "Generate embedding for a single text string"
         embeddings = self.embed_text(text)
@@ -62,7 +119,11 @@ class CLIPTextEmbedder:
     
     def get_embedding_dimension(self) -> int:
         "Get the dimension of the embeddings"
-        return self.model.config.text_config.hidden_size
+        return self.model.config.projection_dim
+    
+    def get_cache_stats(self) -> dict:
+        "Get embedding cache hit/miss counters for this embedder"
+        return {"hits": self.cache_hits, "misses": self.cache_misses}
 
 # Global CLIP embedder instance
 clip_embedder = None
@@ -71,7 +132,7 @@ def get_clip_embedder() -> CLIPTextEmbedder:
     "Get or create global CLIP embedder instance"
     global clip_embedder
     if clip_embedder is None:
-        clip_embedder = CLIPTextEmbedder()
+        clip_embedder = CLIPTextEmbedder(cache=get_embedding_cache())
     return clip_embedder
 
 def embed_text_data(text: Union[str, List[str]]) -> np.ndarray:
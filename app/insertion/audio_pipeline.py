@@ -0,0 +1,239 @@
+# Audio ingestion pipeline: parallel decoding, batched transcription and indexing of voice notes
+import logging
+import os
+import queue
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .manifest import file_sha256, remove_stale_records, source_name
+from ..retrieval.result_cache import invalidate_report
+from ..runtime.metrics import observe_ingest
+
+logger = logging.getLogger(__name__)
+
+# Whisper's input rate; windows are decoded at this rate
+SAMPLE_RATE = 16000
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".amr", ".flac", ".3gp")
+
+def _peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class AudioIngestionPipeline:
+    """Decode audio files on a worker pool, transcribe windows in batches and index the transcripts
+
+    Windows from many files share each Whisper batch, so thousands of short voice
+    notes pay the model cost per batch rather than per file. Decoded windows wait
+    in a bounded queue, which caps memory regardless of file length.
+    """
+
+    def __init__(self, transcriber=None, embedder=None, vector_store=None, batch_size: int = 16,
+                 decode_workers: int = 4, window_seconds: float = 30.0, max_pending_windows: int = 64,
+                 manifest=None, lexical_index=None):
+        """Initialize the pipeline; models, vector store, manifest and lexical index default to the global instances"""
+        if transcriber is None:
+            from ..embeddings.audio import get_whisper_transcriber
+            transcriber = get_whisper_transcriber()
+        if embedder is None:
+            from ..embeddings.text import get_clip_embedder
+            embedder = get_clip_embedder()
+        if vector_store is None:
+            from ..config import get_vector_store
+            vector_store = get_vector_store()
+        if manifest is None:
+            from .manifest import get_ingest_manifest
+            manifest = get_ingest_manifest()
+        if lexical_index is None:
+            from ..retrieval.lexical import get_lexical_index, lexical_enabled
+            lexical_index = get_lexical_index() if lexical_enabled() else None
+
+        self.transcriber = transcriber
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.manifest = manifest
+        self.lexical_index = lexical_index
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers
+        self.window_seconds = window_seconds
+        self.max_pending_windows = max_pending_windows
+
+    def _decode(self, file_index: int, path: str, windows: queue.Queue, stop: threading.Event):
+        """Push the decoded windows of one file onto the queue, followed by an end marker"""
+        from ..embeddings.audio import iter_audio_windows
+
+        def put(item):
+            # Time out periodically so a failed consumer can't leave decoders blocked forever
+            while not stop.is_set():
+                try:
+                    windows.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            for window_index, window in enumerate(iter_audio_windows(path, self.window_seconds)):
+                if not put((file_index, window_index, window)):
+                    return
+            put((file_index, None, None))
+        except Exception as e:
+            put((file_index, None, e))
+
+    def _flush(self, batch: List, files: List[Dict], report_id: str, progress: Dict):
+        """Transcribe a batch of windows, embed the transcripts and add them to the collection"""
+        transcripts = self.transcriber.transcribe([window for _, _, window in batch])
+
+        ids, documents, metadatas = [], [], []
+        for (file_index, window_index, window), transcript in zip(batch, transcripts):
+            stats = files[file_index]
+            stats["pending"] -= 1
+            if not transcript:
+                continue
+            start = window_index * self.window_seconds
+            ids.extend(self.manifest.stage(stats["run_id"], [f"{report_id}:{stats['file']}:audio:{window_index}"]))
+            documents.append(transcript)
+            metadatas.append({"report_id": report_id, "source": stats["file"], "modality": "audio",
+                              "window": window_index, "start_seconds": start,
+                              "end_seconds": start + len(window) / SAMPLE_RATE})
+            stats["transcripts"] += 1
+
+        if documents:
+            if self.lexical_index is not None:
+                # Spoken numbers and names are transcribed verbatim, so transcripts are searchable by token too
+                self.lexical_index.add(report_id, zip(ids, documents, metadatas))
+                invalidate_report(report_id)
+            embeddings = self.embedder.embed_text(documents)
+            progress["chunks_embedded"] += len(documents)
+            self.vector_store.bulk_upsert(zip(ids, embeddings, documents, metadatas), progress=progress)
+            # Only now can retrieval find the new windows; answers cached in the meantime would miss them
+            invalidate_report(report_id)
+
+    def _finish(self, stats: Dict):
+        """Update the manifest and record throughput and memory for a file whose windows are all indexed"""
+        elapsed = time.perf_counter() - stats.pop("started")
+        stats.pop("pending")
+        stats.pop("ended")
+        run_id, sha256 = stats.pop("run_id"), stats.pop("sha256")
+        if stats["error"] is None:
+            # Windows past the end of a now shorter recording are stale
+            stale = self.manifest.stale_ids(run_id, stats["report_id"], stats["file"])
+            stats["removed"] = remove_stale_records(stats["report_id"], stale, self.vector_store,
+                                                    lexical_index=self.lexical_index)
+            self.manifest.commit(run_id, stats["report_id"], stats["file"], sha256, stats["bytes"])
+        else:
+            self.manifest.discard(run_id)
+        stats["seconds"] = elapsed
+        stats["realtime_factor"] = stats["audio_seconds"] / elapsed if elapsed else 0.0
+        stats["peak_rss_mb"] = _peak_rss_mb()
+        observe_ingest("audio", elapsed, stats["bytes"], stats["transcripts"])
+        logger.info(
+            f"Ingested {stats['file']}: {stats['windows']} window(s), {stats['audio_seconds']:.1f}s audio "
+            f"in {elapsed:.2f}s ({stats['realtime_factor']:.1f}x realtime), peak RSS {stats['peak_rss_mb']:.0f} MB"
+        )
+
+    def ingest_files(self, paths: List[str], report_id: str, progress: Dict = None) -> List[Dict]:
+        """Ingest audio files for one report and return per-file stats
+
+        Files whose content matches the ingestion manifest are skipped without
+        decoding. progress, if given, is updated in place with bytes_total,
+        bytes_read (of finished files), chunks_embedded and vectors_written.
+        """
+        started = time.perf_counter()
+        files = [{"file": source_name(p, report_id), "report_id": report_id, "bytes": os.path.getsize(p),
+                  "unchanged": False, "windows": 0, "audio_seconds": 0.0, "transcripts": 0, "removed": 0,
+                  "error": None, "pending": 0, "ended": False, "started": None, "run_id": None, "sha256": file_sha256(p)}
+                 for p in paths]
+        progress = progress if progress is not None else {}
+        progress.update({"bytes_total": sum(f["bytes"] for f in files), "bytes_read": 0,
+                         "chunks_embedded": 0, "vectors_written": 0})
+
+        changed = []
+        for file_index, stats in enumerate(files):
+            entry = self.manifest.get_file(report_id, stats["file"])
+            if entry is not None and entry["sha256"] == stats["sha256"]:
+                for key in ("pending", "ended", "started", "run_id", "sha256"):
+                    stats.pop(key)
+                stats.update({"unchanged": True, "transcripts": entry["chunks"], "seconds": 0.0,
+                              "realtime_factor": 0.0, "peak_rss_mb": _peak_rss_mb()})
+                progress["bytes_read"] += stats["bytes"]
+                logger.info(f"Skipped {stats['file']} for report {report_id}: unchanged since last ingestion")
+            else:
+                # Window ids are staged in the manifest rather than kept per file
+                stats["run_id"] = self.manifest.begin()
+                changed.append(file_index)
+
+        windows = queue.Queue(maxsize=self.max_pending_windows)
+        stop = threading.Event()
+        remaining = len(changed)
+        batch = []
+
+        def finish_ready():
+            for stats in files:
+                if stats.get("ended") and stats["pending"] == 0:
+                    self._finish(stats)
+                    progress["bytes_read"] += stats["bytes"]
+
+        pool = ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix="audio-decode")
+        try:
+            for file_index in changed:
+                pool.submit(self._decode, file_index, paths[file_index], windows, stop)
+
+            while remaining:
+                file_index, window_index, item = windows.get()
+                stats = files[file_index]
+                if stats["started"] is None:
+                    stats["started"] = time.perf_counter()
+
+                if window_index is None:
+                    # End of this file's stream, either clean or with a decode error
+                    remaining -= 1
+                    stats["ended"] = True
+                    if item is not None:
+                        stats["error"] = str(item)
+                        logger.error(f"Failed to decode {stats['file']}: {item}")
+                else:
+                    stats["windows"] += 1
+                    stats["pending"] += 1
+                    stats["audio_seconds"] += len(item) / SAMPLE_RATE
+                    batch.append((file_index, window_index, item))
+
+                if len(batch) >= self.batch_size or (not remaining and batch):
+                    self._flush(batch, files, report_id, progress)
+                    batch = []
+                finish_ready()
+
+        except Exception as e:
+            for stats in files:
+                if stats.get("run_id"):
+                    self.manifest.discard(stats["run_id"])
+            logger.error(f"Audio ingestion failed for report {report_id}: {e}")
+            raise
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        total = time.perf_counter() - started
+        logger.info(f"Ingested {len(files)} audio file(s) for report {report_id} in {total:.2f}s")
+        return files
+
+    def ingest_file(self, path: str, report_id: str, progress: Dict = None) -> Dict:
+        """Ingest a single audio file"""
+        return self.ingest_files([path], report_id, progress)[0]
+
+# Global audio ingestion pipeline instance
+audio_pipeline = None
+
+def get_audio_pipeline() -> AudioIngestionPipeline:
+    """Get or create global audio ingestion pipeline instance"""
+    global audio_pipeline
+    if audio_pipeline is None:
+        audio_pipeline = AudioIngestionPipeline()
+    return audio_pipeline
+
+def ingest_audio_files(paths: List[str], report_id: str) -> List[Dict]:
+    """Convenience function to ingest audio files with the global pipeline"""
+    return get_audio_pipeline().ingest_files(paths, report_id)
@@ -0,0 +1,156 @@
+# Background ingestion jobs: uploads are parsed, embedded and indexed off the request path
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class SourceExistsError(Exception):
+    """Raised for a file whose name is already a source of the report and that is not marked as a replacement"""
+
+def check_file_type(filename: str):
+    """Raise ValueError for a file no pipeline can ingest"""
+    from .audio_pipeline import AUDIO_EXTENSIONS
+    from .text_pipeline import SUPPORTED_EXTENSIONS
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS and extension not in AUDIO_EXTENSIONS:
+        raise ValueError(f"Unsupported report file type: {extension}")
+
+class IngestionJob:
+    """State and progress of one background ingestion job"""
+
+    def __init__(self, report_id: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.report_id = report_id
+        self.path = path
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Updated in place by the pipelines while the job runs
+        self.progress = {"bytes_total": os.path.getsize(path), "bytes_read": 0,
+                         "chunks_embedded": 0, "chunks_unchanged": 0, "vectors_written": 0}
+
+    def to_dict(self) -> Dict:
+        """Snapshot of the job for the progress endpoint"""
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        progress = dict(self.progress)
+        return {
+            "job_id": self.id,
+            "report_id": self.report_id,
+            "file": os.path.basename(self.path),
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": elapsed,
+            "bytes_per_second": progress["bytes_read"] / elapsed if elapsed else 0.0,
+            "vectors_per_second": progress["vectors_written"] / elapsed if elapsed else 0.0,
+            **progress,
+        }
+
+class IngestionJobManager:
+    """Run ingestion jobs on a bounded local worker pool"""
+
+    def __init__(self, max_workers: int = None):
+        """Initialize the worker pool"""
+        self.max_workers = max_workers or int(os.getenv("INGEST_WORKERS", "2"))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingest")
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def check_source(self, report_id: str, filename: str, replace: bool = False):
+        """Refuse a file named like a source the report already has, unless it replaces that source
+
+        Sources are keyed by file name, so a second, different messages.csv would
+        otherwise be taken as a new version of the first and delete its chunks.
+        """
+        if replace:
+            return
+        from .manifest import get_ingest_manifest, source_name
+
+        source = os.path.basename(filename)
+        with self._lock:
+            pending = any(job.report_id == report_id and job.status in ("queued", "running")
+                          and source_name(job.path, report_id) == source for job in self._jobs.values())
+        if pending or get_ingest_manifest().get_file(report_id, source) is not None:
+            raise SourceExistsError(f"Report {report_id} already has a file named {source}; "
+                                    "rename it, or set replace to update the existing one")
+
+    def submit(self, path: str, report_id: str, replace: bool = False) -> IngestionJob:
+        """Queue a saved report file for ingestion and return its job immediately
+
+        Without replace, a file named like an existing source of the report raises SourceExistsError.
+        """
+        from .manifest import source_name
+
+        check_file_type(path)
+        self.check_source(report_id, source_name(path, report_id), replace)
+
+        job = IngestionJob(report_id, path)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job)
+        logger.info(f"Queued ingestion job {job.id} for {path} (report {report_id})")
+        return job
+
+    def _run(self, job: IngestionJob):
+        """Ingest one file with the pipeline matching its type"""
+        from .audio_pipeline import AUDIO_EXTENSIONS, get_audio_pipeline
+        from .text_pipeline import get_text_pipeline
+
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            if os.path.splitext(job.path)[1].lower() in AUDIO_EXTENSIONS:
+                stats = get_audio_pipeline().ingest_file(job.path, job.report_id, job.progress)
+                if stats.get("error"):
+                    raise RuntimeError(stats["error"])
+            else:
+                get_text_pipeline().ingest_file(job.path, job.report_id, job.progress)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Ingestion job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+        logger.info(f"Ingestion job {job.id} {job.status} in {job.finished_at - job.started_at:.2f}s")
+
+    def get(self, job_id: str) -> IngestionJob:
+        """Look up a job by id, or None"""
+        return self._jobs.get(job_id)
+
+    def list(self, report_id: str = None) -> List[IngestionJob]:
+        """All jobs, optionally for one report, newest first"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if report_id is not None:
+            jobs = [job for job in jobs if job.report_id == report_id]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def shutdown(self):
+        """Stop accepting jobs and wait for running ones"""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        logger.info("Ingestion job manager shut down")
+
+# Global ingestion job manager instance
+job_manager = None
+
+def get_job_manager() -> IngestionJobManager:
+    """Get or create global ingestion job manager instance"""
+    global job_manager
+    if job_manager is None:
+        job_manager = IngestionJobManager()
+    return job_manager
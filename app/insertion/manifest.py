@@ -0,0 +1,286 @@
+# Ingestion manifest: content fingerprints of every ingested file and chunk, per report
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from dotenv import load_dotenv
+from ..retrieval.result_cache import invalidate_report
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Uploads are stored as {report_id}_{YYYYmmdd_HHMMSS}_{original name}
+_UPLOAD_PREFIX = re.compile(r"^\d{8}_\d{6}_")
+
+def source_name(path: str, report_id: str) -> str:
+    """Stable name of a report file, without the upload timestamp prefix
+
+    Re-uploads of the same extraction map to the same source, which is what
+    lets the manifest recognise them as an update rather than a new file.
+    """
+    name = os.path.basename(path)
+    prefix = f"{report_id}_"
+    if name.startswith(prefix) and _UPLOAD_PREFIX.match(name[len(prefix):]):
+        return name[len(prefix) + 16:]
+    return name
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Reader metadata that only says where a chunk sits in the file; kept out of the
+# fingerprint so inserting a line doesn't change the id of every chunk after it
+POSITION_FIELDS = frozenset({"line", "row", "page", "paragraph"})
+
+def chunk_fingerprint(text: str, metadata: Dict = None) -> str:
+    """Content hash of one chunk and its stable reader metadata (sheet, ...), ignoring its position"""
+    digest = hashlib.sha1(text.encode("utf-8"))
+    stable = {key: value for key, value in (metadata or {}).items() if key not in POSITION_FIELDS}
+    if stable:
+        digest.update(json.dumps(stable, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+# Ids per SQLite statement, well under its bound-parameter limit
+_ID_BATCH = 500
+
+class IngestionManifest:
+    """SQLite record of which file versions and chunk ids are indexed for each report source
+
+    While a file is ingested its chunk ids are staged on disk under a run id, so
+    neither the ids of a file nor the stale ones are ever held in memory as a whole.
+    """
+
+    def __init__(self, path: str = None):
+        """Open (or create) the manifest database"""
+        self.path = path or os.getenv("INGEST_MANIFEST_PATH", "data/ingest_manifest.db")
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by all ingestion workers; access is serialised by self._lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (report_id TEXT NOT NULL, source TEXT NOT NULL, "
+            "sha256 TEXT NOT NULL, size INTEGER NOT NULL, chunks INTEGER NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (report_id, source))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (report_id TEXT NOT NULL, source TEXT NOT NULL, "
+            "chunk_id TEXT NOT NULL, PRIMARY KEY (report_id, source, chunk_id))"
+        )
+        # base_id is the id without its occurrence suffix, for numbering repeated chunks
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS staged (run_id TEXT NOT NULL, chunk_id TEXT NOT NULL, "
+            "base_id TEXT NOT NULL, PRIMARY KEY (run_id, chunk_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS staged_base ON staged (run_id, base_id)")
+        # Runs interrupted by a restart can never be committed
+        self._conn.execute("DELETE FROM staged")
+        self._conn.commit()
+        logger.info(f"Ingestion manifest opened at {self.path}")
+
+    def get_file(self, report_id: str, source: str) -> Optional[Dict]:
+        """Manifest entry for one source of a report, or None if it was never ingested"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, size, chunks, updated_at FROM files WHERE report_id = ? AND source = ?",
+                (report_id, source),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"report_id": report_id, "source": source, "sha256": row[0], "size": row[1],
+                "chunks": row[2], "updated_at": row[3]}
+
+    def get_chunk_ids(self, report_id: str, source: str) -> Set[str]:
+        """Ids of the vectors currently indexed for one source"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE report_id = ? AND source = ?", (report_id, source)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def report_size(self, report_id: str) -> int:
+        """Number of chunks indexed for a report across all its sources"""
+        with self._lock:
+            row = self._conn.execute("SELECT SUM(chunks) FROM files WHERE report_id = ?", (report_id,)).fetchone()
+        return row[0] or 0
+
+    def known(self, report_id: str, source: str, chunk_ids: List[str]) -> Set[str]:
+        """Those of the given ids that are currently indexed for one source"""
+        found = set()
+        with self._lock:
+            for start in range(0, len(chunk_ids), _ID_BATCH):
+                batch = chunk_ids[start:start + _ID_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT chunk_id FROM chunks WHERE report_id = ? AND source = ? "
+                    f"AND chunk_id IN ({','.join('?' * len(batch))})",
+                    (report_id, source, *batch),
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def begin(self) -> str:
+        """Start staging the chunk ids of one ingestion run; returns its run id"""
+        return uuid.uuid4().hex
+
+    def stage(self, run_id: str, base_ids: List[str]) -> List[str]:
+        """Stage the next chunks of a run and return their ids
+
+        A base id already seen in the run gets an occurrence suffix (:1, :2, ...),
+        so identical chunks within one file still have distinct ids.
+        """
+        with self._lock, self._conn:
+            counts = {}
+            distinct = list(dict.fromkeys(base_ids))
+            for start in range(0, len(distinct), _ID_BATCH):
+                batch = distinct[start:start + _ID_BATCH]
+                counts.update(self._conn.execute(
+                    f"SELECT base_id, COUNT(*) FROM staged WHERE run_id = ? "
+                    f"AND base_id IN ({','.join('?' * len(batch))}) GROUP BY base_id",
+                    (run_id, *batch),
+                ).fetchall())
+            chunk_ids = []
+            for base_id in base_ids:
+                occurrence = counts.get(base_id, 0)
+                counts[base_id] = occurrence + 1
+                chunk_ids.append(base_id + (f":{occurrence}" if occurrence else ""))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO staged (run_id, chunk_id, base_id) VALUES (?, ?, ?)",
+                ((run_id, chunk_id, base_id) for chunk_id, base_id in zip(chunk_ids, base_ids)),
+            )
+        return chunk_ids
+
+    def stale_ids(self, run_id: str, report_id: str, source: str) -> Iterator[str]:
+        """Ids indexed for a source that its run did not stage, read page by page"""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT chunk_id FROM chunks WHERE report_id = ? AND source = ? AND chunk_id > ? "
+                    "AND chunk_id NOT IN (SELECT chunk_id FROM staged WHERE run_id = ?) "
+                    "ORDER BY chunk_id LIMIT ?",
+                    (report_id, source, last, run_id, _ID_BATCH),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0]
+            last = rows[-1][0]
+
+    def commit(self, run_id: str, report_id: str, source: str, sha256: str, size: int) -> int:
+        """Make a run's staged ids the entry of its source, invalidating cached answers; returns the chunk count"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE report_id = ? AND source = ?", (report_id, source))
+            self._conn.execute(
+                "INSERT OR IGNORE INTO chunks (report_id, source, chunk_id) "
+                "SELECT ?, ?, chunk_id FROM staged WHERE run_id = ?",
+                (report_id, source, run_id),
+            )
+            chunks = self._conn.execute("SELECT COUNT(*) FROM staged WHERE run_id = ?", (run_id,)).fetchone()[0]
+            self._conn.execute("DELETE FROM staged WHERE run_id = ?", (run_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (report_id, source, sha256, size, chunks, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (report_id, source, sha256, size, chunks, time.time()),
+            )
+        invalidate_report(report_id)
+        return chunks
+
+    def discard(self, run_id: str):
+        """Drop the staged ids of a failed run"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM staged WHERE run_id = ?", (run_id,))
+
+    def record(self, report_id: str, source: str, sha256: str, size: int, chunk_ids: Iterable[str]):
+        """Replace the entry for one source after it has been fully ingested, invalidating cached answers"""
+        run_id = self.begin()
+        chunk_ids = iter(chunk_ids)
+        for batch in iter(lambda: list(islice(chunk_ids, _ID_BATCH)), []):
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO staged (run_id, chunk_id, base_id) VALUES (?, ?, ?)",
+                    ((run_id, chunk_id, chunk_id) for chunk_id in batch),
+                )
+        self.commit(run_id, report_id, source, sha256, size)
+
+    def forget(self, report_id: str, source: str = None):
+        """Drop the entries of one source, or of a whole report"""
+        condition, params = ("report_id = ?", (report_id,)) if source is None else \
+            ("report_id = ? AND source = ?", (report_id, source))
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM chunks WHERE {condition}", params)
+            self._conn.execute(f"DELETE FROM files WHERE {condition}", params)
+        invalidate_report(report_id)
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+# Global ingestion manifest instance
+ingest_manifest = None
+
+def get_ingest_manifest() -> IngestionManifest:
+    """Get or create global ingestion manifest instance"""
+    global ingest_manifest
+    if ingest_manifest is None:
+        ingest_manifest = IngestionManifest()
+    return ingest_manifest
+
+def close_ingest_manifest():
+    """Close the global ingestion manifest"""
+    global ingest_manifest
+    if ingest_manifest:
+        ingest_manifest.close()
+        ingest_manifest = None
+
+def remove_stale_records(report_id: str, ids: Iterable[str], vector_store=None, neo4j_client=None,
+                         lexical_index=None, batch_size: int = _ID_BATCH) -> int:
+    """Delete the vectors, lexical postings and any graph nodes keyed by the same ids, of chunks that no longer exist
+
+    ids may be a lazy stream (such as IngestionManifest.stale_ids); it is consumed batch by batch.
+    """
+    if vector_store is None:
+        from ..config import get_vector_store
+        vector_store = get_vector_store()
+    if lexical_index is None:
+        from ..retrieval.lexical import get_lexical_index, lexical_enabled
+        lexical_index = get_lexical_index() if lexical_enabled() else None
+
+    ids = iter(ids)
+    removed = 0
+    graph_failed = False
+    for batch in iter(lambda: list(islice(ids, batch_size)), []):
+        vector_store.delete(batch)
+        if lexical_index is not None:
+            lexical_index.delete(report_id, batch)
+        removed += len(batch)
+
+        if graph_failed:
+            continue
+        try:
+            if neo4j_client is None:
+                from ..config import get_neo4j_client
+                neo4j_client = get_neo4j_client()
+            neo4j_client.delete_nodes(report_id, batch)
+        except Exception as e:
+            # The vectors are gone, so stale nodes can no longer surface through retrieval
+            logger.warning(f"Failed to remove graph nodes for report {report_id}: {e}")
+            graph_failed = True
+    return removed
@@ -0,0 +1,307 @@
+# Streaming text ingestion pipeline for uploaded UFDR report files
+import csv
+import io
+import logging
+import os
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .manifest import chunk_fingerprint, file_sha256, remove_stale_records, source_name
+from ..retrieval.result_cache import invalidate_report
+from ..runtime.metrics import observe_ingest
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "TextIngestionPipeline",
+    "get_text_pipeline",
+    "ingest_text_report",
+    "iter_report_chunks",
+    "SUPPORTED_EXTENSIONS",
+]
+
+SUPPORTED_EXTENSIONS = (".txt", ".csv", ".xlsx", ".docx", ".pdf")
+
+# (text, metadata) pairs produced by the readers and the chunker
+Record = Tuple[str, Dict]
+
+def split_text(text: str, max_chars: int, overlap: int = 0) -> List[str]:
+    """Split text on whitespace into pieces of at most max_chars characters"""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # Prefer to break at the last space inside the window
+            space = text.rfind(" ", start, end)
+            if space > start:
+                end = space
+        pieces.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [p for p in pieces if p]
+
+def _read_txt(path: str, progress: Dict = None) -> Iterator[Record]:
+    """Yield non-empty lines of a text file"""
+    with open(path, "rb") as raw:
+        # The binary handle's position tracks how far the text layer has read
+        for line_number, line in enumerate(io.TextIOWrapper(raw, encoding="utf-8", errors="replace"), start=1):
+            if progress is not None:
+                progress["bytes_read"] = raw.tell()
+            if line.strip():
+                yield line.rstrip("\n"), {"line": line_number}
+
+def _read_csv(path: str, progress: Dict = None) -> Iterator[Record]:
+    """Yield one record per CSV row as 'column: value' pairs"""
+    csv.field_size_limit(16 * 1024 * 1024)
+    with open(path, "rb") as raw:
+        f = io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="")
+        for row_number, row in enumerate(csv.DictReader(f), start=1):
+            if progress is not None:
+                progress["bytes_read"] = raw.tell()
+            text = " | ".join(f"{k}: {v}" for k, v in row.items() if k and v)
+            if text:
+                yield text, {"row": row_number}
+
+def _read_xlsx(path: str, progress: Dict = None) -> Iterator[Record]:
+    """Yield one record per spreadsheet row, streaming rows in read-only mode"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = [str(h) if h is not None else f"column_{i}" for i, h in enumerate(header)]
+            for row_number, row in enumerate(rows, start=2):
+                text = " | ".join(f"{k}: {v}" for k, v in zip(header, row) if v is not None and v != "")
+                if text:
+                    yield text, {"sheet": sheet.title, "row": row_number}
+    finally:
+        workbook.close()
+
+def _read_docx(path: str, progress: Dict = None) -> Iterator[Record]:
+    """Yield non-empty paragraphs of a Word document"""
+    from docx import Document
+
+    size = os.path.getsize(path)
+    paragraphs = Document(path).paragraphs
+    for index, paragraph in enumerate(paragraphs):
+        if progress is not None:
+            progress["bytes_read"] = size * index // len(paragraphs)
+        if paragraph.text.strip():
+            yield paragraph.text, {"paragraph": index}
+
+def _read_pdf(path: str, progress: Dict = None) -> Iterator[Record]:
+    """Yield the text of each PDF page, one page at a time"""
+    from pypdf import PdfReader
+
+    size = os.path.getsize(path)
+    reader = PdfReader(path)
+    for page_number, page in enumerate(reader.pages, start=1):
+        if progress is not None:
+            progress["bytes_read"] = size * (page_number - 1) // len(reader.pages)
+        text = page.extract_text() or ""
+        if text.strip():
+            yield text, {"page": page_number}
+
+READERS = {
+    ".txt": _read_txt,
+    ".csv": _read_csv,
+    ".xlsx": _read_xlsx,
+    ".docx": _read_docx,
+    ".pdf": _read_pdf,
+}
+
+def iter_report_chunks(path: str, max_chars: int = 300, overlap: int = 50,
+                       progress: Dict = None) -> Iterator[Record]:
+    """Stream a report file as chunks no longer than max_chars characters
+
+    Short consecutive records (chat lines, paragraphs) are packed together up to
+    max_chars; longer ones are split with overlap. Only the current chunk is held
+    in memory, so file size does not affect memory use. If a progress dict is
+    given, its "bytes_read" is kept up to date.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported report file type: {extension}")
+
+    # Rows of tabular exports are individual messages and are never packed together
+    pack = extension in (".txt", ".docx")
+    buffer, buffer_meta = [], None
+
+    for text, metadata in READERS[extension](path, progress):
+        text = " ".join(text.split())
+        if pack and len(text) <= max_chars:
+            if buffer and sum(len(t) + 1 for t in buffer) + len(text) > max_chars:
+                yield " ".join(buffer), buffer_meta
+                buffer, buffer_meta = [], None
+            if not buffer:
+                buffer_meta = metadata
+            buffer.append(text)
+            continue
+
+        if buffer:
+            yield " ".join(buffer), buffer_meta
+            buffer, buffer_meta = [], None
+        for piece in split_text(text, max_chars, overlap):
+            yield piece, metadata
+
+    if buffer:
+        yield " ".join(buffer), buffer_meta
+    if progress is not None:
+        progress["bytes_read"] = os.path.getsize(path)
+
+class TextIngestionPipeline:
+    """Chunk report files, embed them with CLIP and index them in the vector store"""
+
+    def __init__(self, embedder=None, vector_store=None, batch_size: int = 256,
+                 chunk_chars: int = 300, chunk_overlap: int = 50, manifest=None, lexical_index=None):
+        """Initialize the pipeline; embedder, vector store, manifest and lexical index default to the global instances"""
+        if embedder is None:
+            from ..embeddings.text import get_clip_embedder
+            embedder = get_clip_embedder()
+        if vector_store is None:
+            from ..config import get_vector_store
+            vector_store = get_vector_store()
+        if manifest is None:
+            from .manifest import get_ingest_manifest
+            manifest = get_ingest_manifest()
+        if lexical_index is None:
+            from ..retrieval.lexical import get_lexical_index, lexical_enabled
+            lexical_index = get_lexical_index() if lexical_enabled() else None
+
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.manifest = manifest
+        self.lexical_index = lexical_index
+        self.batch_size = batch_size
+        self.chunk_chars = chunk_chars
+        self.chunk_overlap = chunk_overlap
+
+    def _iter_records(self, path: str, report_id: str, source: str, run_id: str, counters: Dict,
+                      progress: Dict, backfill: bool = False) -> Iterator[Tuple]:
+        """Chunk and embed a file batch by batch, yielding (id, embedding, document, metadata) records
+
+        Ids are content fingerprints, so a chunk the manifest already has is left as
+        it is and not embedded again, wherever it moved to in the file. Every id of
+        the file is staged in the manifest under run_id. New chunks are added to the
+        lexical index as they are chunked; with backfill, known ones are too.
+        """
+        chunks = iter_report_chunks(path, self.chunk_chars, self.chunk_overlap, progress)
+
+        # Only one batch of chunks is embedded at a time; the bulk writer throttles this generator
+        for batch in iter(lambda: list(islice(chunks, self.batch_size)), []):
+            chunk_ids = self.manifest.stage(
+                run_id, [f"{report_id}:{source}:{chunk_fingerprint(text, metadata)}" for text, metadata in batch]
+            )
+            known = self.manifest.known(report_id, source, chunk_ids)
+            new, lexical = [], []
+            for chunk_id, (text, metadata) in zip(chunk_ids, batch):
+                metadata = {"report_id": report_id, "source": source, "modality": "text", **metadata}
+                if chunk_id in known:
+                    progress["chunks_unchanged"] += 1
+                else:
+                    new.append((chunk_id, text, metadata))
+                if backfill or chunk_id not in known:
+                    lexical.append((chunk_id, text, metadata))
+            counters["chunks"] += len(batch)
+            if self.lexical_index is not None and lexical:
+                self.lexical_index.add(report_id, lexical)
+                # Answers cached before these postings were added would miss them
+                invalidate_report(report_id)
+            if not new:
+                continue
+
+            embeddings = self.embedder.embed_text([text for _, text, _ in new])
+            progress["chunks_embedded"] += len(new)
+            for (chunk_id, text, metadata), embedding in zip(new, embeddings):
+                yield chunk_id, embedding, text, metadata
+
+    def ingest_file(self, path: str, report_id: str, progress: Dict = None) -> Dict:
+        """Stream one report file into the vector store and return ingestion stats
+
+        Files are tracked in the ingestion manifest under their name without the
+        upload timestamp. An unchanged re-upload is skipped outright; for an updated
+        one only new chunks are embedded and vectors of chunks that disappeared are
+        deleted. progress, if given, is updated in place with bytes_total,
+        bytes_read, chunks_embedded, chunks_unchanged and vectors_written.
+        """
+        start = time.perf_counter()
+        source = source_name(path, report_id)
+        size = os.path.getsize(path)
+        counters = {"chunks": 0}
+        progress = progress if progress is not None else {}
+        progress.update({"bytes_total": size, "bytes_read": 0,
+                         "chunks_embedded": 0, "chunks_unchanged": 0, "vectors_written": 0})
+        stats = {"file": source, "report_id": report_id, "bytes": size, "unchanged": False,
+                 "chunks": 0, "vectors": 0, "removed": 0}
+
+        sha256 = file_sha256(path)
+        entry = self.manifest.get_file(report_id, source)
+        # Files ingested before the lexical index existed are re-chunked once to fill it
+        backfill = (self.lexical_index is not None and entry is not None and entry["chunks"] > 0
+                    and not self.lexical_index.has_source(report_id, source))
+        if entry is not None and entry["sha256"] == sha256 and not backfill:
+            progress["bytes_read"] = size
+            progress["chunks_unchanged"] = entry["chunks"]
+            stats.update({"unchanged": True, "chunks": entry["chunks"], "seconds": time.perf_counter() - start,
+                          "chunks_per_second": 0.0})
+            logger.info(f"Skipped {source} for report {report_id}: unchanged since last ingestion")
+            return stats
+        run_id = self.manifest.begin()
+
+        try:
+            # Embedding runs on this thread while earlier batches are written concurrently
+            records = self._iter_records(path, report_id, source, run_id, counters, progress, backfill)
+            # Answers cached before a batch's vectors landed would miss it, so each written batch invalidates them
+            write_stats = self.vector_store.bulk_upsert(records, batch_size=self.batch_size, progress=progress,
+                                                        on_batch=lambda _: invalidate_report(report_id))
+            removed = remove_stale_records(report_id, self.manifest.stale_ids(run_id, report_id, source),
+                                           self.vector_store, lexical_index=self.lexical_index)
+        except Exception as e:
+            self.manifest.discard(run_id)
+            logger.error(f"Failed to ingest {path}: {e}")
+            raise
+        # Only committed once the index matches the file, so a failed run is simply redone
+        self.manifest.commit(run_id, report_id, source, sha256, size)
+
+        elapsed = time.perf_counter() - start
+        chunks = counters["chunks"]
+        observe_ingest("text", elapsed, size, write_stats["records"])
+        stats.update({
+            "chunks": chunks,
+            "vectors": write_stats["records"],
+            "removed": removed,
+            "seconds": elapsed,
+            "chunks_per_second": chunks / elapsed if elapsed else 0.0,
+        })
+        logger.info(f"Ingested {chunks} chunk(s) from {source} for report {report_id} in {elapsed:.2f}s "
+                    f"({write_stats['records']} new, {progress['chunks_unchanged']} unchanged, {removed} removed)")
+        return stats
+
+    def ingest_files(self, paths: Iterable[str], report_id: str) -> List[Dict]:
+        """Ingest several report files for one report"""
+        return [self.ingest_file(path, report_id) for path in paths]
+
+# Global text ingestion pipeline instance
+text_pipeline = None
+
+def get_text_pipeline() -> TextIngestionPipeline:
+    """Get or create global text ingestion pipeline instance"""
+    global text_pipeline
+    if text_pipeline is None:
+        text_pipeline = TextIngestionPipeline()
+    return text_pipeline
+
+def ingest_text_report(path: str, report_id: str) -> Dict:
+    """Convenience function to ingest one report file with the global pipeline"""
+    return get_text_pipeline().ingest_file(path, report_id)
@@ -0,0 +1,201 @@
+# Chunked, resumable report uploads streamed straight to disk
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class UploadError(Exception):
+    """Raised for invalid upload requests; status_code says how the API should answer"""
+
+    def __init__(self, message: str, status_code: int = 400, offset: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+class UploadManager:
+    """Resumable uploads: each upload is a .part file plus a JSON sidecar under reports/.uploads
+
+    The size of the .part file on disk is the authoritative resume offset, so an
+    upload survives both dropped connections and backend restarts.
+    """
+
+    def __init__(self, reports_dir: str = None, expiry_hours: float = None):
+        """Initialize the upload staging directory; uploads idle for expiry_hours are discarded"""
+        self.reports_dir = reports_dir or os.getenv("REPORTS_DIR", "reports")
+        self.staging_dir = os.path.join(self.reports_dir, ".uploads")
+        self.expiry_seconds = 3600 * (expiry_hours or float(os.getenv("UPLOAD_EXPIRY_HOURS", "24")))
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+        # Running [sha256, bytes hashed] per upload while chunks arrive in order; rebuilt from disk when missing
+        self._hashes: Dict[str, list] = {}
+        # Uploads a request is writing or completing right now; an id is only here while it is held
+        self._busy = set()
+        self._busy_lock = threading.Lock()
+
+    def _paths(self, upload_id: str):
+        if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+            raise UploadError(f"Unknown upload: {upload_id}", 404)
+        base = os.path.join(self.staging_dir, upload_id)
+        return base + ".part", base + ".json"
+
+    def acquire(self, upload_id: str):
+        """Claim an existing upload for one request, so two connections can't write or complete it at once"""
+        self.status(upload_id)
+        with self._busy_lock:
+            if upload_id in self._busy:
+                raise UploadError("Another request is writing or completing this upload", 409)
+            self._busy.add(upload_id)
+
+    def release(self, upload_id: str):
+        """Give up the claim taken by acquire"""
+        with self._busy_lock:
+            self._busy.discard(upload_id)
+
+    def expire(self) -> int:
+        """Discard uploads idle for longer than the expiry; returns how many were removed"""
+        cutoff = time.time() - self.expiry_seconds
+        expired = 0
+        for name in os.listdir(self.staging_dir):
+            upload_id, extension = os.path.splitext(name)
+            if extension != ".json":
+                continue
+            try:
+                part_path, meta_path = self._paths(upload_id)
+                if max(os.path.getmtime(part_path), os.path.getmtime(meta_path)) >= cutoff:
+                    continue
+                self.acquire(upload_id)
+            except (OSError, UploadError):
+                continue
+            try:
+                for path in (part_path, meta_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._hashes.pop(upload_id, None)
+                expired += 1
+            finally:
+                self.release(upload_id)
+        if expired:
+            logger.info(f"Expired {expired} idle upload(s)")
+        return expired
+
+    def create(self, report_id: str, filename: str, size: int, sha256: str = None, replace: bool = False) -> Dict:
+        """Start a new upload and return its state; replace is kept for the ingestion job queued on completion"""
+        from .jobs import check_file_type
+
+        # Refuse unsupported files before the client sends any bytes
+        try:
+            check_file_type(filename)
+        except ValueError as e:
+            raise UploadError(str(e), 400)
+        self.expire()
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        meta = {
+            "upload_id": upload_id,
+            "report_id": report_id,
+            "filename": os.path.basename(filename),
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "replace": replace,
+        }
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        open(part_path, "wb").close()
+        self._hashes[upload_id] = [hashlib.sha256(), 0]
+        logger.info(f"Started upload {upload_id} for {meta['filename']} ({size} bytes, report {report_id})")
+        return {**meta, "offset": 0}
+
+    def status(self, upload_id: str) -> Dict:
+        """Current state of an upload, including the offset to resume from"""
+        part_path, meta_path = self._paths(upload_id)
+        if not os.path.exists(meta_path):
+            raise UploadError(f"Unknown upload: {upload_id}", 404)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return {**meta, "offset": os.path.getsize(part_path)}
+
+    def open_chunk(self, upload_id: str, offset: int):
+        """Validate the client's offset and open the .part file for appending"""
+        state = self.status(upload_id)
+        if offset != state["offset"]:
+            raise UploadError(f"Offset mismatch: expected {state['offset']}, got {offset}", 409, state["offset"])
+        f = open(self._paths(upload_id)[0], "ab")
+        # After a restart or a failed chunk the running hash no longer matches the file
+        running = self._hashes.get(upload_id)
+        if running is not None and running[1] != offset:
+            self._hashes.pop(upload_id, None)
+        return f, state
+
+    def write(self, upload_id: str, f, data: bytes, state: Dict) -> int:
+        """Append one piece of a chunk; returns the new offset"""
+        new_offset = f.tell() + len(data)
+        if new_offset > state["size"]:
+            raise UploadError(f"Upload exceeds declared size of {state['size']} bytes", 413, f.tell())
+        f.write(data)
+        running = self._hashes.get(upload_id)
+        if running is not None:
+            running[0].update(data)
+            running[1] = new_offset
+        return new_offset
+
+    def _sha256(self, upload_id: str, part_path: str) -> str:
+        """SHA-256 of the uploaded file, reusing the running hash when it covers the whole file"""
+        running = self._hashes.pop(upload_id, None)
+        if running is not None and running[1] == os.path.getsize(part_path):
+            return running[0].hexdigest()
+        digest = hashlib.sha256()
+        with open(part_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def complete(self, upload_id: str, sha256: str = None) -> Dict:
+        """Verify size and checksum, then move the file into reports/; returns the final state with its path
+
+        Holds the upload's claim, so no chunk can be appended while the file is verified and moved.
+        """
+        self.acquire(upload_id)
+        try:
+            state = self.status(upload_id)
+            part_path, meta_path = self._paths(upload_id)
+            if state["offset"] != state["size"]:
+                raise UploadError(f"Upload incomplete: {state['offset']}/{state['size']} bytes", 409, state["offset"])
+
+            expected = (sha256 or state["sha256"] or "").lower()
+            actual = self._sha256(upload_id, part_path)
+            if expected and actual != expected:
+                # A corrupt file can't be resumed; the client has to start over
+                os.remove(part_path)
+                os.remove(meta_path)
+                raise UploadError(f"Checksum mismatch: expected {expected}, got {actual}", 422)
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{state['report_id']}_{timestamp}_{state['filename']}"
+            file_path = os.path.join(self.reports_dir, filename)
+            os.replace(part_path, file_path)
+            os.remove(meta_path)
+        finally:
+            self.release(upload_id)
+        logger.info(f"Completed upload {upload_id} as {file_path} (sha256 {actual})")
+        return {**state, "sha256": actual, "path": file_path}
+
+# Global upload manager instance
+upload_manager = None
+
+def get_upload_manager() -> UploadManager:
+    """Get or create global upload manager instance"""
+    global upload_manager
+    if upload_manager is None:
+        upload_manager = UploadManager()
+    return upload_manager
@@ -0,0 +1,354 @@
+# Retrieval-augmented chat over a single UFDR report
+import base64
+import binascii
+import io
+import logging
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from .lexical import reciprocal_rank_fusion
+from ..runtime.metrics import observe_chat_timings
+
+logger = logging.getLogger(__name__)
+
+class InvalidImageError(ValueError):
+    """image_data is not valid base64 or not a readable image; maps to HTTP 400"""
+
+def _distance_to_score(distance: float) -> float:
+    """Convert a squared-L2 distance between unit vectors into cosine similarity"""
+    return 1.0 - distance / 2.0
+
+class ChatRetriever:
+    """Embed a question, search the report's vectors and lexical index, and expand the hits with graph context"""
+
+    def __init__(self, text_embedder=None, image_embedder=None, vector_store=None, neo4j_client=None,
+                 lexical_index=None, query_cache=None, top_k: int = 8, max_neighbours: int = 50):
+        """Initialize the retriever; embedders, database clients, lexical index and answer cache default to the global instances"""
+        if text_embedder is None:
+            from ..embeddings.text import get_clip_embedder
+            text_embedder = get_clip_embedder()
+        if vector_store is None:
+            from ..config import get_vector_store
+            vector_store = get_vector_store()
+        if neo4j_client is None:
+            from ..config import get_neo4j_client
+            neo4j_client = get_neo4j_client()
+        if lexical_index is None:
+            from .lexical import get_lexical_index, lexical_enabled
+            lexical_index = get_lexical_index() if lexical_enabled() else None
+        if query_cache is None:
+            from .result_cache import get_query_cache, query_cache_enabled
+            query_cache = get_query_cache() if query_cache_enabled() else None
+
+        self.text_embedder = text_embedder
+        # The image embedder is only loaded the first time a question carries an image
+        self._image_embedder = image_embedder
+        self.vector_store = vector_store
+        self.neo4j_client = neo4j_client
+        self.lexical_index = lexical_index
+        self.query_cache = query_cache
+        # Questions naming an identifier found verbatim in the report are answered without the embedding model
+        self.exact_shortcut = os.getenv("LEXICAL_EXACT_SHORTCUT", "true").lower() == "true"
+        self.lexical_weight = float(os.getenv("LEXICAL_WEIGHT", "1.0"))
+        self.top_k = top_k
+        self.max_neighbours = max_neighbours
+        self._query_batcher = None
+
+    @property
+    def image_embedder(self):
+        if self._image_embedder is None:
+            from ..embeddings.image import get_clip_image_embedder
+            self._image_embedder = get_clip_image_embedder()
+        return self._image_embedder
+
+    @property
+    def query_batcher(self):
+        """Micro-batcher that coalesces concurrent question embeddings into one forward pass"""
+        if self._query_batcher is None:
+            from ..runtime.batcher import MicroBatcher
+            from ..runtime.executor import get_inference_executor
+
+            self._query_batcher = MicroBatcher(
+                self.text_embedder.embed_text,
+                get_inference_executor(),
+                max_batch_size=int(os.getenv("QUERY_BATCH_SIZE", "16")),
+                max_wait_ms=float(os.getenv("QUERY_BATCH_WAIT_MS", "5")),
+                max_queue=int(os.getenv("QUERY_BATCH_MAX_QUEUE", "256")),
+                name="query-embedding",
+            )
+        return self._query_batcher
+
+    def get_query_batcher_stats(self) -> Dict[str, float]:
+        """Micro-batching statistics, empty until the first question is embedded"""
+        return self._query_batcher.stats() if self._query_batcher else {}
+
+    @staticmethod
+    def decode_image(image_data: str):
+        """Decode a base64 (optionally data-URL) image into a PIL image
+
+        Raises InvalidImageError for malformed base64 or data that is not an image.
+        Only the header is read here; pixels are decoded when the image is used.
+        """
+        from PIL import Image, UnidentifiedImageError
+
+        if image_data.startswith("data:"):
+            image_data = image_data.split(",", 1)[1]
+        try:
+            return Image.open(io.BytesIO(base64.b64decode(image_data, validate=True)))
+        except (binascii.Error, ValueError, UnidentifiedImageError) as e:
+            raise InvalidImageError(f"image_data is not a valid base64-encoded image: {e}") from e
+
+    def embed_query(self, message: str, image_data: str = None, timings: Dict[str, float] = None) -> List:
+        """Embed the question text and, if present, the attached image"""
+        timings = timings if timings is not None else {}
+        embeddings = []
+
+        start = time.perf_counter()
+        if message and message.strip():
+            embeddings.append(self.text_embedder.embed_single_text(message))
+        timings["embed_text_ms"] = (time.perf_counter() - start) * 1000
+
+        if image_data:
+            start = time.perf_counter()
+            embeddings.append(self.embed_image_query(image_data))
+            timings["embed_image_ms"] = (time.perf_counter() - start) * 1000
+        return embeddings
+
+    def embed_image_query(self, image_data: str):
+        """Embed a base64 image attached to a question"""
+        return self.image_embedder.embed_single_image(self.decode_image(image_data))
+
+    def search(self, report_id: str, embeddings: List, top_k: int = None) -> List[Dict[str, Any]]:
+        """Top-k search restricted to one report, merging the text and image result lists"""
+        top_k = top_k or self.top_k
+        if not embeddings:
+            return []
+        results = self.vector_store.query(embeddings, n_results=top_k, where={"report_id": report_id})
+
+        # A chunk found by both the text and the image query keeps its best score
+        best: Dict[str, Dict[str, Any]] = {}
+        for hits in results:
+            for hit in hits:
+                hit["score"] = _distance_to_score(hit.pop("distance"))
+                if hit["id"] not in best or hit["score"] > best[hit["id"]]["score"]:
+                    best[hit["id"]] = hit
+        return sorted(best.values(), key=lambda h: h["score"], reverse=True)[:top_k]
+
+    def lexical_search(self, report_id: str, message: str, top_k: int = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """Exact identifier matches if the question has any, otherwise BM25 hits; returns (hits, exact)"""
+        top_k = top_k or self.top_k
+        if self.lexical_index is None or not message or not message.strip():
+            return [], False
+        if self.exact_shortcut:
+            hits = self.lexical_index.exact_lookup(report_id, message, top_k)
+            if hits:
+                return hits, True
+        return self.lexical_index.search(report_id, message, top_k), False
+
+    def fuse(self, vector_hits: List[Dict[str, Any]], lexical_hits: List[Dict[str, Any]],
+             top_k: int = None) -> List[Dict[str, Any]]:
+        """Merge the vector and lexical result lists by reciprocal rank"""
+        if not lexical_hits:
+            return vector_hits
+        if not vector_hits:
+            return lexical_hits
+        return reciprocal_rank_fusion([vector_hits, lexical_hits], [1.0, self.lexical_weight])[:top_k or self.top_k]
+
+    def expand(self, report_id: str, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach neighbouring Neo4j nodes to hits that correspond to graph nodes"""
+        node_ids = {hit["metadata"].get("node_id", hit["id"]): hit for hit in hits}
+        neighbours = self.neo4j_client.get_neighbours(report_id, list(node_ids), self.max_neighbours)
+        for node_id, hit in node_ids.items():
+            hit["context"] = neighbours.get(node_id, [])
+        return hits
+
+    @staticmethod
+    def compose_answer(report_id: str, message: str, hits: List[Dict[str, Any]]) -> str:
+        """Summarise the retrieved evidence as the chat answer"""
+        if not hits:
+            return f"No matching evidence was found in report {report_id}."
+
+        lines = [f"Found {len(hits)} relevant item(s) in report {report_id}:"]
+        for hit in hits:
+            source = hit["metadata"].get("source", "unknown source")
+            snippet = (hit.get("document") or "").strip()
+            if len(snippet) > 200:
+                snippet = snippet[:200].rstrip() + "…"
+            lines.append(f"- [{source}] {snippet} (score {hit['score']:.2f})")
+            for neighbour in hit.get("context", [])[:3]:
+                labels = ":".join(neighbour["labels"])
+                name = neighbour["properties"].get("name") or neighbour["properties"].get("id", "")
+                lines.append(f"  - {neighbour['relationship']} → {labels} {name}")
+        return "\n".join(lines)
+
+    def _cache_lookup(self, report_id: str, message: str, image_data: str,
+                      timings: Dict[str, float]) -> Tuple[Dict[str, Any], int]:
+        """Cached {"response", "evidence"} for the question, or None, and the report generation to store under"""
+        if self.query_cache is None:
+            return None, 0
+        start = time.perf_counter()
+        # Read before the lookup, so an ingestion finishing mid-retrieval discards the result
+        generation = self.query_cache.generation(report_id)
+        cached = self.query_cache.get(report_id, message, image_data)
+        timings["cache_ms"] = (time.perf_counter() - start) * 1000
+        return cached, generation
+
+    def _cache_store(self, report_id: str, message: str, image_data: str, response: str,
+                     hits: List[Dict[str, Any]], generation: int):
+        if self.query_cache is not None and generation is not None:
+            self.query_cache.put(report_id, message, image_data, {"response": response, "evidence": hits}, generation)
+
+    @staticmethod
+    def _finish_timings(report_id: str, timings: Dict[str, float], total_start: float):
+        """Record the total and log the stage timings"""
+        timings["total_ms"] = (time.perf_counter() - total_start) * 1000
+        observe_chat_timings(report_id, timings)
+        logger.info(f"Chat retrieval for report {report_id}: " +
+                    ", ".join(f"{stage}={ms:.1f}" for stage, ms in timings.items()))
+
+    def _result(self, report_id: str, message: str, hits: List[Dict[str, Any]],
+                timings: Dict[str, float], total_start: float, response: str = None) -> Dict[str, Any]:
+        """Compose the answer, unless it came from the cache, and log the stage timings"""
+        if response is None:
+            response = self.compose_answer(report_id, message, hits)
+        self._finish_timings(report_id, timings, total_start)
+        return {"response": response, "evidence": hits, "timings": timings}
+
+    def answer(self, report_id: str, message: str, image_data: str = None) -> Dict[str, Any]:
+        """Run the full retrieval path and return the answer, evidence and per-stage timings"""
+        timings: Dict[str, float] = {}
+        total_start = time.perf_counter()
+
+        cached, generation = self._cache_lookup(report_id, message, image_data, timings)
+        if cached is not None:
+            return self._result(report_id, message, cached["evidence"], timings, total_start, cached["response"])
+
+        start = time.perf_counter()
+        lexical_hits, exact = self.lexical_search(report_id, message)
+        timings["lexical_search_ms"] = (time.perf_counter() - start) * 1000
+
+        if exact and not image_data:
+            hits = lexical_hits
+        else:
+            embeddings = self.embed_query(message, image_data, timings)
+
+            start = time.perf_counter()
+            hits = self.fuse(self.search(report_id, embeddings), lexical_hits)
+            timings["vector_search_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        try:
+            hits = self.expand(report_id, hits)
+        except Exception as e:
+            # Graph context is an enrichment; the vector evidence is still worth returning
+            logger.warning(f"Graph expansion failed for report {report_id}: {e}")
+            # Only complete answers are cached
+            generation = None
+        timings["graph_expand_ms"] = (time.perf_counter() - start) * 1000
+
+        result = self._result(report_id, message, hits, timings, total_start)
+        self._cache_store(report_id, message, image_data, result["response"], hits, generation)
+        return result
+
+    async def stream_answer(self, report_id: str, message: str,
+                            image_data: str = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Run retrieval on the bounded executors, yielding (event, data) pairs as each stage finishes
+
+        Events: "evidence" once per hit right after the search, "context" per
+        hit with graph neighbours, "token" for answer text and a final "done" with
+        the stage timings. A cached answer is replayed as the same events. Raises
+        ExecutorBusyError when either executor is full.
+        """
+        from ..runtime.executor import ExecutorBusyError, get_inference_executor, get_io_executor
+
+        timings: Dict[str, float] = {}
+        total_start = time.perf_counter()
+
+        cached, generation = self._cache_lookup(report_id, message, image_data, timings)
+        if cached is not None:
+            for hit in cached["evidence"]:
+                yield "evidence", hit
+            for hit in cached["evidence"]:
+                if hit.get("context"):
+                    yield "context", {"id": hit["id"], "context": hit["context"]}
+            for token in re.findall(r"\S+\s*|\s+", cached["response"]):
+                yield "token", {"text": token}
+            self._finish_timings(report_id, timings, total_start)
+            yield "done", {"status": "success", "timings": timings, "cached": True}
+            return
+
+        start = time.perf_counter()
+        lexical_hits, exact = await get_io_executor().run(self.lexical_search, report_id, message)
+        timings["lexical_search_ms"] = (time.perf_counter() - start) * 1000
+
+        if exact and not image_data:
+            hits = lexical_hits
+        else:
+            embeddings = []
+            start = time.perf_counter()
+            if message and message.strip():
+                # Concurrent questions share one text forward pass
+                embeddings.append(await self.query_batcher.submit(message))
+            timings["embed_text_ms"] = (time.perf_counter() - start) * 1000
+
+            if image_data:
+                start = time.perf_counter()
+                embeddings.append(await get_inference_executor().run(self.embed_image_query, image_data))
+                timings["embed_image_ms"] = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            hits = self.fuse(await get_io_executor().run(self.search, report_id, embeddings), lexical_hits)
+            timings["vector_search_ms"] = (time.perf_counter() - start) * 1000
+        for hit in hits:
+            yield "evidence", hit
+
+        start = time.perf_counter()
+        try:
+            hits = await get_io_executor().run(self.expand, report_id, hits)
+        except ExecutorBusyError:
+            raise
+        except Exception as e:
+            # Graph context is an enrichment; the vector evidence is still worth returning
+            logger.warning(f"Graph expansion failed for report {report_id}: {e}")
+            # Only complete answers are cached
+            generation = None
+        timings["graph_expand_ms"] = (time.perf_counter() - start) * 1000
+        for hit in hits:
+            if hit.get("context"):
+                yield "context", {"id": hit["id"], "context": hit["context"]}
+
+        response = self.compose_answer(report_id, message, hits)
+        # Whitespace is kept with each word so clients can concatenate tokens verbatim
+        for token in re.findall(r"\S+\s*|\s+", response):
+            yield "token", {"text": token}
+
+        self._finish_timings(report_id, timings, total_start)
+        self._cache_store(report_id, message, image_data, response, hits, generation)
+        yield "done", {"status": "success", "timings": timings, "cached": False}
+
+    async def answer_async(self, report_id: str, message: str, image_data: str = None) -> Dict[str, Any]:
+        """Same as answer, but model inference and database calls run on the bounded executors
+
+        Raises ExecutorBusyError when either executor is full.
+        """
+        evidence, tokens, timings = [], [], {}
+        async for event, data in self.stream_answer(report_id, message, image_data):
+            if event == "evidence":
+                evidence.append(data)
+            elif event == "token":
+                tokens.append(data["text"])
+            elif event == "done":
+                timings = data["timings"]
+        return {"response": "".join(tokens), "evidence": evidence, "timings": timings}
+
+# Global chat retriever instance
+chat_retriever = None
+
+def get_chat_retriever() -> ChatRetriever:
+    """Get or create global chat retriever instance"""
+    global chat_retriever
+    if chat_retriever is None:
+        chat_retriever = ChatRetriever()
+    return chat_retriever
@@ -0,0 +1,326 @@
+# Lexical inverted index: BM25 over report chunks with exact postings for identifiers
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# (id, document, metadata) of one indexed chunk
+LexicalRecord = Tuple[str, str, Dict[str, Any]]
+
+_WORD = re.compile(r"[^\W_]+")
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# Phone numbers and IMEIs as written in exports: +91 98765-43210, (555) 123 4567, 35-209900-176148-1
+_NUMBER = re.compile(r"\+?\d[\d ()./-]{5,}\d")
+# Dates and times (2023-01-15, 15/01/2023, 10:30:00) are cut out first, so a timestamp isn't read as a number
+_DATETIME = re.compile(
+    r"(?<![\d+])(?:\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01])"
+    r"|(?:0?[1-9]|[12]\d|3[01])[/.-](?:0?[1-9]|[12]\d|3[01])[/.-](?:\d{4}|\d{2})"
+    r"|(?:[01]?\d|2[0-3]):[0-5]\d(?::[0-5]\d)?)(?!\d)"
+)
+
+# Too frequent to discriminate between chunks; identifiers are never dropped
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its me my of on or our she so that "
+    "the their them they this to was we were what when where which who will with you your".split()
+)
+
+def _digit_runs(text: str) -> List[str]:
+    """Digits of each phone-number-like run in the text, skipping dates and times"""
+    return [re.sub(r"\D", "", number) for number in _NUMBER.findall(_DATETIME.sub(" | ", text))]
+
+def _number_terms(digits: str) -> List[str]:
+    """Index terms of a digit run: the run itself, plus the national part of a phone number with country code"""
+    if len(digits) < 7:
+        return []
+    # 11-13 digits is a phone number with a country code; IMEIs (15) and longer ids stay whole
+    if 11 <= len(digits) <= 13:
+        return [digits, digits[-10:]]
+    return [digits]
+
+def _is_identifier_word(word: str) -> bool:
+    """Long tokens mixing letters and digits: wallet addresses, hashes, device and account ids"""
+    return len(word) >= 12 and any(c.isdigit() for c in word) and any(c.isalpha() for c in word)
+
+def identifiers(text: str) -> Set[str]:
+    """Normalised identifiers in a question or chunk: emails, phone numbers/IMEIs (digits only) and long ids
+
+    Phone numbers with a country code normalise to their last ten digits, so a
+    question matches the number however the export formatted it.
+    """
+    found = {email.lower().strip(".") for email in _EMAIL.findall(text)}
+    for digits in _digit_runs(text):
+        terms = _number_terms(digits)
+        if terms:
+            found.add(terms[-1])
+    found.update(word for word in (w.lower() for w in _WORD.findall(text)) if _is_identifier_word(word))
+    return found
+
+def tokenize(text: str) -> Counter:
+    """Term frequencies of a chunk: lower-cased words without stopwords, plus normalised identifiers"""
+    terms = Counter(word for word in (w.lower() for w in _WORD.findall(text)) if word not in STOPWORDS)
+    extra = {email.lower().strip(".") for email in _EMAIL.findall(text)}
+    for digits in _digit_runs(text):
+        extra.update(_number_terms(digits))
+    for term in extra:
+        # A bare digit run is already counted as a word
+        if term not in terms:
+            terms[term] = 1
+    return terms
+
+class ReportPostings:
+    """Inverted index of one report in its own SQLite file"""
+
+    def __init__(self, path: str):
+        """Open (or create) the report's index"""
+        self.path = path
+        self.lock = threading.Lock()
+        # One connection per report; access is serialised by self.lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, source TEXT, length INTEGER NOT NULL, "
+            "document TEXT, metadata TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS docs_source ON docs (source)")
+        # Postings are clustered by term, so a lookup is one range scan
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_id ON postings (id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS totals (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self.docs, self.total_length = self._totals()
+
+    def _totals(self) -> Tuple[int, int]:
+        rows = dict(self._conn.execute("SELECT key, value FROM totals").fetchall())
+        return rows.get("docs", 0), rows.get("length", 0)
+
+    def _save_totals(self):
+        self._conn.executemany("INSERT OR REPLACE INTO totals (key, value) VALUES (?, ?)",
+                               (("docs", self.docs), ("length", self.total_length)))
+
+    def _remove(self, ids: List[str]) -> int:
+        """Drop documents and their postings; caller holds the lock and a transaction"""
+        removed = 0
+        for id_ in ids:
+            row = self._conn.execute("SELECT length FROM docs WHERE id = ?", (id_,)).fetchone()
+            if row is None:
+                continue
+            self._conn.execute("DELETE FROM postings WHERE id = ?", (id_,))
+            self._conn.execute("DELETE FROM docs WHERE id = ?", (id_,))
+            self.docs -= 1
+            self.total_length -= row[0]
+            removed += 1
+        return removed
+
+    def add(self, records: List[LexicalRecord]):
+        """Index a batch of chunks, replacing any already indexed under the same id"""
+        with self.lock, self._conn:
+            self._remove([id_ for id_, _, _ in records])
+            for id_, document, metadata in records:
+                terms = tokenize(document)
+                length = sum(terms.values())
+                self._conn.execute(
+                    "INSERT INTO docs (id, source, length, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                    (id_, metadata.get("source"), length, document, json.dumps(metadata, default=str)),
+                )
+                self._conn.executemany("INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)",
+                                       ((term, id_, tf) for term, tf in terms.items()))
+                self.docs += 1
+                self.total_length += length
+            self._save_totals()
+
+    def delete(self, ids: List[str]) -> int:
+        with self.lock, self._conn:
+            removed = self._remove(ids)
+            self._save_totals()
+        return removed
+
+    def has_source(self, source: str) -> bool:
+        with self.lock:
+            return self._conn.execute("SELECT 1 FROM docs WHERE source = ? LIMIT 1", (source,)).fetchone() is not None
+
+    def postings(self, term: str) -> List[Tuple[str, int, int]]:
+        """(id, tf, document length) of every chunk containing a term"""
+        with self.lock:
+            return self._conn.execute(
+                "SELECT p.id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.id WHERE p.term = ?", (term,)
+            ).fetchall()
+
+    def fetch(self, ids: List[str]) -> Dict[str, Tuple[str, Dict]]:
+        """Documents and metadata by id"""
+        with self.lock:
+            rows = self._conn.execute(
+                f"SELECT id, document, metadata FROM docs WHERE id IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {id_: (document, json.loads(metadata)) for id_, document, metadata in rows}
+
+    def close(self):
+        with self.lock:
+            self._conn.close()
+
+class LexicalIndex:
+    """BM25 and exact identifier lookup over report chunks, partitioned into one SQLite file per report
+
+    Appends are plain B-tree inserts, so ingestion indexes each batch as it is
+    embedded; ids match the vector store's, so both result lists can be fused.
+    """
+
+    def __init__(self, path: str = None, k1: float = 1.2, b: float = 0.75, max_df_ratio: float = None):
+        """Open (or create) the index directory"""
+        self.path = path or os.getenv("LEXICAL_INDEX_PATH", "data/lexical")
+        self.k1 = k1
+        self.b = b
+        # Words in more than this share of a report's chunks are skipped at query time
+        self.max_df_ratio = max_df_ratio or float(os.getenv("LEXICAL_MAX_DF_RATIO", "0.5"))
+        os.makedirs(self.path, exist_ok=True)
+        self._reports: Dict[str, ReportPostings] = {}
+        self._lock = threading.Lock()
+        logger.info(f"Lexical index opened at {self.path}")
+
+    def _report(self, report_id: str) -> ReportPostings:
+        """Open a report's partition on first use"""
+        with self._lock:
+            report = self._reports.get(report_id)
+            if report is None:
+                safe = re.sub(r"[^A-Za-z0-9_.-]", "_", report_id)[:64]
+                digest = hashlib.sha1(report_id.encode("utf-8")).hexdigest()[:8]
+                report = ReportPostings(os.path.join(self.path, f"{safe}-{digest}.db"))
+                self._reports[report_id] = report
+            return report
+
+    def add(self, report_id: str, records: Iterable[LexicalRecord], batch_size: int = 500) -> int:
+        """Index chunks of one report; returns the number indexed"""
+        records = iter(records)
+        report = self._report(report_id)
+        added = 0
+        for batch in iter(lambda: list(islice(records, batch_size)), []):
+            report.add(batch)
+            added += len(batch)
+        return added
+
+    def delete(self, report_id: str, ids: Iterable[str]) -> int:
+        """Remove chunks of one report by id"""
+        ids = list(ids)
+        return self._report(report_id).delete(ids) if ids else 0
+
+    def has_source(self, report_id: str, source: str) -> bool:
+        """True if any chunk of a report file is indexed"""
+        return self._report(report_id).has_source(source)
+
+    def _hits(self, report: ReportPostings, scores: Dict[str, float], top_k: int) -> List[Dict[str, Any]]:
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        docs = report.fetch([id_ for id_, _ in ranked]) if ranked else {}
+        return [{"id": id_, "document": docs[id_][0], "metadata": docs[id_][1], "score": score}
+                for id_, score in ranked if id_ in docs]
+
+    def search(self, report_id: str, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        """BM25 top-k over one report, as {"id", "document", "metadata", "score"} hits"""
+        report = self._report(report_id)
+        if not report.docs:
+            return []
+        n, average_length = report.docs, report.total_length / report.docs
+        exact = identifiers(query)
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)) | exact:
+            postings = report.postings(term)
+            df = len(postings)
+            if not df or (term not in exact and n >= 100 and df > self.max_df_ratio * n):
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for id_, tf, length in postings:
+                norm = tf + self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[id_] = scores.get(id_, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return self._hits(report, scores, top_k)
+
+    def exact_lookup(self, report_id: str, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        """Chunks containing every identifier in the question, without any scoring model
+
+        Returns [] when the question has no identifiers or no chunk has all of them.
+        Hits are ordered by how often the identifiers occur and scored 1.0.
+        """
+        terms = identifiers(query)
+        if not terms:
+            return []
+        report = self._report(report_id)
+        matched: Dict[str, int] = None
+        for term in terms:
+            counts = {id_: tf for id_, tf, _ in report.postings(term)}
+            matched = counts if matched is None else {
+                id_: tf + counts[id_] for id_, tf in matched.items() if id_ in counts}
+            if not matched:
+                return []
+        hits = self._hits(report, matched, top_k)
+        for hit in hits:
+            hit["score"] = 1.0
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        """Open partitions and indexed chunks"""
+        with self._lock:
+            reports = list(self._reports.values())
+        return {"reports_loaded": len(reports), "chunks_loaded": sum(report.docs for report in reports)}
+
+    def close(self):
+        """Close every partition"""
+        with self._lock:
+            for report in self._reports.values():
+                report.close()
+            self._reports.clear()
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], weights: List[float] = None,
+                           k: int = 60) -> List[Dict[str, Any]]:
+    """Merge ranked hit lists by reciprocal rank, keeping the first copy of each hit
+
+    Scores are normalised so a hit ranked first in every list scores 1.0.
+    """
+    weights = weights or [1.0] * len(result_lists)
+    fused: Dict[str, float] = {}
+    hits: Dict[str, Dict[str, Any]] = {}
+    for results, weight in zip(result_lists, weights):
+        for rank, hit in enumerate(results):
+            fused[hit["id"]] = fused.get(hit["id"], 0.0) + weight / (k + rank + 1)
+            hits.setdefault(hit["id"], hit)
+    best = sum(weight / (k + 1) for weight in weights)
+    merged = []
+    for id_, score in sorted(fused.items(), key=lambda item: item[1], reverse=True):
+        hit = dict(hits[id_])
+        hit["score"] = score / best
+        merged.append(hit)
+    return merged
+
+# Global lexical index instance
+lexical_index = None
+
+def lexical_enabled() -> bool:
+    """Whether ingestion builds, and chat consults, the lexical index"""
+    return os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"
+
+def get_lexical_index() -> LexicalIndex:
+    """Get or create global lexical index instance"""
+    global lexical_index
+    if lexical_index is None:
+        lexical_index = LexicalIndex()
+    return lexical_index
+
+def close_lexical_index():
+    """Close the global lexical index"""
+    global lexical_index
+    if lexical_index:
+        lexical_index.close()
+        lexical_index = None
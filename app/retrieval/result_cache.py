@@ -0,0 +1,110 @@
+# Chat answer cache keyed by report and normalised question, invalidated by ingestion
+import copy
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+def normalise_question(message: str) -> str:
+    """Case-folded question with whitespace collapsed and trailing punctuation dropped"""
+    return re.sub(r"[\s?!.]+$", "", " ".join((message or "").lower().split()))
+
+class QueryResultCache:
+    """Bounded LRU of chat results with a TTL
+
+    Each report has a generation number that ingestion bumps; it is part of the
+    key, so entries of a report whose data changed are never served again and
+    age out of the LRU.
+    """
+
+    def __init__(self, max_items: int = None, ttl: float = None):
+        """Create an empty cache"""
+        self.max_items = max_items or int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+        self.ttl = ttl or float(os.getenv("QUERY_CACHE_TTL", "600"))
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generation(self, report_id: str) -> int:
+        """Current data generation of a report"""
+        with self._lock:
+            return self._generations.get(report_id, 0)
+
+    @staticmethod
+    def _key(report_id: str, generation: int, message: str, image_data: str = None) -> Tuple:
+        image = hashlib.sha256(image_data.encode("utf-8")).hexdigest() if image_data else None
+        return report_id, generation, normalise_question(message), image
+
+    def get(self, report_id: str, message: str, image_data: str = None) -> Optional[Dict[str, Any]]:
+        """Cached result for a question, or None"""
+        with self._lock:
+            key = self._key(report_id, self._generations.get(report_id, 0), message, image_data)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, report_id: str, message: str, image_data: str, result: Dict[str, Any], generation: int):
+        """Store a result computed while the report was at the given generation
+
+        Results computed across an ingestion are dropped rather than stored under the new generation.
+        """
+        result = copy.deepcopy(result)
+        with self._lock:
+            if self._generations.get(report_id, 0) != generation:
+                return
+            key = self._key(report_id, generation, message, image_data)
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, report_id: str):
+        """Stop serving cached results of a report"""
+        with self._lock:
+            self._generations[report_id] = self._generations.get(report_id, 0) + 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratio and size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._entries), "max_items": self.max_items, "hits": self.hits,
+                    "misses": self.misses, "hit_ratio": self.hits / lookups if lookups else 0.0,
+                    "invalidations": self.invalidations}
+
+# Global query result cache instance
+query_cache = None
+
+def query_cache_enabled() -> bool:
+    """Whether chat answers are cached"""
+    return os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+
+def get_query_cache() -> QueryResultCache:
+    """Get or create global query result cache instance"""
+    global query_cache
+    if query_cache is None:
+        query_cache = QueryResultCache()
+    return query_cache
+
+def invalidate_report(report_id: str):
+    """Drop cached answers of a report after its data changed; a no-op until the cache is in use"""
+    if query_cache is not None:
+        query_cache.invalidate(report_id)
@@ -0,0 +1,118 @@
+# Request-coalescing micro-batcher for concurrent async callers
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+from .executor import ExecutorBusyError
+from .metrics import observe_batch
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Coalesce concurrent single-item requests into batched calls
+
+    Callers await submit(item). The first queued item opens a batch that closes
+    after max_wait_ms or max_batch_size items, whichever comes first; fn then runs
+    once on the executor for the whole batch and each caller gets its own row.
+    While all batch slots are busy, new requests keep queueing, so batches grow
+    with load, up to max_queue waiting items; beyond that submit raises
+    ExecutorBusyError like the executor itself would.
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], Any], executor, max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0, max_concurrent_batches: int = None, max_queue: int = 256,
+                 name: str = "batcher"):
+        """Initialize the batcher; fn maps a list of items to a sequence of per-item results"""
+        self.fn = fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrent_batches = max_concurrent_batches or executor.max_workers
+        self.max_queue = max_queue
+        self.name = name
+        self.rejected = 0
+
+        self._queue = None
+        self._task = None
+        self._slots = None
+
+        self.batches = 0
+        self.items = 0
+        self._batch_sizes = deque(maxlen=1000)
+        self._wait_ms = deque(maxlen=1000)
+
+    def _ensure_started(self):
+        """Start the collector task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result; raises ExecutorBusyError when the queue is full"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise ExecutorBusyError(self.name, self.executor.retry_after)
+        return await future
+
+    async def _collect(self):
+        """Form batches from the queue and dispatch them as slots free up"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            loop.create_task(self._execute(batch))
+
+    async def _execute(self, batch: List):
+        """Run fn over one batch and resolve each caller's future"""
+        try:
+            dispatched = time.perf_counter()
+            self.batches += 1
+            self.items += len(batch)
+            self._batch_sizes.append(len(batch))
+            self._wait_ms.append((dispatched - batch[0][2]) * 1000)
+            observe_batch(self.name, [dispatched - queued for _, _, queued in batch])
+
+            try:
+                results = await self.executor.run(self.fn, [item for item, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, future, _), result in zip(batch, results):
+                # A caller that disconnected has a cancelled future
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        """Batch size and queueing delay over the most recent batches"""
+        sizes = sorted(self._batch_sizes)
+        waits = sorted(self._wait_ms)
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+            "max_batch_size": sizes[-1] if sizes else 0,
+            "mean_wait_ms": sum(waits) / len(waits) if waits else 0.0,
+            "p95_wait_ms": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "rejected": self.rejected,
+        }
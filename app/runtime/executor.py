@@ -0,0 +1,107 @@
+# Bounded executors that keep blocking work off the asyncio event loop
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class ExecutorBusyError(Exception):
+    """Raised when an executor already has as much work as it is allowed to queue"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} executor is at capacity")
+        self.name = name
+        self.retry_after = retry_after
+
+class BoundedExecutor:
+    """Thread pool with a hard cap on running plus queued tasks
+
+    Work beyond max_workers + max_queue is rejected immediately with
+    ExecutorBusyError instead of piling up latency behind the queue.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int = 1):
+        """Initialize the executor"""
+        self.name = name
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        self.retry_after = retry_after
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Tasks waiting for a worker"""
+        return max(self._in_flight - self.max_workers, 0)
+
+    @property
+    def in_flight(self) -> int:
+        """Tasks running or waiting"""
+        return self._in_flight
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the pool and await its result"""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise ExecutorBusyError(self.name, self.retry_after)
+            self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def shutdown(self):
+        """Stop accepting work and wait for running tasks"""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        logger.info(f"{self.name} executor shut down")
+
+# Global executor instances
+inference_executor = None
+io_executor = None
+
+def get_inference_executor() -> BoundedExecutor:
+    """Get or create the executor for CPU-bound model inference
+
+    Few workers: each torch forward pass already uses several intra-op threads.
+    """
+    global inference_executor
+    if inference_executor is None:
+        inference_executor = BoundedExecutor(
+            "inference",
+            max_workers=int(os.getenv("INFERENCE_WORKERS", "2")),
+            max_queue=int(os.getenv("INFERENCE_QUEUE", "16")),
+        )
+    return inference_executor
+
+def get_io_executor() -> BoundedExecutor:
+    """Get or create the executor for blocking database and network calls"""
+    global io_executor
+    if io_executor is None:
+        io_executor = BoundedExecutor(
+            "io",
+            max_workers=int(os.getenv("IO_WORKERS", "16")),
+            max_queue=int(os.getenv("IO_QUEUE", "64")),
+        )
+    return io_executor
+
+def shutdown_executors():
+    """Shut down the global executors"""
+    global inference_executor, io_executor
+    for executor in (inference_executor, io_executor):
+        if executor:
+            executor.shutdown()
+    inference_executor = None
+    io_executor = None
@@ -0,0 +1,131 @@
+# Startup, health monitoring and shutdown of the backend's long-lived resources
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+def connect_clients() -> Dict[str, object]:
+    """Create the global database clients, tolerating databases that are not up yet
+
+    A client that fails here is retried by monitor_clients, so the API can start
+    before its databases do.
+    """
+    from ..config import get_neo4j_client, get_vector_store
+
+    clients = {}
+    for name, getter in (("neo4j", get_neo4j_client), ("vectors", get_vector_store)):
+        try:
+            clients[name] = getter()
+        except Exception as e:
+            logger.warning(f"{name} unavailable at startup, will keep retrying: {e}")
+            clients[name] = None
+    return clients
+
+def check_clients(clients: Dict[str, object]) -> Dict[str, bool]:
+    """Health-check each client in place, creating the ones that never connected"""
+    from ..config import get_neo4j_client, get_vector_store
+
+    getters = {"neo4j": get_neo4j_client, "vectors": get_vector_store}
+    health = {}
+    for name, getter in getters.items():
+        client = clients.get(name)
+        if client is None:
+            try:
+                client = clients[name] = getter()
+            except Exception:
+                health[name] = False
+                continue
+        health[name] = client.health_check()
+    return health
+
+async def monitor_clients(clients: Dict[str, object], interval: float = None):
+    """Periodically health-check the database clients so a restarted database is reconnected promptly"""
+    interval = interval or float(os.getenv("DB_HEALTH_CHECK_INTERVAL", "15"))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Not on the bounded io executor: health checks must not be shed under load
+            health = await asyncio.get_running_loop().run_in_executor(None, check_clients, clients)
+            if not all(health.values()):
+                logger.warning(f"Database health: {health}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Database health check failed: {e}")
+
+def warm_up() -> Dict[str, float]:
+    """Load the models and push a dummy batch through them, so the first question pays no start-up cost
+
+    Only the embedders are touched; the databases connect on first use, so a slow Neo4j
+    neither fails readiness nor shows up in the model timings. Returns the milliseconds
+    spent loading and in the first forward pass.
+    """
+    from ..embeddings.text import get_clip_embedder
+
+    timings = {}
+    start = time.perf_counter()
+    text_embedder = get_clip_embedder()
+    timings["load_text_model_ms"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    text_embedder.warm_up()
+    timings["text_batch_ms"] = (time.perf_counter() - start) * 1000
+
+    if os.getenv("WARMUP_IMAGE_MODEL", "false").lower() == "true":
+        from ..embeddings.image import get_clip_image_embedder
+
+        start = time.perf_counter()
+        image_embedder = get_clip_image_embedder()
+        timings["load_image_model_ms"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        image_embedder.warm_up()
+        timings["image_batch_ms"] = (time.perf_counter() - start) * 1000
+    return timings
+
+async def run_warm_up(state: Any, started: float):
+    """Warm up off the event loop and publish the outcome as state.readiness
+
+    started is the perf_counter value at process start, for the time-to-ready log line.
+    """
+    if os.getenv("WARMUP_ENABLED", "true").lower() != "true":
+        state.readiness = {"status": "ready", "warm_up": False}
+        return
+    state.readiness = {"status": "warming_up"}
+    try:
+        timings = await asyncio.get_running_loop().run_in_executor(None, warm_up)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+        state.readiness = {"status": "failed", "detail": str(e)}
+        return
+    ready_ms = (time.perf_counter() - started) * 1000
+    state.readiness = {"status": "ready", "warm_up": True, "ready_after_ms": ready_ms, **timings}
+    logger.info(f"Warm-up finished, ready {ready_ms / 1000:.2f}s after start: " +
+                ", ".join(f"{stage}={ms:.1f}" for stage, ms in timings.items()))
+
+def shutdown_services():
+    """Stop background work first, then close the executors, databases and local stores"""
+    from ..config import close_neo4j_client, close_vector_store
+    from ..embeddings.cache import close_embedding_cache
+    from ..insertion import jobs
+    from ..insertion.manifest import close_ingest_manifest
+    from ..retrieval.lexical import close_lexical_index
+    from .executor import shutdown_executors
+
+    if jobs.job_manager is not None:
+        jobs.job_manager.shutdown()
+        jobs.job_manager = None
+    shutdown_executors()
+    close_neo4j_client()
+    close_vector_store()
+    close_embedding_cache()
+    close_ingest_manifest()
+    close_lexical_index()
+    logger.info("Backend services shut down")
@@ -0,0 +1,223 @@
+# Prometheus metrics: per-stage latency histograms and live runtime gauges
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Sub-millisecond cache hits up to multi-second cold batches
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+# Micro-batch windows are a few milliseconds; the upper buckets show requests stuck behind busy slots
+QUEUE_WAIT_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Batch sizes are labelled by range to keep label cardinality bounded
+_BATCH_LABELS = ((1, "1"), (8, "2-8"), (32, "9-32"), (128, "33-128"), (512, "129-512"))
+
+# Report tiers by number of indexed vectors; report ids themselves are unbounded, so never used as labels
+REPORT_TIERS = ((0, "empty"), (10_000, "small"), (100_000, "medium"), (1_000_000, "large"))
+
+EMBEDDING_LATENCY = Histogram(
+    "ufdr_embedding_seconds", "Model forward pass latency per batch",
+    ["modality", "batch_size"], buckets=LATENCY_BUCKETS,
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "ufdr_embedding_batch_size", "Items per model forward pass", ["modality"], buckets=BATCH_SIZE_BUCKETS,
+)
+BATCHER_BATCH_SIZE = Histogram(
+    "ufdr_batcher_batch_size", "Requests coalesced into one micro-batch", ["batcher"], buckets=BATCH_SIZE_BUCKETS,
+)
+BATCHER_QUEUE_SECONDS = Histogram(
+    "ufdr_batcher_queue_seconds", "Time a request waited in the micro-batcher until its batch was dispatched",
+    ["batcher"], buckets=QUEUE_WAIT_BUCKETS,
+)
+EMBEDDING_CACHE_REQUESTS = Counter(
+    "ufdr_embedding_cache_requests_total", "Embedding lookups by cache result", ["modality", "result"],
+)
+VECTOR_LATENCY = Histogram(
+    "ufdr_vector_store_seconds", "ChromaDB request latency", ["operation"], buckets=LATENCY_BUCKETS,
+)
+GRAPH_LATENCY = Histogram(
+    "ufdr_graph_seconds", "Neo4j query latency", ["operation"], buckets=LATENCY_BUCKETS,
+)
+CHAT_STAGE_LATENCY = Histogram(
+    "ufdr_chat_stage_seconds", "Chat retrieval latency per stage", ["stage", "report_tier"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "ufdr_http_request_seconds", "HTTP request latency until the response starts",
+    ["method", "endpoint", "status"], buckets=LATENCY_BUCKETS,
+)
+INGEST_SECONDS = Histogram(
+    "ufdr_ingest_file_seconds", "Time to ingest one report file", ["modality"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+)
+INGEST_BYTES = Counter("ufdr_ingest_bytes_total", "Bytes of report files ingested", ["modality"])
+INGEST_VECTORS = Counter("ufdr_ingest_vectors_total", "Vectors written during ingestion", ["modality"])
+
+def batch_size_label(size: int) -> str:
+    """Range label for a batch size"""
+    for limit, label in _BATCH_LABELS:
+        if size <= limit:
+            return label
+    return "513+"
+
+@contextmanager
+def observe(histogram: Histogram, **labels):
+    """Time a block into a histogram, whether or not it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+def observe_embedding(modality: str, batch_size: int, seconds: float):
+    """Record one model forward pass"""
+    EMBEDDING_LATENCY.labels(modality=modality, batch_size=batch_size_label(batch_size)).observe(seconds)
+    EMBEDDING_BATCH_SIZE.labels(modality=modality).observe(batch_size)
+
+def observe_batch(batcher: str, waits: List[float]):
+    """Record one dispatched micro-batch from the seconds each of its requests spent queued"""
+    BATCHER_BATCH_SIZE.labels(batcher=batcher).observe(len(waits))
+    queue_seconds = BATCHER_QUEUE_SECONDS.labels(batcher=batcher)
+    for wait in waits:
+        queue_seconds.observe(wait)
+
+def observe_cache(modality: str, hits: int, misses: int):
+    """Record embedding cache lookups"""
+    if hits:
+        EMBEDDING_CACHE_REQUESTS.labels(modality=modality, result="hit").inc(hits)
+    if misses:
+        EMBEDDING_CACHE_REQUESTS.labels(modality=modality, result="miss").inc(misses)
+
+def observe_ingest(modality: str, seconds: float, bytes_read: int, vectors: int):
+    """Record one ingested file"""
+    INGEST_SECONDS.labels(modality=modality).observe(seconds)
+    INGEST_BYTES.labels(modality=modality).inc(bytes_read)
+    INGEST_VECTORS.labels(modality=modality).inc(vectors)
+
+_tier_cache: Dict[str, tuple] = {}
+_tier_lock = threading.Lock()
+
+def report_tier(report_id: str, ttl: float = 60.0) -> str:
+    """Size tier of a report from the ingestion manifest, cached for ttl seconds"""
+    now = time.monotonic()
+    with _tier_lock:
+        cached = _tier_cache.get(report_id)
+    if cached and now - cached[1] < ttl:
+        return cached[0]
+
+    try:
+        from ..insertion.manifest import get_ingest_manifest
+        vectors = get_ingest_manifest().report_size(report_id)
+    except Exception as e:
+        logger.debug(f"Could not size report {report_id}: {e}")
+        return "unknown"
+    tier = "xlarge"
+    for limit, label in REPORT_TIERS:
+        if vectors <= limit:
+            tier = label
+            break
+    with _tier_lock:
+        _tier_cache[report_id] = (tier, now)
+    return tier
+
+def observe_chat_timings(report_id: str, timings: Dict[str, float]):
+    """Record the per-stage timings of one chat answer"""
+    tier = report_tier(report_id)
+    for stage, ms in timings.items():
+        CHAT_STAGE_LATENCY.labels(stage=stage.replace("_ms", ""), report_tier=tier).observe(ms / 1000)
+
+class RuntimeCollector:
+    """Read queue depths, pool usage and cache counters from the live objects at scrape time"""
+
+    def describe(self):
+        # Metric names vary with which components are running; don't collect at registration
+        return []
+
+    def collect(self):
+        from ..config import kg, store
+        from ..embeddings import cache
+        from ..insertion import jobs
+        from ..retrieval import chat, result_cache
+        from . import executor
+
+        in_flight = GaugeMetricFamily("ufdr_executor_in_flight", "Tasks running or queued", labels=["executor"])
+        queued = GaugeMetricFamily("ufdr_executor_queue_depth", "Tasks waiting for a worker", labels=["executor"])
+        rejected = CounterMetricFamily("ufdr_executor_rejected", "Tasks shed with 503", labels=["executor"])
+        for pool in (executor.inference_executor, executor.io_executor):
+            if pool is not None:
+                in_flight.add_metric([pool.name], pool.in_flight)
+                queued.add_metric([pool.name], pool.queue_depth)
+                rejected.add_metric([pool.name], pool.rejected)
+        yield from (in_flight, queued, rejected)
+
+        batcher = chat.chat_retriever and chat.chat_retriever.get_query_batcher_stats()
+        if batcher:
+            yield GaugeMetricFamily("ufdr_query_batcher_queue_depth", "Questions waiting to be embedded",
+                                    value=batcher["queue_depth"])
+            yield CounterMetricFamily("ufdr_query_batcher_rejected", "Questions shed with 503 by the full queue",
+                                      value=batcher["rejected"])
+
+        if jobs.job_manager is not None:
+            by_status = GaugeMetricFamily("ufdr_ingest_jobs", "Ingestion jobs by status", labels=["status"])
+            counts: Dict[str, int] = {}
+            for job in jobs.job_manager.list():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            for status in ("queued", "running", "completed", "failed"):
+                by_status.add_metric([status], counts.get(status, 0))
+            yield by_status
+
+        pool_gauges = {
+            key: GaugeMetricFamily(f"ufdr_db_pool_{key}", f"Database connection slots: {key}", labels=["database"])
+            for key in ("in_use", "idle", "waiting")
+        }
+        wait = GaugeMetricFamily("ufdr_db_pool_p95_wait_seconds", "95th percentile slot wait", labels=["database"])
+        healthy = GaugeMetricFamily("ufdr_db_healthy", "1 if the last health check passed", labels=["database"])
+        for name, client in (("neo4j", kg.neo4j_client), ("vectors", store.vector_store)):
+            if client is None:
+                continue
+            stats = client.pool_stats()
+            # The local vector store has no connection pool, only health
+            for key, gauge in pool_gauges.items():
+                gauge.add_metric([name], stats.get(key, 0))
+            wait.add_metric([name], stats.get("p95_wait_ms", 0.0) / 1000)
+            healthy.add_metric([name], 1.0 if stats["healthy"] else 0.0)
+        yield from pool_gauges.values()
+        yield from (wait, healthy)
+
+        if cache.embedding_cache is not None:
+            stats = cache.embedding_cache.stats()
+            lookups = CounterMetricFamily("ufdr_embedding_store_lookups", "Embedding store lookups by tier",
+                                          labels=["result"])
+            lookups.add_metric(["memory_hit"], stats["memory_hits"])
+            lookups.add_metric(["disk_hit"], stats["disk_hits"])
+            lookups.add_metric(["miss"], stats["misses"])
+            yield lookups
+
+        if result_cache.query_cache is not None:
+            stats = result_cache.query_cache.stats()
+            answers = CounterMetricFamily("ufdr_query_cache_lookups", "Chat answer cache lookups by result",
+                                          labels=["result"])
+            answers.add_metric(["hit"], stats["hits"])
+            answers.add_metric(["miss"], stats["misses"])
+            yield answers
+            yield GaugeMetricFamily("ufdr_query_cache_entries", "Cached chat answers", value=stats["size"])
+            yield CounterMetricFamily("ufdr_query_cache_invalidations", "Report invalidations by ingestion",
+                                      value=stats["invalidations"])
+
+_collector_registered = False
+
+def register_runtime_collector():
+    """Register the runtime collector with the default registry once"""
+    global _collector_registered
+    if not _collector_registered:
+        REGISTRY.register(RuntimeCollector())
+        _collector_registered = True
+
+def render_metrics():
+    """Current metrics in the Prometheus text format, with their content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Any, Dict, List
 
 
 class ChatMessage(BaseModel):
@@ -6,6 +7,25 @@ class ChatMessage(BaseModel):
     report_id: str
     image_data: str = None  # Base64 encoded image
 
+class Evidence(BaseModel):
+    id: str
+    document: str = None
+    metadata: Dict[str, Any] = {}
+    score: float
+    context: List[Dict[str, Any]] = []  # Neighbouring Neo4j nodes
+
 class ChatResponse(BaseModel):
     response: str
-    status: str
\ No newline at end of file
+    status: str
+    evidence: List[Evidence] = []
+    timings: Dict[str, float] = {}  # Milliseconds per retrieval stage
+
+class UploadRequest(BaseModel):
+    report_id: str
+    filename: str
+    size: int
+    sha256: str = None  # Hex digest of the whole file, verified on completion
+    replace: bool = False  # Update the report's existing file of the same name
+
+class UploadComplete(BaseModel):
+    sha256: str = None
@@ -1,18 +1,57 @@
-from fastapi import FastAPI, HTTPException
+import time
+
+# Taken before the imports below, so start-up logs include import time
+_process_start = time.perf_counter()
+
+from fastapi import FastAPI, File, Header, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
+import asyncio
 import logging
-from app.types.response import ChatMessage, ChatResponse
-from app.config import get_neo4j_client, get_chroma_client
+import json
+import os
+import shutil
+from contextlib import asynccontextmanager
+from datetime import datetime
+from app.types.response import ChatMessage, ChatResponse, UploadRequest, UploadComplete
+from app.config import get_neo4j_client, get_vector_store
+from app.retrieval.chat import InvalidImageError, get_chat_retriever
+from app.runtime.executor import ExecutorBusyError, get_inference_executor, get_io_executor
+from app.insertion.jobs import SourceExistsError, check_file_type, get_job_manager
+from app.insertion.uploads import UploadError, get_upload_manager
+from app.runtime.lifecycle import connect_clients, monitor_clients, run_warm_up, shutdown_services
+from app.runtime.metrics import REQUEST_LATENCY, register_runtime_collector, render_metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 port = 8080
+reports_dir = "reports"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the database clients for the lifetime of the process and warm up the models in the background"""
+    logger.info(f"Backend modules imported in {time.perf_counter() - _process_start:.2f}s")
+    register_runtime_collector()
+    app.state.db_clients = await asyncio.get_running_loop().run_in_executor(None, connect_clients)
+    monitor = asyncio.create_task(monitor_clients(app.state.db_clients))
+    # Requests are served during warm-up; /api/ready reports when it has finished
+    warm_up = asyncio.create_task(run_warm_up(app.state, _process_start))
+    logger.info(f"Backend accepting requests {time.perf_counter() - _process_start:.2f}s after start")
+    try:
+        yield
+    finally:
+        warm_up.cancel()
+        monitor.cancel()
+        await asyncio.get_running_loop().run_in_executor(None, shutdown_services)
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+# Route templates that have served a request; the first request to each is logged with its latency
+_seen_endpoints = set()
 
 # Add CORS middleware
 app.add_middleware(
@@ -23,35 +62,257 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Time every request, labelled by route template rather than raw path"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = route.path if route else "unmatched"
+        elapsed = time.perf_counter() - start
+        REQUEST_LATENCY.labels(method=request.method, endpoint=endpoint, status=str(status)).observe(elapsed)
+        if route and (request.method, endpoint) not in _seen_endpoints:
+            _seen_endpoints.add((request.method, endpoint))
+            logger.info(f"First request to {request.method} {endpoint} took {elapsed * 1000:.1f} ms "
+                        f"({time.perf_counter() - _process_start:.1f}s after start)")
+
+@app.exception_handler(ExecutorBusyError)
+async def executor_busy_handler(request: Request, exc: ExecutorBusyError):
+    """Shed load with 503 instead of queueing work behind a full executor"""
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(UploadError)
+async def upload_error_handler(request: Request, exc: UploadError):
+    """Report upload errors with the offset the client should resume from"""
+    headers = {"Upload-Offset": str(exc.offset)} if exc.offset is not None else None
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "offset": exc.offset},
+        headers=headers
+    )
+
+@app.exception_handler(SourceExistsError)
+async def source_exists_handler(request: Request, exc: SourceExistsError):
+    """A report file named like one already ingested must be renamed or sent as a replacement"""
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
 @app.get("/")
 def read_root():
     return {"message": "Server is running"}
 
+@app.get("/api/ready")
+def readiness():
+    """Readiness probe: 200 once the models are loaded and warmed up, 503 until then"""
+    state = getattr(app.state, "readiness", {"status": "starting"})
+    if state["status"] != "ready":
+        return JSONResponse(status_code=503, content=state, headers={"Retry-After": "5"})
+    return state
+
 # Test db 
 @app.get("/api/test-db")
 async def test_database():
     """Test database connection"""
     try:
-        get_neo4j_client()
-        get_chroma_client()
+        neo4j_client = await get_io_executor().run(get_neo4j_client)
+        vector_store = await get_io_executor().run(get_vector_store)
+        if not await get_io_executor().run(neo4j_client.health_check):
+            raise RuntimeError("Neo4j is unreachable")
+        if not await get_io_executor().run(vector_store.health_check):
+            raise RuntimeError("Vector store is unreachable")
         return {"message": "Database connections successful"}
+    except ExecutorBusyError:
+        raise
     except Exception as e:
         logger.error(f"Error getting database clients: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/stats")
+def runtime_stats():
+    """Executor load and query micro-batching statistics"""
+    from app.retrieval import chat, lexical, result_cache
+    
+    stats = {
+        executor.name: {"in_flight": executor.in_flight, "queue_depth": executor.queue_depth, "rejected": executor.rejected}
+        for executor in (get_inference_executor(), get_io_executor())
+    }
+    if chat.chat_retriever is not None:
+        stats["query_batcher"] = chat.chat_retriever.get_query_batcher_stats()
+    stats["db_pools"] = {
+        name: client.pool_stats()
+        for name, client in getattr(app.state, "db_clients", {}).items() if client is not None
+    }
+    if lexical.lexical_index is not None:
+        stats["lexical_index"] = lexical.lexical_index.stats()
+    if result_cache.query_cache is not None:
+        stats["query_cache"] = result_cache.query_cache.stats()
+    return stats
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.post("/api/chat/{report_id}")
 async def chat_with_report(report_id: str, chat_message: ChatMessage):
     """
     Chat endpoint for interacting with UFDR reports
     """
-    try:        
+    try:
+        retriever = await get_io_executor().run(get_chat_retriever)
+        result = await retriever.answer_async(report_id, chat_message.message, chat_message.image_data)
         return ChatResponse(
-            response=f"Response from the server",
-            status="success"
+            response=result["response"],
+            status="success",
+            evidence=result["evidence"],
+            timings=result["timings"]
         )
+    except ExecutorBusyError:
+        raise
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Chat processing failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/{report_id}/stream")
+async def stream_chat_with_report(report_id: str, chat_message: ChatMessage):
+    """
+    Streaming chat endpoint: evidence, graph context and answer tokens as server-sent events
+    """
+    retriever = await get_io_executor().run(get_chat_retriever)
+    if chat_message.image_data:
+        # Rejected before the stream starts, while a 400 can still be sent
+        try:
+            retriever.decode_image(chat_message.image_data)
+        except InvalidImageError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    async def events():
+        try:
+            async for event, data in retriever.stream_answer(report_id, chat_message.message, chat_message.image_data):
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band
+            logger.error(f"Streaming chat failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/ingest/{report_id}")
+def ingest_report(report_id: str, file: UploadFile = File(...), replace: bool = False):
+    """
+    Save an uploaded report file and queue it for background ingestion
+    
+    Set replace to update the report's existing file of the same name.
+    """
+    # Rejected before anything is written to disk
+    try:
+        check_file_type(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    get_job_manager().check_source(report_id, file.filename, replace)
+    try:
+        os.makedirs(reports_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{report_id}_{timestamp}_{os.path.basename(file.filename)}"
+        file_path = os.path.join(reports_dir, filename)
+        
+        # Copy in chunks so the upload is never held in memory as a whole
+        with open(file_path, "wb") as f:
+            shutil.copyfileobj(file.file, f, length=1024 * 1024)
+        
+        job = get_job_manager().submit(file_path, report_id, replace)
+        return job.to_dict()
+    except (ValueError, SourceExistsError) as e:
+        # Refused at submission after all: don't keep a file nothing will process
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        if isinstance(e, SourceExistsError):
+            raise
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to queue ingestion for report {report_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/ingest/jobs")
+def list_ingestion_jobs(report_id: str = None):
+    """List ingestion jobs, optionally for one report"""
+    return [job.to_dict() for job in get_job_manager().list(report_id)]
+
+@app.get("/api/ingest/jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    """Progress of one ingestion job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
+@app.post("/api/uploads")
+async def create_upload(upload: UploadRequest):
+    """Start a chunked, resumable upload"""
+    await get_io_executor().run(get_job_manager().check_source, upload.report_id, upload.filename, upload.replace)
+    return await get_io_executor().run(
+        get_upload_manager().create, upload.report_id, upload.filename, upload.size, upload.sha256, upload.replace
+    )
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Upload state, including the offset to resume from"""
+    return await get_io_executor().run(get_upload_manager().status, upload_id)
+
+@app.put("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, upload_offset: int = Header(...)):
+    """Append the request body at Upload-Offset, streaming it to disk as it arrives"""
+    manager = get_upload_manager()
+    io_executor = get_io_executor()
+    # Unknown ids get a 404 here, before anything is held for them
+    await io_executor.run(manager.acquire, upload_id)
+    try:
+        f, state = await io_executor.run(manager.open_chunk, upload_id, upload_offset)
+        offset = upload_offset
+        try:
+            # Each network chunk goes straight to the file; the body is never buffered whole
+            async for data in request.stream():
+                if data:
+                    offset = await io_executor.run(manager.write, upload_id, f, data, state)
+        finally:
+            await io_executor.run(f.close)
+        return {"upload_id": upload_id, "offset": offset, "size": state["size"]}
+    finally:
+        manager.release(upload_id)
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, body: UploadComplete = None):
+    """Verify the checksum, move the file into reports/ and queue it for ingestion"""
+    io_executor = get_io_executor()
+    upload = await io_executor.run(
+        get_upload_manager().complete, upload_id, body.sha256 if body else None
+    )
+    try:
+        job = await io_executor.run(
+            get_job_manager().submit, upload["path"], upload["report_id"], upload.get("replace", False)
+        )
+    except (ValueError, SourceExistsError) as e:
+        await io_executor.run(os.remove, upload["path"])
+        if isinstance(e, SourceExistsError):
+            raise
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="localhost", port=port, reload=True)
\ No newline at end of file
@@ -0,0 +1,58 @@
+# MicroBatcher sheds load once its queue is full
+import asyncio
+
+import pytest
+
+from app.runtime.batcher import MicroBatcher
+from app.runtime.executor import ExecutorBusyError
+
+
+class BlockedExecutor:
+    """Executor whose single worker never finishes, so every later item stays queued"""
+
+    max_workers = 1
+    retry_after = 3
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def run(self, fn, *args):
+        await self.release.wait()
+        return fn(*args)
+
+
+def test_submit_raises_busy_when_the_queue_is_full():
+    async def scenario():
+        executor = BlockedExecutor()
+        batcher = MicroBatcher(lambda items: items, executor, max_batch_size=1, max_wait_ms=0,
+                               max_queue=2, name="query-embedding")
+        pending = [asyncio.ensure_future(batcher.submit(0))]
+        await asyncio.sleep(0.01)  # The first item is taken off the queue and blocks the only slot
+        pending += [asyncio.ensure_future(batcher.submit(i)) for i in (1, 2)]
+        await asyncio.sleep(0.01)  # The next two fill the queue
+        with pytest.raises(ExecutorBusyError) as busy:
+            await batcher.submit(99)
+        assert busy.value.retry_after == 3
+        assert batcher.stats()["rejected"] == 1
+        executor.release.set()
+        assert await asyncio.gather(*pending) == [0, 1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_dispatched_batches_are_exported_to_prometheus():
+    from prometheus_client import REGISTRY
+
+    def sample(name):
+        return REGISTRY.get_sample_value(name, {"batcher": "metrics-test"}) or 0.0
+
+    async def scenario():
+        executor = BlockedExecutor()
+        executor.release.set()
+        batcher = MicroBatcher(lambda items: items, executor, max_batch_size=8, max_wait_ms=20, name="metrics-test")
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+    assert sample("ufdr_batcher_batch_size_count") == 1
+    assert sample("ufdr_batcher_batch_size_sum") == 3
+    assert sample("ufdr_batcher_queue_seconds_count") == 3
@@ -0,0 +1,71 @@
+# Chunk ids survive edits elsewhere in a file, stale chunks are found on disk, and same-named files need replace
+import pytest
+
+from app.insertion import manifest
+from app.insertion.jobs import IngestionJobManager, SourceExistsError
+from app.insertion.manifest import IngestionManifest, chunk_fingerprint
+
+
+def test_fingerprint_ignores_the_chunk_position():
+    assert chunk_fingerprint("call me back", {"line": 3}) == chunk_fingerprint("call me back", {"line": 4})
+    assert chunk_fingerprint("call me back", {"sheet": "Calls", "row": 2}) != \
+        chunk_fingerprint("call me back", {"sheet": "SMS", "row": 2})
+
+
+def test_same_named_file_needs_replace(tmp_path, monkeypatch):
+    store = IngestionManifest(str(tmp_path / "manifest.db"))
+    monkeypatch.setattr(manifest, "ingest_manifest", store)
+    jobs = IngestionJobManager(max_workers=1)
+    try:
+        jobs.check_source("r1", "messages.csv")
+        store.record("r1", "messages.csv", "0" * 64, 10, ["r1:messages.csv:a"])
+
+        with pytest.raises(SourceExistsError):
+            jobs.check_source("r1", "messages.csv")
+        jobs.check_source("r1", "messages.csv", replace=True)
+        jobs.check_source("r2", "messages.csv")
+    finally:
+        jobs.shutdown()
+        store.close()
+
+
+class FakeEmbedder:
+    def embed_text(self, texts):
+        import numpy as np
+        vectors = np.random.default_rng(len(texts)).standard_normal((len(texts), 8)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class FakeGraph:
+    def delete_nodes(self, report_id, ids):
+        return len(ids)
+
+
+def test_reingest_stages_ids_and_removes_only_stale_chunks(tmp_path, monkeypatch):
+    import app.config
+    from app.config.local_vector import LocalVectorStore
+    from app.insertion.text_pipeline import TextIngestionPipeline
+    from app.retrieval.lexical import LexicalIndex
+
+    monkeypatch.setattr(app.config, "get_neo4j_client", lambda: FakeGraph(), raising=False)
+    store = IngestionManifest(str(tmp_path / "manifest.db"))
+    vectors = LocalVectorStore(str(tmp_path / "vectors"))
+    lexical = LexicalIndex(str(tmp_path / "lexical"))
+    pipeline = TextIngestionPipeline(FakeEmbedder(), vectors, batch_size=2, chunk_chars=20, chunk_overlap=0,
+                                     manifest=store, lexical_index=lexical)
+    lines = ["first message here", "second message here", "repeated line here", "repeated line here"]
+    path = tmp_path / "chat.txt"
+    try:
+        path.write_text("\n".join(lines) + "\n")
+        first = pipeline.ingest_file(str(path), "r1")
+        assert (first["vectors"], store.get_file("r1", "chat.txt")["chunks"]) == (4, 4)
+
+        path.write_text("\n".join(["a new opening line"] + lines[1:]) + "\n")
+        second = pipeline.ingest_file(str(path), "r1")
+        assert (second["vectors"], second["removed"]) == (1, 1)
+        assert store.get_file("r1", "chat.txt")["chunks"] == 4
+        assert store._conn.execute("SELECT COUNT(*) FROM staged").fetchone()[0] == 0
+    finally:
+        vectors.close()
+        lexical.close()
+        store.close()
@@ -0,0 +1,90 @@
+# Neo4jClient against an in-memory fake driver, no database needed
+import pytest
+
+pytest.importorskip("neo4j")
+
+from app.config import kg
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        self.driver.open_sessions += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.driver.open_sessions -= 1
+
+
+class FakeDriver:
+    def __init__(self):
+        self.open_sessions = 0
+        self.sessions_created = 0
+
+    def verify_connectivity(self):
+        pass
+
+    def session(self):
+        self.sessions_created += 1
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    driver = FakeDriver()
+    monkeypatch.setattr(kg.GraphDatabase, "driver", lambda *args, **kwargs: driver)
+    return kg.Neo4jClient("bolt://fake:7687", "neo4j", "password", pool_size=2, acquisition_timeout=0.5)
+
+
+def test_session_opens_one_driver_session_and_releases_its_slot(client):
+    with client.session() as session:
+        assert isinstance(session, FakeSession)
+        assert client.driver.sessions_created == 1
+        assert client.slots.stats()["in_use"] == 1
+    assert client.driver.open_sessions == 0
+    assert client.slots.stats()["in_use"] == 0
+
+
+class RecordingSession(FakeSession):
+    def run(self, query, **params):
+        self.driver.queries.append(query)
+        return self
+
+    def consume(self):
+        pass
+
+    def execute_write(self, work):
+        return work(self)
+
+
+def test_nodes_are_merged_per_report(client):
+    client.driver.queries = []
+    client.driver.session = lambda: RecordingSession(client.driver)
+    client.ensure_schema({"Contact": "id"})
+    client.write_nodes("Contact", [{"report_id": "case-1", "id": "+15550100"}])
+    constraint = next(q for q in client.driver.queries if q.startswith("CREATE CONSTRAINT"))
+    assert "(n.report_id, n.id) IS UNIQUE" in constraint
+    assert "MERGE (n:Contact {report_id: row.report_id, id: row.id})" in client.driver.queries[-1]
+
+
+def test_neighbour_lookup_uses_labelled_keys_and_a_per_node_limit(client):
+    client.driver.queries = []
+
+    class ReadSession(RecordingSession):
+        def execute_read(self, work):
+            return work(self)
+
+        def __iter__(self):
+            return iter([])
+
+    client.driver.session = lambda: ReadSession(client.driver)
+    client.get_neighbours("case-1", ["+15550100"], schema={"Contact": "id", "Call": "id"})
+    query = client.driver.queries[-1]
+    assert "MATCH (n:Contact {report_id: $report_id, id: node_id})" in query
+    assert "MATCH (n:Call {report_id: $report_id, id: node_id})" in query
+    assert "LIMIT $limit }" in query
@@ -0,0 +1,13 @@
+# Importing the embedding modules must not import torch or transformers
+import subprocess
+import sys
+
+
+def test_embedding_modules_import_without_torch():
+    code = (
+        "import sys\n"
+        "import app.embeddings.audio, app.embeddings.backends, app.embeddings.image, app.embeddings.text\n"
+        "print(sorted(m for m in ('torch', 'transformers') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,23 @@
+# Identifier extraction for exact-match lookups
+import pytest
+
+from app.retrieval.lexical import identifiers
+
+
+@pytest.mark.parametrize("text", [
+    "meeting at 2023-01-15 10:30",
+    "sent 2023-01-15T10:30:00Z",
+    "on 15/01/2023 10:30:45",
+    "12.05.2023 at 9:05",
+])
+def test_dates_and_times_are_not_identifiers(text):
+    assert identifiers(text) == set()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("who called +91 98765 43210?", "9876543210"),
+    ("at 10:30 +44 20 7946 0958", "2079460958"),
+    ("2023-01-15 call (555) 123 4567", "5551234567"),
+])
+def test_phone_numbers_next_to_timestamps_still_match(text, expected):
+    assert identifiers(text) == {expected}
@@ -0,0 +1,31 @@
+# Warm-up loads models without waiting on the databases
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.embeddings import text
+from app.runtime import lifecycle
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.warm_ups = 0
+
+    def warm_up(self):
+        self.warm_ups += 1
+
+
+def test_warm_up_only_touches_the_embedder(monkeypatch):
+    embedder = FakeEmbedder()
+    monkeypatch.setattr(text, "get_clip_embedder", lambda: embedder)
+    monkeypatch.setenv("WARMUP_ENABLED", "true")
+    monkeypatch.setenv("WARMUP_IMAGE_MODEL", "false")
+    # No database is reachable here; warm-up must not need one
+    monkeypatch.setenv("NEO4J_URI", "bolt://127.0.0.1:1")
+    state = SimpleNamespace()
+
+    asyncio.run(lifecycle.run_warm_up(state, time.perf_counter()))
+
+    assert embedder.warm_ups == 1
+    assert state.readiness["status"] == "ready"
+    assert {"load_text_model_ms", "text_batch_ms"} <= state.readiness.keys()
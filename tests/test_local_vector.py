@@ -0,0 +1,76 @@
+# Local vector store bookkeeping for repeated and missing ids
+import numpy as np
+import pytest
+
+from app.config.local_vector import LocalVectorStore
+from app.config.store import VectorStore
+
+
+def vector(seed):
+    v = np.random.default_rng(seed).standard_normal(8).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_vector_store_is_abstract():
+    with pytest.raises(TypeError):
+        VectorStore()
+
+
+def test_duplicate_ids_in_a_batch_keep_the_last_copy(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    try:
+        meta = {"report_id": "r1"}
+        store.bulk_upsert([("a", vector(1), "old", meta), ("b", vector(2), "b", meta), ("a", vector(3), "new", meta)],
+                          max_workers=1)
+        assert store.pool_stats()["vectors_loaded"] == 2
+
+        hits = store.query([vector(3).tolist()], n_results=1, where={"report_id": "r1"})[0]
+        assert (hits[0]["id"], hits[0]["document"]) == ("a", "new")
+
+        assert store.delete(["a", "missing"]) == 1
+    finally:
+        store.close()
+
+
+def test_on_batch_runs_after_each_batch_is_written(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    try:
+        seen = []
+        records = [(f"id{i}", vector(i), "doc", {"report_id": "r1"}) for i in range(5)]
+        store.bulk_upsert(records, batch_size=2,
+                          on_batch=lambda size: seen.append((size, store.pool_stats()["vectors_loaded"])))
+        assert seen == [(2, 2), (2, 4), (1, 5)]
+    finally:
+        store.close()
+
+
+def test_training_one_report_does_not_block_queries_on_another(tmp_path, monkeypatch):
+    import threading
+    from app.config import local_vector
+
+    store = LocalVectorStore(str(tmp_path))
+    training, release = threading.Event(), threading.Event()
+    try:
+        store.bulk_upsert([("b", vector(2), "b", {"report_id": "r2"})])
+
+        def slow_train(index):
+            training.set()
+            release.wait(5)
+
+        monkeypatch.setattr(local_vector.ReportIndex, "maybe_train", slow_train)
+        writer = threading.Thread(target=store.bulk_upsert, args=([("a", vector(1), "a", {"report_id": "r1"})],))
+        writer.start()
+        assert training.wait(5)
+
+        done = []
+        reader = threading.Thread(target=lambda: done.append(
+            store.query([vector(2).tolist()], n_results=1, where={"report_id": "r2"})))
+        reader.start()
+        reader.join(2)
+        answered_during_training = bool(done)
+        release.set()
+        writer.join(5)
+        assert answered_during_training and done[0][0][0]["id"] == "b"
+    finally:
+        release.set()
+        store.close()
@@ -0,0 +1,45 @@
+# Resumable uploads refuse unsupported files up front and never complete mid-chunk
+import pytest
+
+from app.insertion.uploads import UploadError, UploadManager
+
+
+def test_create_rejects_unsupported_files(tmp_path):
+    manager = UploadManager(str(tmp_path))
+    with pytest.raises(UploadError) as error:
+        manager.create("r1", "payload.exe", 10)
+    assert error.value.status_code == 400
+    assert not any(tmp_path.joinpath(".uploads").iterdir())
+
+
+def test_complete_waits_for_the_chunk_being_written(tmp_path):
+    manager = UploadManager(str(tmp_path))
+    upload_id = manager.create("r1", "messages.txt", 5)["upload_id"]
+    f, state = manager.open_chunk(upload_id, 0)
+    manager.write(upload_id, f, b"hello", state)
+    f.close()
+
+    manager.acquire(upload_id)
+    with pytest.raises(UploadError) as error:
+        manager.complete(upload_id)
+    assert error.value.status_code == 409
+    manager.release(upload_id)
+
+    assert manager.complete(upload_id)["path"].endswith("messages.txt")
+
+
+def test_unknown_and_expired_uploads_leave_nothing_behind(tmp_path):
+    import os
+
+    manager = UploadManager(str(tmp_path))
+    with pytest.raises(UploadError) as error:
+        manager.acquire("0" * 32)
+    assert error.value.status_code == 404
+
+    upload_id = manager.create("r1", "messages.txt", 5)["upload_id"]
+    for path in tmp_path.joinpath(".uploads").iterdir():
+        os.utime(path, (0, 0))
+    assert manager.expire() == 1
+    assert not manager._busy and upload_id not in manager._hashes
+    with pytest.raises(UploadError):
+        manager.status(upload_id)
@@ -0,0 +1,107 @@
+# Command-line and Streamlit client for the chunked, resumable upload API
+import argparse
+import hashlib
+import logging
+import os
+import time
+from typing import BinaryIO, Callable, Dict
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+def file_sha256(fileobj: BinaryIO, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a seekable file object, leaving it rewound"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(block_size), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+def upload_file(fileobj: BinaryIO, filename: str, report_id: str, base_url: str = "http://localhost:8080",
+                chunk_size: int = DEFAULT_CHUNK_SIZE, max_retries: int = 5, upload_id: str = None,
+                progress: Callable[[int, int], None] = None, replace: bool = False) -> Dict:
+    """Upload a file in chunks, resuming from the server's offset after any failure
+
+    Pass upload_id to resume an upload started earlier (e.g. by a previous run), and
+    replace to update a file of the same name the report already has.
+    Returns the ingestion job created once the upload completes.
+    """
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    sha256 = file_sha256(fileobj)
+    url = f"{base_url}/api/uploads"
+
+    if upload_id is None:
+        response = requests.post(url, json={"report_id": report_id, "filename": filename,
+                                            "size": size, "sha256": sha256, "replace": replace}, timeout=30)
+        response.raise_for_status()
+        upload_id = response.json()["upload_id"]
+        offset = 0
+    else:
+        response = requests.get(f"{url}/{upload_id}", timeout=30)
+        response.raise_for_status()
+        offset = response.json()["offset"]
+
+    failures = 0
+    while offset < size:
+        fileobj.seek(offset)
+        chunk = fileobj.read(chunk_size)
+        try:
+            response = requests.put(f"{url}/{upload_id}", data=chunk,
+                                    headers={"Upload-Offset": str(offset),
+                                             "Content-Type": "application/octet-stream"},
+                                    timeout=300)
+            if response.status_code == 409 and response.json().get("offset") is not None:
+                # The server has a different view of what arrived; continue from there
+                offset = response.json()["offset"]
+                continue
+            response.raise_for_status()
+            offset = response.json()["offset"]
+            failures = 0
+        except requests.RequestException as e:
+            failures += 1
+            if failures > max_retries:
+                raise
+            delay = min(2 ** failures, 30)
+            logger.warning(f"Chunk at offset {offset} of upload {upload_id} failed ({e}); retrying in {delay}s")
+            time.sleep(delay)
+            try:
+                offset = requests.get(f"{url}/{upload_id}", timeout=30).json()["offset"]
+            except (requests.RequestException, ValueError, KeyError):
+                pass
+            continue
+
+        if progress:
+            progress(offset, size)
+
+    response = requests.post(f"{url}/{upload_id}/complete", json={"sha256": sha256}, timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload a UFDR report to the backend in resumable chunks")
+    parser.add_argument("path")
+    parser.add_argument("report_id")
+    parser.add_argument("--base-url", default="http://localhost:8080")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_SIZE // (1024 * 1024))
+    parser.add_argument("--upload-id", help="Resume an earlier upload")
+    parser.add_argument("--replace", action="store_true", help="Update the report's existing file of the same name")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.path, "rb") as f:
+        job = upload_file(
+            f, os.path.basename(args.path), args.report_id,
+            base_url=args.base_url,
+            chunk_size=args.chunk_mb * 1024 * 1024,
+            upload_id=args.upload_id,
+            replace=args.replace,
+            progress=lambda done, total: print(f"\r{done}/{total} bytes", end="", flush=True),
+        )
+    print(f"\nQueued ingestion job {job['job_id']}")
+
+if __name__ == "__main__":
+    main()